@@ -0,0 +1,44 @@
+import numpy as np
+
+from bw_graph_tools.graph_traversal import NewNodeEachVisitGraphTraversal
+from bw_graph_tools.graph_traversal.utils import PYPARDISO, CachingSolver
+
+from .common import SIZES, get_lca
+
+# Number of products solved in one batch, similar to the inputs of a large activity
+BATCH = 50
+
+
+class CachingSolverStrategies:
+    params = SIZES
+    param_names = ["activities"]
+
+    def setup(self, activities):
+        self.lca = get_lca(activities)
+        self.lca.decompose_technosphere()
+        self.characterized_biosphere = NewNodeEachVisitGraphTraversal.get_characterized_biosphere(
+            self.lca
+        )
+        self.indices = np.random.default_rng(42).choice(activities, size=BATCH, replace=False)
+        self.indices = self.indices.tolist()
+
+    def new_solver(self):
+        solver = CachingSolver(self.lca)
+        solver.set_score_row(self.characterized_biosphere)
+        return solver
+
+    def time_unit_scores_iterative(self, activities):
+        self.new_solver()._unit_scores_iterative(self.indices)
+
+    def time_unit_scores_pardiso(self, activities):
+        if not PYPARDISO:
+            raise NotImplementedError("pypardiso not installed")
+        self.new_solver()._unit_scores_pardiso(self.indices)
+
+    def time_all_unit_scores(self, activities):
+        self.new_solver().all_unit_scores()
+
+    def time_scores_cached(self, activities):
+        solver = self.new_solver()
+        solver.scores(self.indices, [1.0] * BATCH)
+        solver.scores(self.indices, [2.0] * BATCH)
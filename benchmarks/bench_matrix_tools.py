@@ -0,0 +1,27 @@
+from bw_graph_tools import (
+    get_path_from_matrix,
+    guess_production_exchanges,
+    to_normalized_adjacency_matrix,
+)
+
+from .common import SIZES, get_lca
+
+
+class MatrixTools:
+    params = SIZES
+    param_names = ["activities"]
+
+    def setup(self, activities):
+        self.lca = get_lca(activities)
+        self.source = self.lca.dicts.activity[next(iter(self.lca.demand))]
+        # Deepest activity in the (acyclic part of the) supply chain
+        self.target = int(self.lca.supply_array.argmin())
+
+    def time_guess_production_exchanges(self, activities):
+        guess_production_exchanges(self.lca.technosphere_mm)
+
+    def time_to_normalized_adjacency_matrix(self, activities):
+        to_normalized_adjacency_matrix(self.lca.technosphere_matrix)
+
+    def time_get_path_from_matrix(self, activities):
+        get_path_from_matrix(self.lca.technosphere_matrix, self.source, self.target)
@@ -0,0 +1,57 @@
+import warnings
+
+from bw_graph_tools.graph_traversal import (
+    AssumedDiagonalGraphTraversal,
+    GraphTraversalSettings,
+    LayerwiseGraphTraversal,
+    LayerwiseGraphTraversalSettings,
+    NewNodeEachVisitGraphTraversal,
+    SameNodeEachVisitGraphTraversal,
+    SharedSubtreeGraphTraversal,
+    SharedSubtreeGraphTraversalSettings,
+)
+
+from .common import SIZES, get_lca
+
+TRAVERSALS = {
+    "NewNodeEachVisit": (NewNodeEachVisitGraphTraversal, GraphTraversalSettings, {}),
+    "NewNodeEachVisitBucketQueue": (
+        NewNodeEachVisitGraphTraversal,
+        GraphTraversalSettings,
+        {"priority_queue": "bucket"},
+    ),
+    "SameNodeEachVisit": (SameNodeEachVisitGraphTraversal, GraphTraversalSettings, {}),
+    "SameNodeEachVisitAggregated": (
+        SameNodeEachVisitGraphTraversal,
+        GraphTraversalSettings,
+        {"aggregate_by_activity": True},
+    ),
+    "AssumedDiagonal": (AssumedDiagonalGraphTraversal, GraphTraversalSettings, {}),
+    "SharedSubtree": (SharedSubtreeGraphTraversal, SharedSubtreeGraphTraversalSettings, {}),
+    "Layerwise": (LayerwiseGraphTraversal, LayerwiseGraphTraversalSettings, {}),
+}
+
+
+class Traversal:
+    """Full traversal, including setup like guessing production exchanges."""
+
+    params = (SIZES, list(TRAVERSALS))
+    param_names = ["activities", "traversal"]
+    timeout = 300
+
+    def setup(self, activities, traversal):
+        self.lca = get_lca(activities)
+        self.cls, settings_cls, kwargs = TRAVERSALS[traversal]
+        self.settings = settings_cls(cutoff=1e-4, max_calc=2000, **kwargs)
+
+    def time_traverse(self, activities, traversal):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            self.cls(lca=self.lca, settings=self.settings).traverse()
+
+    def track_nodes(self, activities, traversal):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            graph = self.cls(lca=self.lca, settings=self.settings)
+            graph.traverse()
+        return len(graph.nodes)
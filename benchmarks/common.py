@@ -0,0 +1,26 @@
+"""Shared synthetic systems for the benchmarks."""
+
+import warnings
+from functools import lru_cache
+
+from bw_graph_tools.testing import synthetic_lca
+
+# Number of activities in the synthetic technospheres
+SIZES = [1000, 5000]
+# Average number of inputs per activity, similar to ecoinvent
+INPUTS_PER_ACTIVITY = 5
+
+
+@lru_cache(maxsize=None)
+def get_lca(activities: int, cycle_fraction: float = 0.1):
+    """Synthetic `LCA` with `activities` activities; cached, as the LCI takes a while."""
+    with warnings.catch_warnings():
+        # No pypardiso warning
+        warnings.simplefilter("ignore")
+        return synthetic_lca(
+            activities=activities,
+            density=INPUTS_PER_ACTIVITY / activities,
+            cycle_fraction=cycle_fraction,
+            biosphere=max(activities // 10, 10),
+            seed=42,
+        )
@@ -9,18 +9,42 @@ __all__ = (
     "NewNodeEachVisitGraphTraversal",
     "Node",
     "path_as_brightway_objects",
+    "paths_as_brightway_objects",
+    "PathFinder",
     "to_normalized_adjacency_matrix",
 )
 
 __version__ = "0.10"
 
-from bw_graph_tools.graph_traversal import (
-    AssumedDiagonalGraphTraversal,
-    Edge,
-    Flow,
-    GraphTraversalSettings,
-    NewNodeEachVisitGraphTraversal,
-    Node,
+import importlib
+
+from bw_graph_tools.graph_traversal_utils import (
+    PathFinder,
+    get_path_from_matrix,
+    path_as_brightway_objects,
+    paths_as_brightway_objects,
 )
-from bw_graph_tools.graph_traversal_utils import get_path_from_matrix, path_as_brightway_objects
 from bw_graph_tools.matrix_tools import guess_production_exchanges, to_normalized_adjacency_matrix
+
+# The graph traversal classes need `bw2calc`, which is slow to import. They are only imported
+# when first used, so that e.g. `guess_production_exchanges` can be used without that cost.
+_LAZY_IMPORTS = {
+    "AssumedDiagonalGraphTraversal": "bw_graph_tools.graph_traversal",
+    "Edge": "bw_graph_tools.graph_traversal",
+    "Flow": "bw_graph_tools.graph_traversal",
+    "GraphTraversalSettings": "bw_graph_tools.graph_traversal",
+    "NewNodeEachVisitGraphTraversal": "bw_graph_tools.graph_traversal",
+    "Node": "bw_graph_tools.graph_traversal",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
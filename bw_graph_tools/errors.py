@@ -2,3 +2,9 @@ class UnclearProductionExchange(Exception):
     """Can't guess the production exchange row and column indices"""
 
     pass
+
+
+class SolverConvergenceError(Exception):
+    """Iterative linear solver didn't reach the requested tolerance"""
+
+    pass
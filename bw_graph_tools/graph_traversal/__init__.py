@@ -7,17 +7,49 @@ __all__ = (
     "Node",
     "SameNodeEachVisitGraphTraversal",
     "SameNodeEachVisitTaggedGraphTraversal",
+    "SharedEdge",
+    "SharedSubtreeGraphTraversal",
     "GraphTraversalSettings",
+    "LayerwiseGraphTraversal",
+    "LayerwiseGraphTraversalSettings",
+    "SharedSubtreeGraphTraversalSettings",
     "TaggedGraphTraversalSettings",
+    "TraversalRescorer",
+    "export_traversal",
+    "load_traversal_results",
 )
 
-from bw_graph_tools.graph_traversal.assumed_diagonal import AssumedDiagonalGraphTraversal
-from bw_graph_tools.graph_traversal.graph_objects import Edge, Flow, Node
-from bw_graph_tools.graph_traversal.new_node_each_visit import NewNodeEachVisitGraphTraversal
-from bw_graph_tools.graph_traversal.same_node_each_visit import SameNodeEachVisitGraphTraversal
-from bw_graph_tools.graph_traversal.settings import GraphTraversalSettings
-from bw_graph_tools.graph_traversal.tagged_nodes import (
-    NewNodeEachVisitTaggedGraphTraversal,
-    SameNodeEachVisitTaggedGraphTraversal,
-    TaggedGraphTraversalSettings,
-)
+import importlib
+
+from bw_graph_tools.graph_traversal.graph_objects import Edge, Flow, Node, SharedEdge
+
+# Traversal classes import `bw2calc`, settings import `pydantic`, and export imports `pyarrow`;
+# all are only imported when first used.
+_LAZY_IMPORTS = {
+    "AssumedDiagonalGraphTraversal": "bw_graph_tools.graph_traversal.assumed_diagonal",
+    "GraphTraversalSettings": "bw_graph_tools.graph_traversal.settings",
+    "LayerwiseGraphTraversal": "bw_graph_tools.graph_traversal.layerwise",
+    "LayerwiseGraphTraversalSettings": "bw_graph_tools.graph_traversal.settings",
+    "NewNodeEachVisitGraphTraversal": "bw_graph_tools.graph_traversal.new_node_each_visit",
+    "NewNodeEachVisitTaggedGraphTraversal": "bw_graph_tools.graph_traversal.tagged_nodes",
+    "SameNodeEachVisitGraphTraversal": "bw_graph_tools.graph_traversal.same_node_each_visit",
+    "SameNodeEachVisitTaggedGraphTraversal": "bw_graph_tools.graph_traversal.tagged_nodes",
+    "SharedSubtreeGraphTraversal": "bw_graph_tools.graph_traversal.shared_subtree",
+    "SharedSubtreeGraphTraversalSettings": "bw_graph_tools.graph_traversal.settings",
+    "TaggedGraphTraversalSettings": "bw_graph_tools.graph_traversal.settings",
+    "TraversalRescorer": "bw_graph_tools.graph_traversal.rescoring",
+    "export_traversal": "bw_graph_tools.graph_traversal.export",
+    "load_traversal_results": "bw_graph_tools.graph_traversal.export",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,182 @@
+"""
+Index of the edges of a graph traversal by consumer, producer, and activity.
+
+`edges` is a flat list, so finding the children of a node, its path to the functional unit, or
+all nodes of an activity would need a scan over all edges. `AdjacencyIndex` answers these
+queries in time proportional to the size of the answer. It is updated from the edges added
+since the last query, so it stays current while the traversal grows, e.g. with repeated calls
+to `traverse_from_node`, at a cost proportional to the new edges.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from bw_graph_tools.graph_traversal.graph_objects import Edge, Node
+
+
+class AdjacencyIndex:
+    """
+    Children, parents, and nodes per activity of the `nodes` and `edges` of a graph traversal.
+
+    The children of each node are stored as ranges of positions in `edges`, like the offsets
+    of a CSR matrix; all children of a node are added together, so there is usually only one
+    range per node. Each node has a pointer to the position of its first edge from a consumer,
+    and each activity a list of its nodes.
+
+    Use `NewNodeEachVisitGraphTraversal.adjacency` instead of creating this class directly; the
+    traversal resets the index when the graph changes other than by adding nodes and edges.
+    Only nodes which are connected by at least one edge are indexed.
+
+    Parameters
+    ----------
+    traversal : NewNodeEachVisitGraphTraversal
+        Graph traversal whose `nodes` and `edges` are indexed
+    """
+
+    def __init__(self, traversal):
+        self.traversal = traversal
+        self.reset()
+
+    def reset(self) -> None:
+        """Rebuild the index from all edges on the next query."""
+        self._edges = None
+        self._count = 0
+        # {consumer unique id: [(start, stop) positions in `edges`]}
+        self._child_ranges: Dict[int, List[Tuple[int, int]]] = {}
+        # {producer unique id: edge position, or list of positions if there are several}
+        self._parents: Dict[int, object] = {}
+        # {activity index: [unique ids]}
+        self._activities: Dict[int, List[int]] = defaultdict(list)
+        # {consumer unique id: edge positions sorted by decreasing absolute child score}
+        self._sorted_children: Dict[int, List[int]] = {}
+
+    def _register(self, unique_id: int) -> None:
+        if unique_id not in self._parents and unique_id not in self._child_ranges:
+            self._activities[self.traversal._nodes[unique_id].activity_index].append(unique_id)
+
+    def _sync(self) -> None:
+        """Index the edges added since the last query."""
+        edges = self.traversal._edges
+        if edges is not self._edges or len(edges) < self._count:
+            self.reset()
+            self._edges = edges
+        if len(edges) == self._count:
+            return
+
+        child_ranges, parents = self._child_ranges, self._parents
+        for position in range(self._count, len(edges)):
+            edge = edges[position]
+            consumer = edge.consumer_unique_id
+            ranges = child_ranges.get(consumer)
+            if ranges is None:
+                self._register(consumer)
+                child_ranges[consumer] = [(position, position + 1)]
+            elif ranges[-1][1] == position:
+                ranges[-1] = (ranges[-1][0], position + 1)
+            else:
+                ranges.append((position, position + 1))
+            self._sorted_children.pop(consumer, None)
+
+            producer = edge.producer_unique_id
+            existing = parents.get(producer)
+            if existing is None:
+                self._register(producer)
+                parents[producer] = position
+            elif type(existing) is list:
+                existing.append(position)
+            else:
+                parents[producer] = [existing, position]
+        self._count = len(edges)
+
+    def child_count(self, unique_id: int) -> int:
+        """Number of edges from the node with `unique_id` to its children."""
+        self._sync()
+        return sum(stop - start for start, stop in self._child_ranges.get(unique_id, ()))
+
+    def children(
+        self, unique_id: int, offset: int = 0, limit: Optional[int] = None
+    ) -> List[Tuple[Edge, Node]]:
+        """
+        Edges to the children of the node with `unique_id`, and the child nodes, sorted by
+        decreasing absolute cumulative score of the child.
+
+        Parameters
+        ----------
+        unique_id : int
+            `unique_id` of the consumer node
+        offset : int
+            Number of children to skip, for pagination
+        limit : int
+            Maximum number of children to return; all if `None`
+
+        Returns
+        -------
+        list
+            `(Edge, Node)` tuples
+        """
+        self._sync()
+        positions = self._sorted_children.get(unique_id)
+        if positions is None:
+            nodes, edges = self.traversal._nodes, self._edges
+            positions = [
+                position
+                for start, stop in self._child_ranges.get(unique_id, ())
+                for position in range(start, stop)
+            ]
+            positions.sort(
+                key=lambda position: abs(
+                    nodes[edges[position].producer_unique_id].cumulative_score
+                ),
+                reverse=True,
+            )
+            self._sorted_children[unique_id] = positions
+        stop = None if limit is None else offset + limit
+        return [
+            (self._edges[position], self.traversal._nodes[self._edges[position].producer_unique_id])
+            for position in positions[offset:stop]
+        ]
+
+    def parents(self, unique_id: int) -> List[Tuple[Edge, Node]]:
+        """
+        Edges from the consumers of the node with `unique_id`, and the consumer nodes, in the
+        order in which the edges were added. Nodes created by
+        `NewNodeEachVisitGraphTraversal` have at most one parent.
+        """
+        self._sync()
+        positions = self._parents.get(unique_id)
+        if positions is None:
+            return []
+        elif type(positions) is not list:
+            positions = [positions]
+        return [
+            (self._edges[position], self.traversal._nodes[self._edges[position].consumer_unique_id])
+            for position in positions
+        ]
+
+    def path_to_root(self, unique_id: int) -> List[Node]:
+        """
+        Nodes from the first node without parents, usually the functional unit, to the node with
+        `unique_id`, following the first parent of each node.
+        """
+        self._sync()
+        nodes, edges = self.traversal._nodes, self._edges
+        path, seen = [nodes[unique_id]], {unique_id}
+        while True:
+            position = self._parents.get(path[-1].unique_id)
+            if position is None:
+                break
+            elif type(position) is list:
+                position = position[0]
+            consumer = edges[position].consumer_unique_id
+            if consumer in seen:
+                break
+            seen.add(consumer)
+            path.append(nodes[consumer])
+        path.reverse()
+        return path
+
+    def nodes_for_activity(self, activity_index: int) -> List[Node]:
+        """All nodes of the activity with matrix column index `activity_index`."""
+        self._sync()
+        nodes = self.traversal._nodes
+        return [nodes[unique_id] for unique_id in self._activities.get(activity_index, ())]
@@ -108,3 +108,26 @@ class BaseGraphTraversal(Generic[Settings]):
         See the `Flow` documentation for its other attributes.
         """
         return self._flows
+
+    def export(self, directory, format: str = "arrow") -> dict:
+        """
+        Write `nodes`, `edges`, and `flows` to columnar files in `directory`, one file per table.
+
+        Requires `pyarrow`. Use `load_traversal_results` to memory-map the files back as Arrow
+        tables. See `bw_graph_tools.graph_traversal.export.export_traversal` for details.
+
+        Parameters
+        ----------
+        directory : str or pathlib.Path
+            Directory for the files
+        format : str
+            ``"arrow"`` (Arrow IPC) or ``"parquet"``
+
+        Returns
+        -------
+        dict
+            File paths with keys `nodes`, `edges`, and `flows`
+        """
+        from bw_graph_tools.graph_traversal.export import export_traversal
+
+        return export_traversal(self, directory, format=format)
@@ -0,0 +1,162 @@
+"""
+Save and restore the complete state of a `NewNodeEachVisitGraphTraversal`.
+
+The state is written as a single compressed numpy ``.npz`` file, with one array per column of
+the nodes, edges, and flows (or flow records, with `GraphTraversalSettings.lazy_flows`), plus
+the traversal heap, calculation counter, production exchange mapping, and cached solver scores.
+Restoring doesn't need to guess the production exchanges again, or to redo any of the linear
+solves whose scores were cached.
+
+Only the state of `NewNodeEachVisitGraphTraversal` is saved; subclasses with more state, like
+the shared subtree and tagged traversals, rebuild it from the nodes and edges after loading, see
+`NewNodeEachVisitGraphTraversal._restore_state`.
+"""
+
+import json
+from dataclasses import fields
+from pathlib import Path
+from typing import Optional, Union, get_type_hints
+
+import numpy as np
+
+from bw_graph_tools.graph_traversal import graph_objects
+from bw_graph_tools.graph_traversal import settings as settings_module
+from bw_graph_tools.graph_traversal.graph_objects import Edge, Flow, Node
+from bw_graph_tools.graph_traversal.utils import Counter
+
+FORMAT_VERSION = 1
+DEFAULT_CLASSES = {"nodes": Node, "edges": Edge, "flows": Flow}
+DTYPES = {int: np.int64, Optional[int]: np.int64, float: np.float64, bool: np.bool_}
+# Settings which hold objects, and can't be saved
+UNSAVED_SETTINGS = {"caching_solver", "tag_index", "profile_callback"}
+
+
+def _objects_to_arrays(label: str, objects: list, arrays: dict) -> None:
+    cls = type(objects[0]) if objects else DEFAULT_CLASSES[label]
+    arrays[f"{label}.class"] = np.array(cls.__name__)
+    hints = get_type_hints(cls)
+    for field in fields(cls):
+        values = [getattr(obj, field.name) for obj in objects]
+        if hints[field.name] == Optional[int]:
+            mask = np.array([value is None for value in values], dtype=bool)
+            arrays[f"{label}.{field.name}.null"] = mask
+            values = [-1 if value is None else value for value in values]
+        arrays[f"{label}.{field.name}"] = np.array(values, dtype=DTYPES[hints[field.name]])
+
+
+def _arrays_to_objects(label: str, data) -> list:
+    cls = getattr(graph_objects, str(data[f"{label}.class"]))
+    hints = get_type_hints(cls)
+    columns = {}
+    for field in fields(cls):
+        column = data[f"{label}.{field.name}"].tolist()
+        if hints[field.name] == Optional[int]:
+            mask = data[f"{label}.{field.name}.null"]
+            column = [None if null else value for value, null in zip(column, mask)]
+        columns[field.name] = column
+    return [cls(**dict(zip(columns, values))) for values in zip(*columns.values())]
+
+
+def save_state(traversal, filepath: Union[str, Path]) -> None:
+    """
+    Save the state of `traversal` to `filepath`.
+
+    Parameters
+    ----------
+    traversal : NewNodeEachVisitGraphTraversal
+        Graph traversal to save
+    filepath : str or pathlib.Path
+        File to write; numpy adds the ``.npz`` suffix if missing.
+
+    """
+    arrays = {
+        "format_version": np.array(FORMAT_VERSION),
+        "settings.class": np.array(type(traversal.settings).__name__),
+        "settings": np.array(json.dumps(traversal.settings.model_dump(exclude=UNSAVED_SETTINGS))),
+        "functional_unit_unique_id": np.array(traversal._functional_unit_unique_id),
+        "static_activity_indices": np.array(
+            sorted(traversal.static_activity_indices), dtype=np.int64
+        ),
+        "calculation_count": np.array(traversal._calculation_count.value),
+        "max_calc": np.array(traversal._max_calc),
+        "heap.max_depth": np.array(
+            -1 if traversal._heap_max_depth is None else traversal._heap_max_depth
+        ),
+        "heap.priority": np.array([priority for priority, _ in traversal._heap], dtype=float),
+        "heap.unique_id": np.array([node.unique_id for _, node in traversal._heap], dtype=np.int64),
+        "production_exchange_mapping": np.array(
+            list(traversal.production_exchange_mapping.items()), dtype=np.int64
+        ).reshape((-1, 2)),
+    }
+    cache = getattr(traversal._caching_solver, "_score_cache", {})
+    arrays["score_cache.index"] = np.array(list(cache), dtype=np.int64)
+    arrays["score_cache.score"] = np.array(list(cache.values()), dtype=float)
+
+    _objects_to_arrays("nodes", list(traversal._nodes.values()), arrays)
+    _objects_to_arrays("edges", traversal._edges, arrays)
+    _objects_to_arrays("flows", traversal._flows, arrays)
+    records = getattr(traversal, "_flow_records", None)
+    if records is not None:
+        arrays["flow_records.unique_id"] = records.unique_ids
+        arrays["flow_records.activity_index"] = records.activity_indices
+        arrays["flow_records.scale"] = records.scales
+
+    np.savez_compressed(filepath, **arrays)
+
+
+def load_state(cls, filepath: Union[str, Path], lca, settings=None):
+    """
+    Create an instance of the traversal class `cls` with the state saved in `filepath`.
+
+    See `NewNodeEachVisitGraphTraversal.load_state`.
+    """
+    with np.load(filepath, allow_pickle=False) as data:
+        if int(data["format_version"]) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported traversal state version {int(data['format_version'])}")
+        if settings is None:
+            settings_class = getattr(settings_module, str(data["settings.class"]))
+            settings = settings_class(**json.loads(str(data["settings"])))
+
+        instance = cls(
+            lca,
+            settings,
+            functional_unit_unique_id=int(data["functional_unit_unique_id"]),
+            static_activity_indices=set(data["static_activity_indices"].tolist()),
+            production_exchange_mapping=dict(data["production_exchange_mapping"].tolist()),
+        )
+        counter = Counter()
+        counter.value = int(data["calculation_count"])
+        instance._calculation_count = counter
+        instance._max_calc = int(data["max_calc"])
+
+        nodes = _arrays_to_objects("nodes", data)
+        instance._nodes = {node.unique_id: node for node in nodes}
+        instance._root_node = instance._nodes.get(
+            instance._functional_unit_unique_id, instance._root_node
+        )
+        instance._edges = _arrays_to_objects("edges", data)
+        instance._flows = _arrays_to_objects("flows", data)
+        instance._reset_bookkeeping()
+        if instance._flow_records is not None and "flow_records.unique_id" in data.files:
+            instance._flow_records.add_many(
+                data["flow_records.unique_id"].tolist(),
+                data["flow_records.activity_index"].tolist(),
+                data["flow_records.scale"].tolist(),
+            )
+
+        # Pushing in the saved order restores the same queue, including the order of ties
+        instance._heap = instance._new_queue()
+        instance._heap.push_many(
+            data["heap.priority"].tolist(),
+            [instance._nodes[unique_id] for unique_id in data["heap.unique_id"].tolist()],
+        )
+        max_depth = int(data["heap.max_depth"])
+        instance._heap_max_depth = None if max_depth == -1 else max_depth
+
+        if hasattr(instance._caching_solver, "add_to_cache"):
+            for index, score in zip(
+                data["score_cache.index"].tolist(), data["score_cache.score"].tolist()
+            ):
+                instance._caching_solver.add_to_cache(index, score)
+    instance._restore_state()
+    return instance
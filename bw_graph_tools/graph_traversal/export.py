@@ -0,0 +1,178 @@
+"""
+Columnar export of graph traversal results to Arrow IPC or Parquet files.
+
+Requires the optional dependency `pyarrow` (``pip install bw_graph_tools[arrow]``).
+"""
+
+from dataclasses import fields
+from pathlib import Path
+from typing import Dict, Optional, Union, get_type_hints
+
+from bw_graph_tools.graph_traversal.graph_objects import Edge, Flow, Node
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+TABLES = ("nodes", "edges", "flows")
+FORMATS = {"arrow": ".arrow", "parquet": ".parquet"}
+DEFAULT_CLASSES = {"nodes": Node, "edges": Edge, "flows": Flow}
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError(
+            "Exporting traversal results requires `pyarrow`; install it with "
+            "`pip install bw_graph_tools[arrow]`"
+        )
+
+
+def _arrow_type(annotation):
+    if annotation is bool:
+        return pa.bool_()
+    elif annotation is float:
+        return pa.float64()
+    elif annotation is int or annotation == Optional[int]:
+        return pa.int64()
+    raise ValueError(f"Can't export dataclass fields of type {annotation}")
+
+
+def objects_to_table(objects: list, cls: Optional[type] = None) -> "pa.Table":
+    """
+    Convert a list of dataclass instances (`Node`, `Edge`, or `Flow`) to an Arrow table, with
+    one column per dataclass field.
+
+    Parameters
+    ----------
+    objects : list
+        Dataclass instances, all of the same class
+    cls : type
+        Dataclass to take the schema from. Defaults to the class of the first object.
+
+    Returns
+    -------
+    pyarrow.Table
+
+    """
+    _require_pyarrow()
+    if cls is None:
+        cls = type(objects[0])
+    hints = get_type_hints(cls)
+    columns = {}
+    for field in fields(cls):
+        arrow_type = _arrow_type(hints[field.name])
+        columns[field.name] = pa.array(
+            [getattr(obj, field.name) for obj in objects], type=arrow_type
+        )
+    return pa.table(columns)
+
+
+def traversal_to_tables(traversal) -> Dict[str, "pa.Table"]:
+    """
+    Convert the `nodes`, `edges`, and `flows` of a graph traversal to Arrow tables.
+
+    Returns
+    -------
+    dict
+        Arrow tables with keys `nodes`, `edges`, and `flows`
+
+    """
+    objects = {
+        "nodes": list(traversal._nodes.values()),
+        "edges": traversal._edges,
+        "flows": traversal.flows,
+    }
+    return {
+        label: objects_to_table(objs, None if objs else DEFAULT_CLASSES[label])
+        for label, objs in objects.items()
+    }
+
+
+def export_traversal(
+    traversal, directory: Union[str, Path], format: str = "arrow"
+) -> Dict[str, Path]:
+    """
+    Write the `nodes`, `edges`, and `flows` of a graph traversal to `directory`, as one file
+    per table.
+
+    Parameters
+    ----------
+    traversal : BaseGraphTraversal
+        Graph traversal instance with results
+    directory : str or pathlib.Path
+        Directory for the files; created if needed. Existing files are overwritten.
+    format : str
+        Either ``"arrow"`` for Arrow IPC files, which can be memory-mapped without copying, or
+        ``"parquet"`` for smaller, compressed files.
+
+    Returns
+    -------
+    dict
+        File paths with keys `nodes`, `edges`, and `flows`
+
+    """
+    _require_pyarrow()
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format {format}; must be one of {sorted(FORMATS)}")
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    filepaths = {}
+    for label, table in traversal_to_tables(traversal).items():
+        filepath = directory / (label + FORMATS[format])
+        if format == "arrow":
+            with pa.OSFile(str(filepath), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        else:
+            pq.write_table(table, filepath)
+        filepaths[label] = filepath
+    return filepaths
+
+
+def load_traversal_results(
+    directory: Union[str, Path], format: Optional[str] = None
+) -> Dict[str, "pa.Table"]:
+    """
+    Load graph traversal results written by `export_traversal`.
+
+    Arrow IPC files are memory-mapped, so the returned tables reference the file contents
+    without copying them. Parquet files have to be decompressed, but are read from a memory
+    map.
+
+    Parameters
+    ----------
+    directory : str or pathlib.Path
+        Directory with the exported files
+    format : str
+        ``"arrow"`` or ``"parquet"``. Detected from the files in `directory` if not given.
+
+    Returns
+    -------
+    dict
+        Arrow tables with keys `nodes`, `edges`, and `flows`. Use e.g.
+        ``tables["nodes"].to_pandas()`` to get dataframes.
+
+    """
+    _require_pyarrow()
+    directory = Path(directory)
+    if format is None:
+        format = next(
+            (key for key, suffix in FORMATS.items() if (directory / f"nodes{suffix}").exists()),
+            None,
+        )
+        if format is None:
+            raise FileNotFoundError(f"No exported traversal results in {directory}")
+    elif format not in FORMATS:
+        raise ValueError(f"Unknown format {format}; must be one of {sorted(FORMATS)}")
+
+    tables = {}
+    for label in TABLES:
+        filepath = directory / (label + FORMATS[format])
+        if format == "arrow":
+            tables[label] = pa.ipc.open_file(pa.memory_map(str(filepath), "r")).read_all()
+        else:
+            tables[label] = pq.read_table(filepath, memory_map=True)
+    return tables
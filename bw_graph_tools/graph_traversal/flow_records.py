@@ -0,0 +1,189 @@
+"""
+Compact records of the nodes whose biosphere flows are separated, from which `Flow` instances are
+created on demand.
+
+With `GraphTraversalSettings.lazy_flows`, the traversal doesn't create a `Flow` for every
+characterized biosphere flow above the biosphere cutoff. It only records the `unique_id`,
+activity index, and supply amount of each node, in `FlowRecords`, and calculates the total score
+of its separate flows from the characterized biosphere matrix. The `Flow` instances are
+created from these records when needed, e.g. the top N flows of the whole graph, or the flows of
+one node.
+"""
+
+from array import array
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from bw_graph_tools.graph_traversal.graph_objects import Flow, Node
+
+
+class FlowRecords:
+    """
+    Record of the nodes whose biosphere flows are separated, with one entry per node.
+
+    A `Flow` is created for each nonzero element of the characterized biosphere matrix in the
+    activity column of a recorded node whose score, scaled by the supply amount of the node, has
+    an absolute value above `biosphere_cutoff_score`. These are the same `Flow` instances, in the
+    same order, as `NewNodeEachVisitGraphTraversal.add_biosphere_flows` creates.
+
+    Parameters
+    ----------
+    lca : bw2calc.LCA
+        LCA class instance, for the biosphere matrix and the biosphere flow ids
+    characterized_biosphere : scipy.sparse.spmatrix
+        Characterized biosphere matrix (biosphere flows by activities)
+    biosphere_cutoff_score : float
+        Score below which individual characterized biosphere flows are ignored
+    """
+
+    def __init__(self, lca, characterized_biosphere, biosphere_cutoff_score: float):
+        self.lca = lca
+        self.characterized_biosphere = characterized_biosphere.tocsc()
+        self.characterized_biosphere.sort_indices()
+        self.biosphere_cutoff_score = biosphere_cutoff_score
+        self._biosphere = None
+        self._unique_ids = array("q")
+        self._activity_indices = array("q")
+        self._scales = array("d")
+        # All flows, sorted by decreasing score; reset when records change
+        self._flows: Optional[List[Flow]] = None
+
+    def __len__(self) -> int:
+        """Number of recorded nodes."""
+        return len(self._unique_ids)
+
+    def add(self, node: Node) -> float:
+        """
+        Record the flows of `node`, and return the total score of its separate flows.
+        """
+        matrix = self.characterized_biosphere
+        start, end = matrix.indptr[node.activity_index], matrix.indptr[node.activity_index + 1]
+        scores = matrix.data[start:end] * node.supply_amount
+        self._unique_ids.append(node.unique_id)
+        self._activity_indices.append(node.activity_index)
+        self._scales.append(node.supply_amount)
+        self._flows = None
+        return float(scores[np.abs(scores) > self.biosphere_cutoff_score].sum())
+
+    def add_many(
+        self, unique_ids: Iterable[int], activity_indices: Iterable[int], scales: Iterable[float]
+    ) -> np.ndarray:
+        """
+        Record the flows of several nodes, and return the total score of the separate flows of
+        each node.
+        """
+        start = len(self)
+        self._unique_ids.extend(unique_ids)
+        self._activity_indices.extend(activity_indices)
+        self._scales.extend(scales)
+        self._flows = None
+        positions = np.arange(start, len(self))
+        record, _, scores = self._entries(positions)
+        return np.bincount(record, weights=scores, minlength=len(positions))
+
+    def remove(self, unique_ids: Iterable[int]) -> None:
+        """Remove the records of the nodes with `unique_ids`."""
+        keep = ~np.isin(self.unique_ids, np.fromiter(unique_ids, dtype=np.int64))
+        self._unique_ids = array("q", self.unique_ids[keep].tobytes())
+        self._activity_indices = array("q", self.activity_indices[keep].tobytes())
+        self._scales = array("d", self.scales[keep].tobytes())
+        self._flows = None
+
+    def clear(self) -> None:
+        self._unique_ids = array("q")
+        self._activity_indices = array("q")
+        self._scales = array("d")
+        self._flows = None
+
+    @property
+    def unique_ids(self) -> np.ndarray:
+        return np.frombuffer(self._unique_ids, dtype=np.int64)
+
+    @property
+    def activity_indices(self) -> np.ndarray:
+        return np.frombuffer(self._activity_indices, dtype=np.int64)
+
+    @property
+    def scales(self) -> np.ndarray:
+        return np.frombuffer(self._scales, dtype=float)
+
+    def _entries(self, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the position in `positions`, biosphere row, and score of each flow above the
+        cutoff of the records at `positions`, in record and then row order.
+        """
+        matrix = self.characterized_biosphere
+        activities = self.activity_indices[positions]
+        starts = matrix.indptr[activities]
+        counts = matrix.indptr[activities + 1] - starts
+        record = np.repeat(np.arange(len(positions)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        entries = starts[record] + offsets
+        scores = matrix.data[entries] * self.scales[positions][record]
+        keep = np.abs(scores) > self.biosphere_cutoff_score
+        return record[keep], matrix.indices[entries][keep], scores[keep]
+
+    def _to_flows(
+        self, positions: np.ndarray, record: np.ndarray, rows: np.ndarray, scores: np.ndarray
+    ) -> List[Flow]:
+        if self._biosphere is None:
+            self._biosphere = self.lca.biosphere_matrix.tocsr()
+        records = positions[record]
+        activities = self.activity_indices[records]
+        amounts = (
+            np.asarray(self._biosphere[rows, activities]).ravel() * self.scales[records]
+            if len(rows)
+            else np.zeros(0)
+        )
+        flow_ids = self.lca.dicts.biosphere.reversed
+        activity_ids = self.lca.dicts.activity.reversed
+        return [
+            Flow(
+                flow_datapackage_id=flow_ids[row],
+                flow_index=row,
+                activity_unique_id=unique_id,
+                activity_id=activity_ids[activity],
+                activity_index=activity,
+                amount=amount,
+                score=score,
+            )
+            for row, unique_id, activity, amount, score in zip(
+                rows.tolist(),
+                self.unique_ids[records].tolist(),
+                activities.tolist(),
+                amounts.tolist(),
+                scores.tolist(),
+            )
+        ]
+
+    def _sorted_flows(self, positions: np.ndarray, limit: Optional[int] = None) -> List[Flow]:
+        """Flows of the records at `positions`, sorted by decreasing score."""
+        if limit is not None and limit <= 0:
+            return []
+        record, rows, scores = self._entries(positions)
+        if limit is not None and limit < len(scores):
+            # Only sort the flows which could be in the top `limit`
+            threshold = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            candidates = np.flatnonzero(scores >= threshold)
+        else:
+            candidates = np.arange(len(scores))
+        # Stable, so ties keep the order in which the flows were found
+        order = candidates[np.argsort(-scores[candidates], kind="stable")][:limit]
+        return self._to_flows(positions, record[order], rows[order], scores[order])
+
+    def flows(self) -> List[Flow]:
+        """All flows, sorted by decreasing score. Cached until the records change."""
+        if self._flows is None:
+            self._flows = self._sorted_flows(np.arange(len(self)))
+        return self._flows
+
+    def top(self, n: int) -> List[Flow]:
+        """The `n` flows with the highest scores, sorted by decreasing score."""
+        if self._flows is not None:
+            return self._flows[:n]
+        return self._sorted_flows(np.arange(len(self)), limit=n)
+
+    def for_node(self, unique_id: int) -> List[Flow]:
+        """The flows of the node with `unique_id`, sorted by decreasing score."""
+        return self._sorted_flows(np.flatnonzero(self.unique_ids == unique_id))
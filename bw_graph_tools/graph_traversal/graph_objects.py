@@ -1,6 +1,10 @@
 from dataclasses import dataclass
 from typing import List, Optional
 
+# `activity_index` and `reference_product_index` of remainder nodes, which aggregate evicted
+# nodes; see `NewNodeEachVisitGraphTraversal.evict_nodes`
+REMAINDER_INDEX = -2
+
 
 @dataclass
 class Node:
@@ -118,6 +122,23 @@ class Edge:
     amount: float
 
 
+@dataclass
+class SharedEdge(Edge):
+    """
+    An `Edge` in a graph where each producer `Node` can be shared by several consumers. See
+    `SharedSubtreeGraphTraversal`.
+
+    Parameters
+    ----------
+    multiplicity : float
+        The amount of the product demanded per unit of consumer `supply_amount`. Unlike
+        `amount`, this doesn't depend on how much of the consumer is supplied, and can be used
+        to unroll the shared graph.
+    """
+
+    multiplicity: float = 0.0
+
+
 @dataclass
 class Flow:
     """
@@ -0,0 +1,324 @@
+import warnings
+from typing import List, Optional
+
+import numpy as np
+from scipy.sparse import diags
+
+from bw_graph_tools.graph_traversal.base import BaseGraphTraversal
+from bw_graph_tools.graph_traversal.graph_objects import Edge, Flow, Node
+from bw_graph_tools.graph_traversal.new_node_each_visit import NewNodeEachVisitGraphTraversal
+from bw_graph_tools.graph_traversal.rescoring import _matrix_values
+from bw_graph_tools.graph_traversal.settings import LayerwiseGraphTraversalSettings
+
+
+class _MatrixLookup:
+    """Arrays and matrix formats used to expand a whole layer at once."""
+
+    def __init__(self, traversal):
+        lca = traversal.lca
+        self.technosphere = lca.technosphere_matrix.tocsc()
+        self.characterized_biosphere = traversal.characterized_biosphere.tocsc()
+        self.biosphere = lca.biosphere_matrix.tocsr()
+        self.score_row = np.asarray(self.characterized_biosphere.sum(axis=0)).ravel()
+
+        products, activities = self.technosphere.shape
+        self.producers = np.full(products, -1, dtype=np.int64)
+        mapping = traversal.production_exchange_mapping
+        if mapping:
+            self.producers[np.fromiter(mapping.keys(), dtype=np.int64)] = np.fromiter(
+                mapping.values(), dtype=np.int64
+            )
+        mapped = np.flatnonzero(self.producers >= 0)
+        self.production_amounts = np.zeros(products)
+        self.production_amounts[mapped] = _matrix_values(
+            self.technosphere.tocsr(), mapped, self.producers[mapped]
+        )
+
+        self.activity_ids = np.array([lca.dicts.activity.reversed[i] for i in range(activities)])
+        self.product_ids = np.array([lca.dicts.product.reversed[i] for i in range(products)])
+        self.flow_ids = np.array(
+            [lca.dicts.biosphere.reversed[i] for i in range(self.biosphere.shape[0])]
+        )
+        self.static = np.zeros(activities, dtype=bool)
+        self.static[list(traversal.static_activity_indices)] = True
+
+
+class LayerwiseGraphTraversal(
+    NewNodeEachVisitGraphTraversal,
+    BaseGraphTraversal[LayerwiseGraphTraversalSettings],
+):
+    """
+    Unrolled graph traversal which expands the supply chain one layer at a time.
+
+    `NewNodeEachVisitGraphTraversal` runs Python code for every node it expands. This class
+    expands all nodes of the current frontier together: the inputs of all frontier nodes are
+    one slice of the technosphere matrix, and their amounts, cumulative scores, cutoff
+    filtering, direct emissions and biosphere flows are calculated with array operations over
+    the whole layer. Cumulative scores come from a single transposed solve for all products
+    (see `CachingSolver.all_unit_scores`), or, if
+    `LayerwiseGraphTraversalSettings.transposed_unit_scores` is false, from one batched call to
+    the caching solver per layer.
+
+    The result has the same nodes, edges, and flows as `NewNodeEachVisitGraphTraversal`, as
+    long as the traversal isn't stopped by `settings.max_calc`; only the `unique_id` values
+    differ, as nodes are numbered layer by layer. `max_calc` is checked before each layer,
+    so the traversal can create up to one layer more than `max_calc` nodes, and stops at a
+    depth instead of following the most important paths first. Nodes which were not expanded
+    are kept, and can be expanded with `resume`.
+
+    This is fastest for wide, shallow traversals with small cutoffs, where each layer has many
+    nodes.
+    """
+
+    _supports_eviction = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Built by the first traversal, and kept for `resume` and traversals from nodes
+        self._lookup: Optional[_MatrixLookup] = None
+
+    def traverse(
+        self,
+        nodes: Optional[List[Node]] = None,
+        depth: Optional[int] = None,
+        reset_results: bool = False,
+    ) -> None:
+        """
+        Perform the graph traversal; see `NewNodeEachVisitGraphTraversal.traverse`. Resetting the
+        results also rebuilds the matrix lookup.
+        """
+        if reset_results:
+            self._lookup = None
+        super().traverse(nodes=nodes, depth=depth, reset_results=reset_results)
+
+    def rescore(self, method: tuple) -> None:
+        """
+        Recalculate all scores for the impact assessment `method`; see
+        `NewNodeEachVisitGraphTraversal.rescore`. Also rebuilds the matrix lookup, which holds
+        the characterized biosphere matrix, on the next traversal.
+        """
+        self._lookup = None
+        super().rescore(method)
+
+    def _traverse(self, heap, max_depth: Optional[int] = None):
+        """
+        Traverse the graph layer by layer.
+
+        Parameters
+        ----------
+        heap:
+            priority queue of nodes to traverse; the priority is ignored
+        max_depth:
+            global maximum depth to traverse
+        """
+        self._heap = heap
+        self._heap_max_depth = max_depth
+        if self._lookup is None:
+            self._lookup = _MatrixLookup(self)
+        lookup = self._lookup
+        frontier = [node for _, node in heap]
+        heap.clear()
+        while frontier:
+            if self.exceeded_calculation_count:
+                warnings.warn("Stopping traversal due to calculation count.")
+                heap.push_many([abs(1 / node.cumulative_score) for node in frontier], frontier)
+                break
+            frontier = self._expand_layer(frontier, lookup, max_depth or self.settings.max_depth)
+
+    def _layer_inputs(self, frontier: List[Node], lookup: _MatrixLookup):
+        """Return frontier positions, product indices, and amounts of all inputs of `frontier`."""
+        positions, products, amounts = [], [], []
+        others = []
+        for position, node in enumerate(frontier):
+            if node is self._root_node:
+                for key, amount in self.lca.demand.items():
+                    positions.append(position)
+                    products.append(self.lca.dicts.product[key])
+                    amounts.append(amount)
+            else:
+                others.append(position)
+        positions = np.array(positions, dtype=np.int64)
+        products = np.array(products, dtype=np.int64)
+        amounts = np.array(amounts, dtype=float)
+        if not others:
+            return positions, products, amounts
+
+        others = np.array(others, dtype=np.int64)
+        activities = np.array([frontier[i].activity_index for i in others], dtype=np.int64)
+        reference_products = np.array(
+            [frontier[i].reference_product_index for i in others], dtype=np.int64
+        )
+        supplies = np.array([frontier[i].supply_amount for i in others], dtype=float)
+
+        columns = lookup.technosphere[:, activities]
+        column = np.repeat(np.arange(len(others)), np.diff(columns.indptr))
+        rows = columns.indices.astype(np.int64)
+        values = -1 * supplies[column] * columns.data
+        keep = (rows != reference_products[column]) & (values != 0)
+        if self.settings.skip_coproducts:
+            keep &= values >= 0
+        return (
+            np.concatenate([positions, others[column[keep]]]),
+            np.concatenate([products, rows[keep]]),
+            np.concatenate([amounts, values[keep]]),
+        )
+
+    def _unit_scores(self, products: np.ndarray) -> np.ndarray:
+        """Cumulative score per unit of each of `products`."""
+        if self.settings.transposed_unit_scores and hasattr(
+            self._caching_solver, "all_unit_scores"
+        ):
+            return self._caching_solver.all_unit_scores()[products]
+        unique, inverse = np.unique(products, return_inverse=True)
+        scores = self.get_cumulative_scores(
+            caching_solver=self._caching_solver,
+            characterized_biosphere=self.characterized_biosphere,
+            product_indices=unique.tolist(),
+            product_amounts=[1.0] * len(unique),
+        )
+        return np.asarray(scores, dtype=float)[inverse]
+
+    def _expand_layer(
+        self, frontier: List[Node], lookup: _MatrixLookup, max_depth: Optional[int]
+    ) -> List[Node]:
+        """Create the producer nodes, edges, and flows for all inputs of `frontier`."""
+        positions, products, amounts = self._layer_inputs(frontier, lookup)
+        if not len(products):
+            return []
+        producers = lookup.producers[products]
+        if (producers < 0).any():
+            raise KeyError(int(products[producers < 0][0]))
+
+        cumulative = self._unit_scores(products) * amounts
+        keep = ~(np.abs(cumulative) < self.cutoff_score)
+        positions, products, amounts = positions[keep], products[keep], amounts[keep]
+        producers, cumulative = producers[keep], cumulative[keep]
+        count = len(products)
+        if not count:
+            return []
+
+        production = lookup.production_amounts[products]
+        scale = amounts / production
+        direct = scale * lookup.score_row[producers]
+
+        start = self._calculation_count.value + 1
+        unique_ids = np.arange(start, start + count)
+        self._calculation_count.value += count
+
+        flow_scores = np.zeros(count)
+        if self._flow_records is not None:
+            flow_scores = self._flow_records.add_many(
+                unique_ids.tolist(), producers.tolist(), scale.tolist()
+            )
+        elif self.settings.separate_biosphere_flows:
+            flow_scores = self._add_layer_flows(lookup, unique_ids, producers, scale)
+
+        consumers = [frontier[i] for i in positions.tolist()]
+        depths = np.array([node.depth for node in consumers], dtype=np.int64) + 1
+        local_max_depths = [node.max_depth for node in consumers]
+        if max_depth is None:
+            satisfies_depth = np.ones(count, dtype=bool)
+        else:
+            satisfies_depth = depths < max_depth
+        local = np.array([value is not None for value in local_max_depths], dtype=bool)
+        if local.any():
+            limits = np.array([-1 if value is None else value for value in local_max_depths])
+            satisfies_depth[local] = limits[local] > depths[local]
+        expand = satisfies_depth & ~lookup.static[producers]
+
+        next_frontier = []
+        for (
+            unique_id,
+            consumer,
+            producer,
+            product,
+            amount,
+            production_amount,
+            supply,
+            depth,
+            local_max_depth,
+            cumulative_score,
+            direct_score,
+            flow_score,
+            expanded,
+        ) in zip(
+            unique_ids.tolist(),
+            consumers,
+            producers.tolist(),
+            products.tolist(),
+            amounts.tolist(),
+            production.tolist(),
+            scale.tolist(),
+            depths.tolist(),
+            local_max_depths,
+            cumulative.tolist(),
+            direct.tolist(),
+            flow_scores.tolist(),
+            expand.tolist(),
+        ):
+            node = Node(
+                unique_id=unique_id,
+                activity_datapackage_id=lookup.activity_ids[producer].item(),
+                activity_index=producer,
+                reference_product_datapackage_id=lookup.product_ids[product].item(),
+                reference_product_index=product,
+                reference_product_production_amount=production_amount,
+                supply_amount=supply,
+                depth=depth,
+                max_depth=local_max_depth,
+                cumulative_score=cumulative_score,
+                direct_emissions_score=direct_score,
+                direct_emissions_score_outside_specific_flows=direct_score - flow_score,
+                remaining_cumulative_score_outside_specific_flows=cumulative_score - flow_score,
+                terminal=True,
+            )
+            self._nodes[unique_id] = node
+            self._edges.append(
+                Edge(
+                    consumer_index=consumer.activity_index,
+                    consumer_unique_id=consumer.unique_id,
+                    producer_index=producer,
+                    producer_unique_id=unique_id,
+                    product_index=product,
+                    amount=amount,
+                )
+            )
+            consumer.terminal = False
+            if expanded:
+                next_frontier.append(node)
+        if self._covered_score is not None:
+            self._covered_score += float(direct.sum())
+        return next_frontier
+
+    def _add_layer_flows(
+        self,
+        lookup: _MatrixLookup,
+        unique_ids: np.ndarray,
+        producers: np.ndarray,
+        scale: np.ndarray,
+    ) -> np.ndarray:
+        """Add `Flow` instances for all new nodes; return the flow score of each node."""
+        matrix = (lookup.characterized_biosphere[:, producers] @ diags(scale)).tocoo()
+        keep = np.abs(matrix.data) > self.biosphere_cutoff_score
+        rows, columns, scores = matrix.row[keep], matrix.col[keep], matrix.data[keep]
+        nodes = producers[columns]
+        amounts = _matrix_values(lookup.biosphere, rows, nodes) * scale[columns]
+        self._flows.extend(
+            Flow(
+                flow_datapackage_id=lookup.flow_ids[row].item(),
+                flow_index=row,
+                activity_unique_id=unique_id,
+                activity_id=lookup.activity_ids[activity].item(),
+                activity_index=activity,
+                amount=amount,
+                score=score,
+            )
+            for row, unique_id, activity, amount, score in zip(
+                rows.tolist(),
+                unique_ids[columns].tolist(),
+                nodes.tolist(),
+                amounts.tolist(),
+                scores.tolist(),
+            )
+        )
+        return np.bincount(columns, weights=scores, minlength=len(producers))
@@ -1,5 +1,7 @@
+import sys
 import warnings
-from heapq import heappop, heappush
+from collections import defaultdict
+from operator import attrgetter
 from typing import Dict, List, Optional
 
 import matrix_utils as mu
@@ -8,17 +10,21 @@ from bw2calc import LCA
 from scipy.sparse import spmatrix
 from typing_extensions import deprecated
 
-try:
-    from bw2data import databases
-except ImportError:
-    databases = {}
-
-from bw_graph_tools.graph_traversal.base import BaseGraphTraversal
-from bw_graph_tools.graph_traversal.graph_objects import Edge, Flow, Node
+from bw_graph_tools.graph_traversal.adjacency import AdjacencyIndex
+from bw_graph_tools.graph_traversal.base import BaseGraphTraversal, GraphTraversalException
+from bw_graph_tools.graph_traversal.flow_records import FlowRecords
+from bw_graph_tools.graph_traversal.graph_objects import REMAINDER_INDEX, Edge, Flow, Node
+from bw_graph_tools.graph_traversal.priority_queue import (
+    PRIORITY_QUEUES,
+    queue_pop,
+    queue_push,
+    queue_push_many,
+)
 from bw_graph_tools.graph_traversal.settings import GraphTraversalSettings
 from bw_graph_tools.graph_traversal.utils import (
     CachingSolver,
     Counter,
+    TraversalProfiler,
     get_demand_vector_for_activity,
 )
 from bw_graph_tools.matrix_tools import guess_production_exchanges
@@ -79,24 +85,138 @@ class NewNodeEachVisitGraphTraversal(BaseGraphTraversal[GraphTraversalSettings])
 
     """
 
-    def __init__(self, *args, **kwargs):
+    # Whether `settings.max_nodes` and `settings.max_memory` can be used; subclasses whose
+    # nodes can have several consumers, or which keep other references to nodes, can't
+    # evict nodes.
+    _supports_eviction = True
+    # Fraction of the node or memory budget kept after evicting nodes
+    EVICTION_TARGET = 0.8
+    # Whether `settings.lazy_flows` can be used
+    _supports_lazy_flows = True
+
+    def __init__(self, *args, production_exchange_mapping: Optional[dict] = None, **kwargs):
         super().__init__(*args, **kwargs)
+        self._budgeted = self.settings.max_nodes is not None or self.settings.max_memory is not None
+        if self._budgeted and not self._supports_eviction:
+            raise GraphTraversalException(
+                f"{type(self).__name__} doesn't support `max_nodes` or `max_memory`"
+            )
+        if self.settings.lazy_flows and not self._supports_lazy_flows:
+            raise GraphTraversalException(f"{type(self).__name__} doesn't support `lazy_flows`")
         total_score = self.lca.score
         if total_score == 0:
             raise ValueError("Zero total LCA score makes traversal impossible")
 
         self.cutoff_score = abs(total_score * self.settings.cutoff)
         self.biosphere_cutoff_score = abs(total_score * self.settings.biosphere_cutoff)
-        self.production_exchange_mapping = {
-            x: y
-            for x, y in zip(*self.get_production_exchanges(self.lca.technosphere_mm))
-        }
+        if production_exchange_mapping is None:
+            production_exchange_mapping = {
+                x: y
+                for x, y in zip(*self.get_production_exchanges(self.lca.technosphere_mm))
+            }
+        self.production_exchange_mapping = production_exchange_mapping
         self._calculation_count = Counter()
+        if self.settings.priority_queue not in PRIORITY_QUEUES:
+            raise ValueError(
+                f"Unknown priority queue {self.settings.priority_queue}; must be one of "
+                f"{sorted(PRIORITY_QUEUES)}"
+            )
+        self._heap = self._new_queue()
+        self._heap_max_depth = None
         self.characterized_biosphere = self.get_characterized_biosphere(self.lca)
         # Give the solver the score row it needs to reduce supply vectors to cumulative scores
         # in its batched `scores` method. Guarded so custom solvers without this method still work.
         if hasattr(self._caching_solver, "set_score_row"):
             self._caching_solver.set_score_row(self.characterized_biosphere)
+        self._flow_records = self._new_flow_records()
+        # Terminal flags, coverage, and flow order are updated as nodes, edges, and flows are
+        # added; see `_finalize_traversal`
+        self._root_node.terminal = True
+        self._covered_score = 0.0
+        self._adjacency = None
+
+        # Queue operations are looked up on the instance so that they can be profiled
+        self._heappush = queue_push
+        self._heappush_many = queue_push_many
+        self._heappop = queue_pop
+        self._profiler = None
+        if self.settings.profile or self.settings.profile_callback is not None:
+            self._enable_profiling()
+
+    def _enable_profiling(self) -> None:
+        """Replace the methods of each traversal phase with timed versions on this instance."""
+        self._profiler = profiler = TraversalProfiler(callback=self.settings.profile_callback)
+        self.get_demand_vector_for_activity = profiler.wrap(
+            "get_demand_vector_for_activity", self.get_demand_vector_for_activity
+        )
+        self.get_cumulative_scores = profiler.wrap("scores", self.get_cumulative_scores)
+        self.add_biosphere_flows = profiler.wrap("add_biosphere_flows", self.add_biosphere_flows)
+        self.traverse_edges = profiler.wrap("traverse_edges", self.traverse_edges)
+        self._heappush = profiler.wrap("heappush", queue_push)
+        self._heappush_many = profiler.wrap("heappush", queue_push_many)
+        self._heappop = profiler.wrap("heappop", queue_pop)
+
+    def _new_flow_records(self) -> Optional[FlowRecords]:
+        """Create empty `FlowRecords` if flows are created lazily, otherwise return `None`."""
+        if not (self.settings.lazy_flows and self.settings.separate_biosphere_flows):
+            return None
+        return FlowRecords(self.lca, self.characterized_biosphere, self.biosphere_cutoff_score)
+
+    @property
+    def flows(self) -> List[Flow]:
+        """
+        List of `Flow` instances, sorted by decreasing score.
+
+        A `Flow` instance is a *characterized biosphere flow* associated with a specific `Node`
+        instance. With `settings.lazy_flows`, the list is created from the flow records when
+        first accessed; use `top_flows` or `node_flows` to only create the flows you need.
+
+        See the `Flow` documentation for its other attributes.
+        """
+        if self._flow_records is not None:
+            return self._flow_records.flows()
+        return self._flows
+
+    def top_flows(self, n: int) -> List[Flow]:
+        """
+        The `n` `Flow` instances with the highest scores, sorted by decreasing score.
+
+        With `settings.lazy_flows`, only these `n` flows are created.
+        """
+        if self._flow_records is not None:
+            return self._flow_records.top(n)
+        return self._flows[:n]
+
+    def node_flows(self, unique_id: int) -> List[Flow]:
+        """
+        The `Flow` instances of the node with `unique_id`, sorted by decreasing score.
+        """
+        if self._flow_records is not None:
+            return self._flow_records.for_node(unique_id)
+        return [flow for flow in self._flows if flow.activity_unique_id == unique_id]
+
+    @property
+    def adjacency(self) -> AdjacencyIndex:
+        """
+        Index of `edges` by consumer, producer, and activity, for finding the children (sorted
+        by score, with pagination), parents, and path to the functional unit of a node, or all
+        nodes of an activity, without scanning all edges. See `AdjacencyIndex`.
+        """
+        if self._adjacency is None:
+            self._adjacency = AdjacencyIndex(self)
+        return self._adjacency
+
+    def _new_queue(self):
+        """Create an empty priority queue of the type given in `settings.priority_queue`."""
+        return PRIORITY_QUEUES[self.settings.priority_queue]()
+
+    @property
+    def stats(self) -> Optional[TraversalProfiler]:
+        """
+        Number of calls and time spent per traversal phase, accumulated over all traversals.
+        `None` unless `settings.profile` is true. See `TraversalProfiler`.
+        """
+        return self._profiler
 
     @classmethod
     @deprecated(
@@ -303,6 +423,10 @@ class NewNodeEachVisitGraphTraversal(BaseGraphTraversal[GraphTraversalSettings])
             self._nodes: Dict[int, Node] = {}
             self._edges: List[Edge] = []
             self._flows: List[Flow] = []
+            if self._flow_records is not None:
+                self._flow_records.clear()
+            self._root_node.terminal = True
+            self._covered_score = 0.0
             self._max_calc = self.settings.max_calc
         elif self.calculation_count > 0:
             # Have already done traversal; need to bump maximum number of maximum calculations
@@ -310,16 +434,22 @@ class NewNodeEachVisitGraphTraversal(BaseGraphTraversal[GraphTraversalSettings])
 
         if nodes is None:
             self._nodes[self._functional_unit_unique_id] = self._root_node
-            self._traverse(
-                [(0, self._root_node)], self._max_depth_for_node(self._root_node, depth)
-            )
+            heap = self._new_queue()
+            self._heappush(heap, (0, self._root_node))
+            self._traverse(heap, self._max_depth_for_node(self._root_node, depth))
         else:
-            heap = []
+            heap = self._new_queue()
             for node in nodes:
                 node.max_depth = self._max_depth_for_node(node, depth)
                 node.depth = 0
+                if node.unique_id not in self._nodes:
+                    node.terminal = True
+                    if self._covered_score is not None:
+                        self._covered_score += node.direct_emissions_score
                 self._nodes[node.unique_id] = node
-                if self.settings.separate_biosphere_flows:
+                if self._flow_records is not None:
+                    self._flow_records.add(node)
+                elif self.settings.separate_biosphere_flows:
                     self.add_biosphere_flows(
                         flows=self._flows,
                         matrix=(
@@ -331,48 +461,237 @@ class NewNodeEachVisitGraphTraversal(BaseGraphTraversal[GraphTraversalSettings])
                         biosphere_cutoff_score=self.biosphere_cutoff_score,
                     )
 
-                heappush(heap, (abs(1 / node.cumulative_score), node))
+                self._heappush(heap, (abs(1 / node.cumulative_score), node))
             self._traverse(heap, max_depth=self.settings.max_depth)
 
-        self._flows.sort(reverse=True)
+        self._finalize_traversal()
 
-        non_terminal_nodes = {edge.consumer_unique_id for edge in self._edges}
-        for key, obj in self._nodes.items():
-            obj.terminal = key not in non_terminal_nodes
+    def _finalize_traversal(self) -> None:
+        """
+        Sort flows, set terminal flags, and check coverage after traversal.
+
+        Terminal flags and the total direct score for the coverage check are updated whenever
+        nodes and edges are added, and new flows are merged into the sorted flows, so repeated
+        traversals from single nodes cost in proportion to the new part of the graph. After
+        other changes to the graph, call `_reset_bookkeeping` to recalculate them from scratch.
+        """
+        if self._covered_score is None:
+            self._rebuild_bookkeeping()
+        else:
+            # The flows are already sorted, except for the new flows at the end; timsort finds
+            # these runs and merges them in linear time
+            self._flows.sort(key=attrgetter("score"), reverse=True)
 
         if self.lca.score != 0:
-            traversed_direct_score = sum(
-                node.direct_emissions_score
-                for node in self._nodes.values()
-                if node.unique_id != self._functional_unit_unique_id
-            )
-            coverage = traversed_direct_score / self.lca.score
+            coverage = self._covered_score / self.lca.score
             if coverage < self.settings.min_coverage_fraction:
                 warnings.warn(
                     f"Graph traversal covered only {coverage:.1%} of the total LCA score. "
                     f"Consider lowering the `cutoff` (currently {self.settings.cutoff}) to improve coverage."
                 )
 
+    def _reset_bookkeeping(self) -> None:
+        """
+        Recalculate terminal flags, coverage, and flow order from all nodes, edges, and flows at
+        the end of the next traversal, and reset the `adjacency` index; needed after changes
+        other than adding to the graph.
+        """
+        self._covered_score = None
+        if self._adjacency is not None:
+            self._adjacency.reset()
+
+    def _rebuild_bookkeeping(self) -> None:
+        self._flows.sort(key=attrgetter("score"), reverse=True)
+
+        non_terminal_nodes = {edge.consumer_unique_id for edge in self._edges}
+        for key, obj in self._nodes.items():
+            obj.terminal = key not in non_terminal_nodes
+
+        self._covered_score = sum(
+            node.direct_emissions_score
+            for node in self._nodes.values()
+            if node.unique_id != self._functional_unit_unique_id
+        )
+
     @property
     def exceeded_calculation_count(self):
         return self.calculation_count > self._max_calc
 
-    def _traverse(self, heap: list, max_depth: Optional[int] = None):
+    def resume(self) -> None:
+        """
+        Continue a traversal which was stopped by `settings.max_calc`, from the nodes which
+        were still queued. Allows `settings.max_calc` more calculations.
+
+        Works after `load_state`, so a checkpointed traversal continues exactly where it stopped.
+
+        Returns
+        -------
+        `None`
+            Modifies the class object's state in-place
+
+        """
+        if not self._heap:
+            return
+        self._max_calc += self.settings.max_calc
+        self._traverse(self._heap, self._heap_max_depth)
+        self._finalize_traversal()
+
+    def rescore(self, method: tuple) -> None:
+        """
+        Recalculate the scores of the existing graph for another impact assessment method.
+
+        The graph structure and supply amounts don't depend on the method, so only the scores
+        change: `cumulative_score`, `direct_emissions_score` and the scores outside specific
+        flows of each `Node`, and all `Flow` instances, which are extracted again with the new
+        `biosphere_cutoff` score. The cumulative scores need one batched solve over the distinct
+        products in the graph, and no new traversal.
+
+        The cutoff scores are updated too, but nodes which would have been cut off, or
+        traversed, with the new method are not removed or added; call `traverse` again with
+        `reset_results=True` if this matters.
+
+        Parameters
+        ----------
+        method : tuple
+            Impact assessment method, passed to `lca.switch_method`. The LCIA of `self.lca` is
+            recalculated for this method.
+
+        Returns
+        -------
+        `None`
+            Modifies the class object's state in-place
+
+        """
+        if any(node.activity_index == REMAINDER_INDEX for node in self._nodes.values()):
+            raise ValueError("Can't rescore graphs with evicted nodes")
+        self.lca.switch_method(method)
+        self.lca.lcia_calculation()
+        total_score = self.lca.score
+        if total_score == 0:
+            raise ValueError("Zero total LCA score makes traversal impossible")
+        self.cutoff_score = abs(total_score * self.settings.cutoff)
+        self.biosphere_cutoff_score = abs(total_score * self.settings.biosphere_cutoff)
+
+        self.characterized_biosphere = self.get_characterized_biosphere(self.lca)
+        if hasattr(self._caching_solver, "clear"):
+            self._caching_solver.clear()
+        if hasattr(self._caching_solver, "set_score_row"):
+            self._caching_solver.set_score_row(self.characterized_biosphere)
+
+        nodes = [node for node in self._nodes.values() if node is not self._root_node]
+        products = sorted({node.reference_product_index for node in nodes})
+        unit_scores = dict(
+            zip(
+                products,
+                self.get_cumulative_scores(
+                    caching_solver=self._caching_solver,
+                    characterized_biosphere=self.characterized_biosphere,
+                    product_indices=products,
+                    product_amounts=[1.0] * len(products),
+                ),
+            )
+        )
+
+        self._root_node.cumulative_score = total_score
+        self._flows.clear()
+        self._reset_bookkeeping()
+        characterized_biosphere = self.characterized_biosphere.tocsc()
+        flow_scores = None
+        if self._flow_records is not None:
+            records = self._flow_records
+            self._flow_records = self._new_flow_records()
+            scores = self._flow_records.add_many(
+                records.unique_ids.tolist(),
+                records.activity_indices.tolist(),
+                records.scales.tolist(),
+            )
+            flow_scores = dict(zip(records.unique_ids.tolist(), scores.tolist()))
+        for node in nodes:
+            direct = node.supply_amount * characterized_biosphere[:, node.activity_index]
+            node.cumulative_score = (
+                unit_scores[node.reference_product_index]
+                * node.reference_product_production_amount
+                * node.supply_amount
+            )
+            node.direct_emissions_score = direct.sum()
+            if flow_scores is not None:
+                flow_score = flow_scores.get(node.unique_id, 0.0)
+            elif self.settings.separate_biosphere_flows:
+                flow_score = self.add_biosphere_flows(
+                    flows=self._flows,
+                    matrix=direct.tocoo(),
+                    lca=self.lca,
+                    node=node,
+                    biosphere_cutoff_score=self.biosphere_cutoff_score,
+                )
+            else:
+                flow_score = 0
+            node.direct_emissions_score_outside_specific_flows = (
+                node.direct_emissions_score - flow_score
+            )
+            node.remaining_cumulative_score_outside_specific_flows = (
+                node.cumulative_score - flow_score
+            )
+        self._flows.sort(reverse=True)
+
+    def save_state(self, filepath) -> None:
+        """
+        Save the complete traversal state to `filepath`, so that it can be restored with
+        `load_state` and continued with `resume`. See `bw_graph_tools.graph_traversal.checkpoint`.
+        """
+        from bw_graph_tools.graph_traversal.checkpoint import save_state
+
+        save_state(self, filepath)
+
+    @classmethod
+    def load_state(cls, filepath, lca: LCA, settings: Optional[GraphTraversalSettings] = None):
+        """
+        Create a traversal from a state saved with `save_state`.
+
+        Parameters
+        ----------
+        filepath : str or pathlib.Path
+            File written by `save_state`
+        lca : bw2calc.LCA
+            The same `LCA` used for the saved traversal, with inventory and impact assessment
+            calculated.
+        settings : GraphTraversalSettings
+            Optional settings; defaults to the saved settings. Needed to restore settings which
+            can't be saved, like a custom `caching_solver`.
+
+        Returns
+        -------
+        An instance of this class with the saved state
+        """
+        from bw_graph_tools.graph_traversal.checkpoint import load_state
+
+        return load_state(cls, filepath, lca, settings=settings)
+
+    def _restore_state(self) -> None:
+        """
+        Rebuild the state which `save_state` doesn't save from the restored nodes and edges;
+        called at the end of `load_state`. Subclasses with more state override this.
+        """
+
+    def _traverse(self, heap, max_depth: Optional[int] = None):
         """
         Traverse the graph.
 
         Parameters
         ----------
         heap:
-            nodes to traverse
+            priority queue of nodes to traverse, see `priority_queue`
         max_depth:
             global maximum depth to traverse
         """
+        # Kept so that a traversal stopped by `max_calc` can be resumed, see `resume`
+        self._heap = heap
+        self._heap_max_depth = max_depth
         while heap:
             if self.exceeded_calculation_count:
                 warnings.warn("Stopping traversal due to calculation count.")
                 break
-            _, node = heappop(heap)
+            _, node = self._heappop(heap)
 
             product_indices, product_amounts = self.get_demand_vector_for_activity(
                 node=node,
@@ -403,6 +722,216 @@ class NewNodeEachVisitGraphTraversal(BaseGraphTraversal[GraphTraversalSettings])
                 cutoff_score=self.cutoff_score,
                 biosphere_cutoff_score=self.biosphere_cutoff_score,
             )
+            if self._budgeted and self._over_budget():
+                self.evict_nodes(heap)
+
+    def _over_budget(self) -> bool:
+        if self.settings.max_nodes is not None and len(self._nodes) > self.settings.max_nodes:
+            return True
+        return self.settings.max_memory is not None and (
+            self.memory_usage() > self.settings.max_memory
+        )
+
+    def memory_usage(self) -> int:
+        """
+        Estimate the memory used by the traversal results in bytes.
+
+        Counts the `Node`, `Edge`, and `Flow` instances (or flow records), the priority queue,
+        and the score cache of the caching solver. The size of each object is measured once on
+        an example, so this is quick enough to call after every expanded node.
+
+        Returns
+        -------
+        int
+            Estimated memory use in bytes
+        """
+        sizes = self.__dict__.get("_object_sizes")
+        if sizes is None:
+            sizes = self._object_sizes = {
+                Node: _object_size(self._root_node),
+                Edge: _object_size(
+                    Edge(
+                        consumer_index=0,
+                        consumer_unique_id=0,
+                        producer_index=0,
+                        producer_unique_id=0,
+                        product_index=0,
+                        amount=0.0,
+                    )
+                ),
+                Flow: _object_size(
+                    Flow(
+                        flow_datapackage_id=0,
+                        flow_index=0,
+                        activity_unique_id=0,
+                        activity_id=0,
+                        activity_index=0,
+                        amount=0.0,
+                        score=0.0,
+                    )
+                ),
+            }
+        # Dictionary, list, and queue entries, plus the queued priorities
+        pointer = 8
+        total = (
+            len(self._nodes) * (sizes[Node] + 3 * pointer + sys.getsizeof(0))
+            + len(self._edges) * (sizes[Edge] + pointer)
+            + len(self._flows) * (sizes[Flow] + pointer)
+            + len(self._heap) * (sys.getsizeof((0.0, None)) + sys.getsizeof(0.0))
+        )
+        if self._flow_records is not None:
+            # One 8 byte unique id, activity index, and scale per record
+            total += len(self._flow_records) * 24
+        if hasattr(self._caching_solver, "cache_bytes"):
+            total += self._caching_solver.cache_bytes()
+        return total
+
+    def evict_nodes(self, heap=None) -> int:
+        """
+        Fold low-scoring terminal nodes into remainder nodes to stay within the node or memory
+        budget (`settings.max_nodes` and `settings.max_memory`).
+
+        Called automatically during traversal when the budget is exceeded. Terminal nodes, i.e.
+        nodes without edges to producers other than remainder nodes, are evicted in order of
+        increasing absolute cumulative score until the graph is within `EVICTION_TARGET` of the
+        budget. Evicted nodes which were queued for expansion are removed from the queue, so
+        their supply chains are not traversed. If evicting all terminal nodes isn't enough,
+        their consumers become terminal and are evicted in turn.
+
+        Each parent of evicted nodes gets one remainder `Node`, with `activity_index` and
+        `reference_product_index` of `REMAINDER_INDEX` and a negative `unique_id`, linked to the
+        parent by an `Edge` with zero amount. Its `cumulative_score` is the sum of those of the
+        evicted nodes, and its `direct_emissions_score` the sum of the direct emissions of the
+        evicted nodes and their remainder nodes. The `Flow` instances of evicted nodes are
+        removed, and their scores included in the scores outside specific flows of the remainder
+        node, so all score totals are preserved.
+
+        Graphs with remainder nodes can't be rescored, as remainder nodes aren't activities.
+
+        Parameters
+        ----------
+        heap
+            Priority queue of the running traversal; defaults to the queue of the last
+            traversal.
+
+        Returns
+        -------
+        int
+            Number of evicted nodes, not counting remainder nodes
+        """
+        if heap is None:
+            heap = self._heap
+        target = len(self._nodes)
+        if self.settings.max_nodes is not None:
+            target = min(target, int(self.settings.max_nodes * self.EVICTION_TARGET))
+        if self.settings.max_memory is not None:
+            usage = self.memory_usage()
+            if usage > 0:
+                target = min(
+                    target,
+                    int(len(self._nodes) * self.settings.max_memory * self.EVICTION_TARGET / usage),
+                )
+
+        evicted = 0
+        while len(self._nodes) > target:
+            count = self._evict_terminal_nodes(len(self._nodes) - target, heap)
+            if not count:
+                warnings.warn("Can't evict enough nodes to stay within the traversal budget")
+                break
+            evicted += count
+        return evicted
+
+    def _evict_terminal_nodes(self, excess: int, heap) -> int:
+        """Evict the lowest-scoring terminal nodes to remove up to `excess` nodes in total."""
+        parent_edges = {edge.producer_unique_id: edge for edge in self._edges}
+        children = defaultdict(list)
+        for edge in self._edges:
+            children[edge.consumer_unique_id].append(self._nodes[edge.producer_unique_id])
+        remainders = {
+            parent: child
+            for parent, nodes in children.items()
+            for child in nodes
+            if child.activity_index == REMAINDER_INDEX
+        }
+        candidates = sorted(
+            (
+                node
+                for node in self._nodes.values()
+                if node.unique_id in parent_edges
+                and node.activity_index != REMAINDER_INDEX
+                and all(
+                    child.activity_index == REMAINDER_INDEX
+                    for child in children.get(node.unique_id, ())
+                )
+            ),
+            key=lambda node: abs(node.cumulative_score),
+        )
+
+        evicted, new_parents, reduction = [], set(), 0
+        for node in candidates:
+            if reduction >= excess:
+                break
+            evicted.append(node)
+            reduction += 1 + (node.unique_id in remainders)
+            parent = parent_edges[node.unique_id].consumer_unique_id
+            if parent not in remainders and parent not in new_parents:
+                new_parents.add(parent)
+                reduction -= 1
+
+        next_id = min(min(self._nodes), self._functional_unit_unique_id) - 1
+        removed = set()
+        for node in evicted:
+            parent = self._nodes[parent_edges[node.unique_id].consumer_unique_id]
+            remainder = remainders.get(parent.unique_id)
+            if remainder is None:
+                remainder = remainders[parent.unique_id] = Node(
+                    unique_id=next_id,
+                    activity_datapackage_id=REMAINDER_INDEX,
+                    activity_index=REMAINDER_INDEX,
+                    reference_product_datapackage_id=REMAINDER_INDEX,
+                    reference_product_index=REMAINDER_INDEX,
+                    reference_product_production_amount=1.0,
+                    depth=parent.depth + 1,
+                    supply_amount=0.0,
+                    cumulative_score=0.0,
+                    direct_emissions_score=0.0,
+                    terminal=True,
+                )
+                next_id -= 1
+                self._nodes[remainder.unique_id] = remainder
+                self._edges.append(
+                    Edge(
+                        consumer_index=parent.activity_index,
+                        consumer_unique_id=parent.unique_id,
+                        producer_index=REMAINDER_INDEX,
+                        producer_unique_id=remainder.unique_id,
+                        product_index=REMAINDER_INDEX,
+                        amount=0.0,
+                    )
+                )
+            direct = node.direct_emissions_score
+            own_remainder = remainders.pop(node.unique_id, None)
+            if own_remainder is not None:
+                direct += own_remainder.direct_emissions_score
+                removed.add(own_remainder.unique_id)
+                del self._nodes[own_remainder.unique_id]
+            remainder.cumulative_score += node.cumulative_score
+            remainder.direct_emissions_score += direct
+            remainder.direct_emissions_score_outside_specific_flows += direct
+            remainder.remaining_cumulative_score_outside_specific_flows += node.cumulative_score
+            removed.add(node.unique_id)
+            del self._nodes[node.unique_id]
+
+        self._edges[:] = [edge for edge in self._edges if edge.producer_unique_id not in removed]
+        self._flows[:] = [flow for flow in self._flows if flow.activity_unique_id not in removed]
+        if self._flow_records is not None:
+            self._flow_records.remove(removed)
+        self._reset_bookkeeping()
+        queued = [(priority, node) for priority, node in heap if node.unique_id not in removed]
+        if len(queued) < len(heap):
+            heap.clear()
+            heap.push_many([priority for priority, _ in queued], [node for _, node in queued])
+        return len(evicted)
 
     def traverse_edges(
         self,
@@ -420,7 +949,7 @@ class NewNodeEachVisitGraphTraversal(BaseGraphTraversal[GraphTraversalSettings])
         edges: list[Edge],
         flows: list[Flow],
         nodes: Dict[int, Node],
-        heap: list,
+        heap,
         production_exchange_mapping: dict[int, int],
         static_activity_indices: set[int],
         separate_biosphere_flows: bool,
@@ -429,18 +958,16 @@ class NewNodeEachVisitGraphTraversal(BaseGraphTraversal[GraphTraversalSettings])
         cutoff_score: float,
         max_depth: Optional[int] = None,
     ) -> None:
-        # Solve for all of this node's input products at once. The batched solver returns the
-        # cumulative score per input directly, avoiding one linear solve per product.
         product_indices = list(product_indices)
         product_amounts = list(product_amounts)
-        if hasattr(caching_solver, "scores"):
-            cumulative_scores = caching_solver.scores(product_indices, product_amounts)
-        else:
-            # Backwards-compatible path for custom solvers without batched `scores`.
-            cumulative_scores = [
-                float((characterized_biosphere * caching_solver(pi, pa)).sum())
-                for pi, pa in zip(product_indices, product_amounts)
-            ]
+        # Children to expand later; added to the queue together
+        priorities, children = [], []
+        cumulative_scores = self.get_cumulative_scores(
+            caching_solver=caching_solver,
+            characterized_biosphere=characterized_biosphere,
+            product_indices=product_indices,
+            product_amounts=product_amounts,
+        )
 
         for product_index, product_amount, cumulative_score in zip(
             product_indices, product_amounts, cumulative_scores
@@ -471,6 +998,7 @@ class NewNodeEachVisitGraphTraversal(BaseGraphTraversal[GraphTraversalSettings])
                 direct_emissions_score=(
                     scale * characterized_biosphere[:, producer_index]
                 ).sum(),
+                terminal=True,
             )
             edges.append(
                 Edge(
@@ -483,7 +1011,9 @@ class NewNodeEachVisitGraphTraversal(BaseGraphTraversal[GraphTraversalSettings])
                 )
             )
 
-            if separate_biosphere_flows:
+            if self._flow_records is not None:
+                flow_score = self._flow_records.add(producing_node)
+            elif separate_biosphere_flows:
                 flow_score = self.add_biosphere_flows(
                     flows=flows,
                     matrix=(scale * characterized_biosphere[:, producer_index]).tocoo(),
@@ -502,6 +1032,9 @@ class NewNodeEachVisitGraphTraversal(BaseGraphTraversal[GraphTraversalSettings])
             )
 
             nodes[producing_node.unique_id] = producing_node
+            nodes[consumer_unique_id].terminal = False
+            if self._covered_score is not None:
+                self._covered_score += producing_node.direct_emissions_score
 
             if producing_node.max_depth is not None:
                 # Local max depth overrides everything, and already include global max depth
@@ -518,7 +1051,33 @@ class NewNodeEachVisitGraphTraversal(BaseGraphTraversal[GraphTraversalSettings])
                 satisfies_depth_constraint
                 and producer_index not in static_activity_indices
             ):
-                heappush(heap, (abs(1 / cumulative_score), producing_node))
+                priorities.append(abs(1 / cumulative_score))
+                children.append(producing_node)
+
+        if children:
+            self._heappush_many(heap, priorities, children)
+
+    @classmethod
+    def get_cumulative_scores(
+        cls,
+        caching_solver: CachingSolver,
+        characterized_biosphere: spmatrix,
+        product_indices: list[int],
+        product_amounts: list[float],
+    ) -> list[float]:
+        """
+        Get the cumulative LCA score of each of `product_amounts` of `product_indices`.
+
+        Solves for all products at once. The batched solver returns the cumulative score per
+        input directly, avoiding one linear solve per product.
+        """
+        if hasattr(caching_solver, "scores"):
+            return caching_solver.scores(product_indices, product_amounts)
+        # Backwards-compatible path for custom solvers without batched `scores`.
+        return [
+            float((characterized_biosphere * caching_solver(pi, pa)).sum())
+            for pi, pa in zip(product_indices, product_amounts)
+        ]
 
     @classmethod
     def get_characterized_biosphere(cls, lca: LCA) -> spmatrix:
@@ -633,3 +1192,12 @@ class NewNodeEachVisitGraphTraversal(BaseGraphTraversal[GraphTraversalSettings])
         return get_demand_vector_for_activity(
             node=node, skip_coproducts=skip_coproducts, matrix=matrix
         )
+
+
+def _object_size(obj) -> int:
+    """Size in bytes of a dataclass instance, including its attribute dictionary and values."""
+    return (
+        sys.getsizeof(obj)
+        + sys.getsizeof(obj.__dict__)
+        + sum(sys.getsizeof(value) for value in obj.__dict__.values())
+    )
@@ -0,0 +1,182 @@
+"""
+Priority queues for the nodes waiting to be expanded during graph traversal.
+
+Nodes with the *smallest* priority are expanded first; the traversal uses
+``abs(1 / cumulative_score)`` as priority. All queues have the same interface:
+
+* ``push(priority, node)`` and ``push_many(priorities, nodes)``
+* ``pop()``, which returns the ``(priority, node)`` pair with the smallest priority
+* ``len(queue)``, ``clear()``, and iteration over the queued ``(priority, node)`` pairs, in no
+  particular order
+
+Select a queue with `GraphTraversalSettings.priority_queue`; other queues can be added to
+`PRIORITY_QUEUES`.
+"""
+
+import math
+from heapq import heappop, heappush
+from typing import Iterable, Iterator, Sequence, Tuple
+
+import numpy as np
+
+from bw_graph_tools.graph_traversal.graph_objects import Node
+
+
+class HeapQueue:
+    """
+    Binary heap of ``(priority, node)`` tuples using `heapq`.
+
+    Ties in priority are broken by comparing the nodes, i.e. their cumulative scores. This is
+    the default queue, and expands nodes in the same order as previous versions.
+    """
+
+    def __init__(self):
+        self._heap = []
+
+    def push(self, priority: float, node: Node) -> None:
+        heappush(self._heap, (priority, node))
+
+    def push_many(self, priorities: Sequence[float], nodes: Iterable[Node]) -> None:
+        for item in zip(priorities, nodes):
+            heappush(self._heap, item)
+
+    def pop(self) -> Tuple[float, Node]:
+        return heappop(self._heap)
+
+    def clear(self) -> None:
+        self._heap.clear()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __iter__(self) -> Iterator[Tuple[float, Node]]:
+        return iter(list(self._heap))
+
+
+class BucketQueue:
+    """
+    Priority queue with integer-keyed buckets of quantized log priority.
+
+    Each node goes into the bucket ``floor(log2(priority) * resolution)``, so a bucket holds
+    priorities within a factor of ``2 ** (1 / resolution)``. A small heap of integer bucket
+    keys gives the bucket with the smallest priorities, and each bucket is a heap of plain
+    float priorities, so nodes are still popped in exact priority order. Nodes are never
+    compared; nodes with equal priority are popped in insertion order.
+
+    Bucket keys of large batches of nodes are calculated together in `push_many`.
+
+    Parameters
+    ----------
+    resolution : int
+        Number of buckets per factor of two in priority
+    """
+
+    # Smallest batch for which `push_many` calculates bucket keys with numpy
+    VECTORIZE_FROM = 64
+
+    def __init__(self, resolution: int = 8):
+        if resolution < 1:
+            raise ValueError(f"`resolution` must be a positive integer; got {resolution}")
+        self.resolution = resolution
+        # Bucket key of priorities which are zero, e.g. for the functional unit
+        self._zero_key = -(2**62)
+        self._keys = []
+        # {bucket key: heap of priorities}
+        self._buckets = {}
+        # {priority: node, or list of nodes with this priority in insertion order}
+        self._nodes = {}
+        self._size = 0
+
+    def _key(self, priority: float) -> int:
+        if priority <= 0:
+            return self._zero_key
+        return math.floor(math.log2(priority) * self.resolution)
+
+    def _insert(self, key: int, priority: float, node: Node) -> None:
+        nodes = self._nodes.get(priority)
+        if nodes is None:
+            # Most priorities are unique, so store the node itself until there is a tie
+            self._nodes[priority] = node
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._buckets[key] = [priority]
+                heappush(self._keys, key)
+            else:
+                heappush(bucket, priority)
+        elif type(nodes) is list:
+            nodes.append(node)
+        else:
+            self._nodes[priority] = [nodes, node]
+        self._size += 1
+
+    def push(self, priority: float, node: Node) -> None:
+        self._insert(self._key(priority), priority, node)
+
+    def push_many(self, priorities: Sequence[float], nodes: Iterable[Node]) -> None:
+        if len(priorities) < self.VECTORIZE_FROM:
+            for priority, node in zip(priorities, nodes):
+                self._insert(self._key(priority), priority, node)
+            return
+        priorities = np.asarray(priorities, dtype=float)
+        keys = np.full(priorities.shape, self._zero_key, dtype=np.int64)
+        positive = priorities > 0
+        keys[positive] = np.floor(np.log2(priorities[positive]) * self.resolution)
+        for key, priority, node in zip(keys.tolist(), priorities.tolist(), nodes):
+            self._insert(key, priority, node)
+
+    def pop(self) -> Tuple[float, Node]:
+        if not self._size:
+            raise IndexError("pop from empty queue")
+        self._size -= 1
+        key = self._keys[0]
+        bucket = self._buckets[key]
+        priority = bucket[0]
+        nodes = self._nodes[priority]
+        if type(nodes) is list:
+            node = nodes.pop(0)
+            if nodes:
+                return priority, node
+        else:
+            node = nodes
+        del self._nodes[priority]
+        heappop(bucket)
+        if not bucket:
+            del self._buckets[key]
+            heappop(self._keys)
+        return priority, node
+
+    def clear(self) -> None:
+        self._keys.clear()
+        self._buckets.clear()
+        self._nodes.clear()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Tuple[float, Node]]:
+        return iter(
+            [
+                (priority, node)
+                for priority, nodes in self._nodes.items()
+                for node in (nodes if type(nodes) is list else [nodes])
+            ]
+        )
+
+
+PRIORITY_QUEUES = {"heap": HeapQueue, "bucket": BucketQueue}
+
+
+def queue_push(queue, item: Tuple[float, Node]) -> None:
+    """Push ``(priority, node)`` onto `queue`, with the call signature of `heapq.heappush`."""
+    queue.push(*item)
+
+
+def queue_push_many(queue, priorities: Sequence[float], nodes: Sequence[Node]) -> None:
+    """Push all `nodes` with their `priorities` onto `queue`."""
+    queue.push_many(priorities, nodes)
+
+
+def queue_pop(queue) -> Tuple[float, Node]:
+    """Pop the ``(priority, node)`` pair with the smallest priority from `queue`."""
+    return queue.pop()
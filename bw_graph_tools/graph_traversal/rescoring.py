@@ -0,0 +1,186 @@
+from typing import Dict
+
+import numpy as np
+
+from bw_graph_tools.graph_traversal.graph_objects import REMAINDER_INDEX
+from bw_graph_tools.graph_traversal.utils import CachingSolver
+
+
+class TraversalRescorer:
+    """
+    Recalculate the amounts and scores of a traversal graph for new matrix values, keeping the
+    graph structure fixed.
+
+    Graph traversal is expensive, as it needs to guess production exchanges, solve for each
+    product, and create `Node` and `Edge` instances. When only the matrix *values* change, for
+    example between Monte Carlo iterations, the nodes and edges of a reference traversal can be
+    reused. For each new set of matrices, this class recalculates supply amounts from the edges,
+    in order of increasing depth, and then all scores with vectorized operations and one batched
+    solve over the distinct products in the graph.
+
+    The graph must not have cycles, i.e. each edge must go from a consumer to a deeper producer.
+    This is true for `NewNodeEachVisitGraphTraversal` and `SharedSubtreeGraphTraversal`. The
+    demand of the functional unit doesn't change.
+
+    Results are numpy arrays in the order of `unique_ids` (for nodes), `traversal.edges`, and
+    `traversal.flows`.
+
+    Parameters
+    ----------
+    traversal : NewNodeEachVisitGraphTraversal
+        Reference traversal, which has already been traversed
+
+    """
+
+    def __init__(self, traversal):
+        self.traversal_class = type(traversal)
+        root_id = traversal._functional_unit_unique_id
+        nodes = list(traversal.nodes.values())
+        if any(node.activity_index == REMAINDER_INDEX for node in nodes):
+            raise ValueError("Can't rescore graphs with evicted nodes")
+        position = {node.unique_id: pos for pos, node in enumerate(nodes)}
+
+        self.unique_ids = np.array([node.unique_id for node in nodes], dtype=np.int64)
+        self.root = position[root_id]
+        self.activity_indices = np.array([node.activity_index for node in nodes], dtype=np.int64)
+        self.product_indices = np.array(
+            [node.reference_product_index for node in nodes], dtype=np.int64
+        )
+        self.depths = np.array([node.depth for node in nodes], dtype=np.int64)
+        self.non_root = np.arange(len(nodes)) != self.root
+
+        edges = traversal.edges
+        self.consumers = np.array([position[e.consumer_unique_id] for e in edges], dtype=np.int64)
+        self.producers = np.array([position[e.producer_unique_id] for e in edges], dtype=np.int64)
+        self.edge_products = np.array([e.product_index for e in edges], dtype=np.int64)
+        self.reference_edge_amounts = np.array([e.amount for e in edges], dtype=float)
+        if (self.depths[self.producers] <= self.depths[self.consumers]).any():
+            raise ValueError("Can only rescore graphs where producers are deeper than consumers")
+
+        # Process edges level by level, so each consumer has its full supply
+        self.edge_order = np.argsort(self.depths[self.consumers], kind="stable")
+        consumer_depths = self.depths[self.consumers][self.edge_order]
+        self.level_bounds = np.flatnonzero(np.diff(consumer_depths)) + 1
+
+        flows = traversal.flows
+        self.flow_indices = np.array([flow.flow_index for flow in flows], dtype=np.int64)
+        self.flow_nodes = np.array(
+            [position[flow.activity_unique_id] for flow in flows], dtype=np.int64
+        )
+
+    def calculate(self, lca) -> Dict[str, np.ndarray]:
+        """
+        Calculate amounts and scores for the current matrices of `lca`.
+
+        Parameters
+        ----------
+        lca : bw2calc.LCA
+            `LCA` with the same matrix indices as the reference traversal. Only the matrices
+            are used, so the inventory doesn't have to be calculated. If the technosphere
+            matrix has been decomposed (``lca.solver``), the decomposition must be current.
+
+        Returns
+        -------
+        dict
+            Arrays with keys `supply_amount`, `cumulative_score`, and `direct_emissions_score`
+            (per node), `edge_amount` (per edge), and `flow_amount` and `flow_score` (per flow)
+
+        """
+        matrix = lca.technosphere_matrix.tocsr()
+        characterized_biosphere = self.traversal_class.get_characterized_biosphere(lca).tocsr()
+
+        production = np.ones(len(self.unique_ids))
+        production[self.non_root] = _matrix_values(
+            matrix, self.product_indices[self.non_root], self.activity_indices[self.non_root]
+        )
+
+        from_root = self.consumers == self.root
+        exchange = np.empty(len(self.consumers))
+        exchange[from_root] = self.reference_edge_amounts[from_root]
+        exchange[~from_root] = -1 * _matrix_values(
+            matrix,
+            self.edge_products[~from_root],
+            self.activity_indices[self.consumers[~from_root]],
+        )
+
+        supply = np.zeros(len(self.unique_ids))
+        supply[self.root] = 1.0
+        edge_amounts = np.empty(len(self.consumers))
+        for level in np.split(self.edge_order, self.level_bounds):
+            amounts = exchange[level] * supply[self.consumers[level]]
+            edge_amounts[level] = amounts
+            producers = self.producers[level]
+            np.add.at(supply, producers, amounts / production[producers])
+
+        score_row = np.asarray(characterized_biosphere.sum(axis=0)).ravel()
+        direct = np.zeros(len(self.unique_ids))
+        direct[self.non_root] = (
+            score_row[self.activity_indices[self.non_root]] * supply[self.non_root]
+        )
+
+        solver = CachingSolver(lca)
+        solver.score_row = score_row
+        products = np.unique(self.product_indices[self.non_root])
+        unit_scores = np.zeros(matrix.shape[0])
+        unit_scores[products] = solver.scores(products.tolist(), [1.0] * len(products))
+
+        cumulative = np.zeros(len(self.unique_ids))
+        cumulative[self.non_root] = (
+            unit_scores[self.product_indices[self.non_root]]
+            * production[self.non_root]
+            * supply[self.non_root]
+        )
+        root_edges = np.flatnonzero(from_root)
+        cumulative[self.root] = (
+            unit_scores[self.edge_products[root_edges]] * edge_amounts[root_edges]
+        ).sum()
+
+        flow_activities = self.activity_indices[self.flow_nodes]
+        flow_supply = supply[self.flow_nodes]
+        return {
+            "supply_amount": supply,
+            "cumulative_score": cumulative,
+            "direct_emissions_score": direct,
+            "edge_amount": edge_amounts,
+            "flow_amount": _matrix_values(
+                lca.biosphere_matrix.tocsr(), self.flow_indices, flow_activities
+            )
+            * flow_supply,
+            "flow_score": _matrix_values(
+                characterized_biosphere, self.flow_indices, flow_activities
+            )
+            * flow_supply,
+        }
+
+    def monte_carlo(self, lca, iterations: int) -> Dict[str, np.ndarray]:
+        """
+        Calculate amounts and scores for `iterations` new samples of the `lca` matrices.
+
+        `lca` must have been created with ``use_distributions=True`` (or ``use_arrays=True``);
+        each iteration calls ``next(lca)`` to draw new matrix values.
+
+        Parameters
+        ----------
+        lca : bw2calc.LCA
+            `LCA` with the same matrix indices as the reference traversal
+        iterations : int
+            Number of Monte Carlo iterations
+
+        Returns
+        -------
+        dict
+            Same keys as `calculate`, with arrays of shape ``(iterations, number of objects)``
+
+        """
+        samples = []
+        for _ in range(iterations):
+            next(lca)
+            samples.append(self.calculate(lca))
+        return {key: np.vstack([sample[key] for sample in samples]) for key in samples[0]}
+
+
+def _matrix_values(matrix, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """Get the values at `(rows, cols)` of sparse `matrix` as a flat array."""
+    if not len(rows):
+        return np.zeros(0)
+    return np.asarray(matrix[rows, cols]).ravel()
@@ -1,9 +1,14 @@
 from pprint import pformat
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+from bw2calc import LCA
+from scipy.sparse import spmatrix
 
 from bw_graph_tools.graph_traversal.base import GraphTraversalException
-from bw_graph_tools.graph_traversal.graph_objects import Node
+from bw_graph_tools.graph_traversal.graph_objects import Edge, Flow, Node
 from bw_graph_tools.graph_traversal.new_node_each_visit import NewNodeEachVisitGraphTraversal
+from bw_graph_tools.graph_traversal.utils import CachingSolver, Counter
 
 
 class SameNodeEachVisitGraphTraversal(NewNodeEachVisitGraphTraversal):
@@ -12,11 +17,25 @@ class SameNodeEachVisitGraphTraversal(NewNodeEachVisitGraphTraversal):
 
     Because each node in the database corresponds to one and one one `Node` instance in this class,
     some simplifications to our data structures can be made.
+
+    By default, a new `Node` is still created the first time each input of a visited activity is
+    found. With `settings.aggregate_by_activity`, there is instead exactly one `Node` per
+    activity, whose `unique_id` is the activity matrix index. Its supply amount is the total
+    supply of the activity from all its consumers, taken from `lca.supply_array`, and its
+    cumulative score is the score of that total supply. All cumulative scores come from a
+    single transposed linear solve (see `CachingSolver.all_unit_scores`), so the graph has at
+    most one node for each activity above the cutoff, and needs no solves per edge. Edges are
+    added between all nodes in the graph, so nodes can have many consumers, and loops in the
+    supply chain appear as cycles.
     """
 
+    _supports_eviction = False
+    _supports_lazy_flows = False
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.visited_nodes = set()
+        self._unit_scores = None
 
     def traverse(
         self,
@@ -53,9 +72,141 @@ class SameNodeEachVisitGraphTraversal(NewNodeEachVisitGraphTraversal):
         super().traverse(nodes, depth=depth)
 
     def traverse_edges(self, *args, **kwargs) -> None:
-        super().traverse_edges(*args, **kwargs)
+        if self.settings.aggregate_by_activity:
+            self.traverse_edges_by_activity(**kwargs)
+        else:
+            super().traverse_edges(*args, **kwargs)
         self.visited_nodes.add(kwargs["consumer_unique_id"])
 
+    def rescore(self, method: tuple) -> None:
+        """
+        Recalculate all scores for the impact assessment `method`; see
+        `NewNodeEachVisitGraphTraversal.rescore`. Also resets the cached `unit_scores`, so later
+        traversals use the new method.
+        """
+        self._unit_scores = None
+        super().rescore(method)
+
+    @property
+    def unit_scores(self) -> np.ndarray:
+        """Cumulative LCA score per unit of each product, indexed by technosphere row."""
+        if self._unit_scores is None:
+            caching_solver = self._caching_solver
+            if not hasattr(caching_solver, "all_unit_scores"):
+                # Custom solvers don't have to support the transposed solve
+                caching_solver = CachingSolver(self.lca)
+                caching_solver.set_score_row(self.characterized_biosphere)
+            self._unit_scores = caching_solver.all_unit_scores()
+        return self._unit_scores
+
+    def traverse_edges_by_activity(
+        self,
+        *,
+        consumer_index: int,
+        consumer_unique_id: int,
+        consumer_max_depth: Optional[int],
+        product_indices: list[int],
+        product_amounts: list[float],
+        lca: LCA,
+        current_depth: int,
+        calculation_count: Counter,
+        characterized_biosphere: spmatrix,
+        matrix: spmatrix,
+        edges: list[Edge],
+        flows: list[Flow],
+        nodes: Dict[int, Node],
+        heap,
+        production_exchange_mapping: dict[int, int],
+        static_activity_indices: set[int],
+        separate_biosphere_flows: bool,
+        biosphere_cutoff_score: float,
+        cutoff_score: float,
+        max_depth: Optional[int] = None,
+        **kwargs,
+    ) -> None:
+        """
+        Add an edge to each input of the consumer, creating a `Node` for inputs whose activity
+        isn't yet in the graph and whose cumulative score is above `cutoff_score`.
+
+        Takes the same arguments as `traverse_edges`; no solver is needed, as node amounts and
+        scores come from `lca.supply_array` and `unit_scores`.
+        """
+        supply_array = lca.supply_array
+        unit_scores = self.unit_scores
+
+        for product_index, product_amount in zip(product_indices, product_amounts):
+            producer_index = production_exchange_mapping[product_index]
+            producing_node = nodes.get(producer_index)
+
+            if producing_node is None:
+                reference_product_net_production_amount = matrix[product_index, producer_index]
+                supply_amount = supply_array[producer_index]
+                cumulative_score = (
+                    unit_scores[product_index]
+                    * reference_product_net_production_amount
+                    * supply_amount
+                )
+                if abs(cumulative_score) < cutoff_score:
+                    continue
+
+                next(calculation_count)
+                producing_node = Node(
+                    unique_id=int(producer_index),
+                    activity_datapackage_id=lca.dicts.activity.reversed[producer_index],
+                    activity_index=producer_index,
+                    reference_product_datapackage_id=lca.dicts.product.reversed[product_index],
+                    reference_product_index=product_index,
+                    reference_product_production_amount=reference_product_net_production_amount,
+                    supply_amount=supply_amount,
+                    depth=current_depth + 1,
+                    max_depth=consumer_max_depth,
+                    cumulative_score=cumulative_score,
+                    direct_emissions_score=(
+                        supply_amount * characterized_biosphere[:, producer_index]
+                    ).sum(),
+                    terminal=True,
+                )
+                if separate_biosphere_flows:
+                    flow_score = self.add_biosphere_flows(
+                        flows=flows,
+                        matrix=(supply_amount * characterized_biosphere[:, producer_index]).tocoo(),
+                        lca=lca,
+                        node=producing_node,
+                        biosphere_cutoff_score=biosphere_cutoff_score,
+                    )
+                else:
+                    flow_score = 0
+                producing_node.direct_emissions_score_outside_specific_flows = (
+                    producing_node.direct_emissions_score - flow_score
+                )
+                producing_node.remaining_cumulative_score_outside_specific_flows = (
+                    producing_node.cumulative_score - flow_score
+                )
+                nodes[producing_node.unique_id] = producing_node
+                if self._covered_score is not None:
+                    self._covered_score += producing_node.direct_emissions_score
+
+                if producing_node.max_depth is not None:
+                    satisfies_depth_constraint = producing_node.max_depth > producing_node.depth
+                else:
+                    satisfies_depth_constraint = (max_depth is None) or (
+                        producing_node.depth < max_depth
+                    )
+                if satisfies_depth_constraint and producer_index not in static_activity_indices:
+                    self._heappush(heap, (abs(1 / cumulative_score), producing_node))
+
+            edges.append(
+                Edge(
+                    consumer_index=consumer_index,
+                    consumer_unique_id=consumer_unique_id,
+                    producer_index=producer_index,
+                    producer_unique_id=producing_node.unique_id,
+                    product_index=product_index,
+                    amount=product_amount,
+                )
+            )
+            nodes[consumer_unique_id].terminal = False
+
     def traverse_from_node(self, node: Union[int, Node], depth: Optional[int] = 1) -> bool:
         """
         Traverse the graph starting from the specified node and exp
@@ -30,6 +30,38 @@ class GraphTraversalSettings(BaseModel):
         Minimum fraction of the total LCA score that must be covered by the
         traversed nodes. A warning is raised if coverage falls below this
         value. Should be in `(0, 1]`. Default is 0.9.
+    profile : bool
+        Record the number of calls and time spent in each phase of the traversal; see
+        `stats` on the traversal class. Adds a little overhead, so off by default.
+    profile_callback : Callable | None
+        Called as ``profile_callback(phase, seconds)`` after each timed call. Setting a callback
+        also enables `profile`.
+    max_nodes : int | None
+        Maximum number of nodes to keep. When exceeded, the terminal nodes (including queued
+        nodes) with the lowest absolute cumulative scores are folded into one remainder node
+        per parent, until the graph has 80% of `max_nodes` nodes. See
+        `NewNodeEachVisitGraphTraversal.evict_nodes`. Only supported by
+        `NewNodeEachVisitGraphTraversal` and `AssumedDiagonalGraphTraversal`.
+    max_memory : int | None
+        Like `max_nodes`, but a limit on the estimated memory use in bytes of the nodes,
+        edges, flows, queue, and score cache; see
+        `NewNodeEachVisitGraphTraversal.memory_usage`.
+    lazy_flows : bool
+        Don't create `Flow` instances during traversal. Instead, record the `unique_id`,
+        activity index, and supply amount of each node, and create the flows from these
+        records when needed. Use `top_flows` or `node_flows` on the traversal to only create
+        some flows; `flows` creates and sorts all of them. Only used if
+        `separate_biosphere_flows` is true, and not supported by the same node, tagged, or
+        shared subtree traversals.
+    priority_queue : str
+        Queue for the nodes waiting to be expanded; a key of
+        `bw_graph_tools.graph_traversal.priority_queue.PRIORITY_QUEUES`. ``"heap"`` is a binary
+        heap, and ``"bucket"`` a bucketed queue on the log of the priority, which avoids
+        comparing `Node` instances and is faster for very large queues.
+    aggregate_by_activity : bool
+        Only used by `SameNodeEachVisitGraphTraversal`. Create one `Node` per activity, with
+        the supply amount and scores of the whole system (from `lca.supply_array`) instead of
+        a new `Node` for each visit.
     """
 
     cutoff: Annotated[float, Field(strict=True, gt=0, lt=1)] = 5e-3
@@ -40,6 +72,13 @@ class GraphTraversalSettings(BaseModel):
     separate_biosphere_flows: bool = True
     caching_solver: Any | None = None
     min_coverage_fraction: Annotated[float, Field(strict=True, gt=0, le=1)] = 0.9
+    profile: bool = False
+    profile_callback: Any | None = None
+    aggregate_by_activity: bool = False
+    priority_queue: str = "heap"
+    max_nodes: Optional[Annotated[int, Field(strict=True, gt=0)]] = None
+    max_memory: Optional[Annotated[int, Field(strict=True, gt=0)]] = None
+    lazy_flows: bool = False
 
     @model_validator(mode="after")
     def max_depth_positive(self):
@@ -56,6 +95,42 @@ class TaggedGraphTraversalSettings(GraphTraversalSettings):
     ----------
     tags : List[str]
         A list of tags to group nodes by
+    tag_index : TagIndex | None
+        Cache of activity tags; pass the same instance to share it across traversals
     """
 
     tags: List[str] = Field(default_factory=list)
+    tag_index: Any | None = None
+
+
+class SharedSubtreeGraphTraversalSettings(GraphTraversalSettings):
+    """
+    Settings for traversal where each activity is only expanded once per range of depths
+
+    Parameters
+    ----------
+    depth_bucket_size : int
+        Visits to an activity are merged into one `Node` when their depths are in the same
+        range of `depth_bucket_size` levels, i.e. have the same ``depth // depth_bucket_size``.
+        Larger values give smaller graphs, but less information about where in the supply
+        chain an activity is used.
+    """
+
+    depth_bucket_size: Annotated[int, Field(strict=True, gt=0)] = 1
+
+
+class LayerwiseGraphTraversalSettings(GraphTraversalSettings):
+    """
+    Settings for traversal which expands the supply chain one layer at a time
+
+    Parameters
+    ----------
+    transposed_unit_scores : bool
+        Get the cumulative scores of all products from one transposed linear solve (see
+        `CachingSolver.all_unit_scores`), instead of solving for the new products of each
+        layer. Usually much faster, as wide traversals need scores for many products. Scores
+        can differ from `NewNodeEachVisitGraphTraversal` by floating point rounding; set to
+        `False` to use the same solves, and get identical results.
+    """
+
+    transposed_unit_scores: bool = True
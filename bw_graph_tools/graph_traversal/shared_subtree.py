@@ -0,0 +1,361 @@
+from collections import defaultdict
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+
+from bw2calc import LCA
+from scipy.sparse import spmatrix
+
+from bw_graph_tools.graph_traversal.base import BaseGraphTraversal, GraphTraversalException
+from bw_graph_tools.graph_traversal.graph_objects import Edge, Node, SharedEdge
+from bw_graph_tools.graph_traversal.new_node_each_visit import NewNodeEachVisitGraphTraversal
+from bw_graph_tools.graph_traversal.settings import SharedSubtreeGraphTraversalSettings
+from bw_graph_tools.graph_traversal.utils import CachingSolver, Counter
+
+
+class SharedSubtreeGraphTraversal(
+    NewNodeEachVisitGraphTraversal,
+    BaseGraphTraversal[SharedSubtreeGraphTraversalSettings],
+):
+    """
+    Priority-first traversal which expands each activity only once per range of depths.
+
+    `NewNodeEachVisitGraphTraversal` creates a new `Node`, and expands its whole supply chain,
+    every time an activity is reached. Widely used activities like electricity are therefore
+    expanded again under every consumer. This class instead keeps one `Node` per activity and
+    depth bucket (see `SharedSubtreeGraphTraversalSettings.depth_bucket_size`), and adds the
+    supply from each new consumer to it. The result is a directed acyclic graph in which nodes
+    can have several consumers, with far fewer nodes (and calculations) for the same coverage.
+
+    Edges are `SharedEdge` instances, whose `multiplicity` is the amount demanded per unit of
+    consumer supply. After traversal, supply amounts, scores, edge amounts and flows are
+    recalculated from the multiplicities, so each node includes the supply from all of its
+    consumers, even those found after it was expanded.
+
+    A node is only shared with consumers at a lower depth, so edges always go deeper into the
+    supply chain and the graph has no cycles. Visits below the cutoff are added to an existing
+    node for their activity and depth bucket, but don't create new nodes.
+
+    Use `unroll_children` or `unroll` to get the unrolled graph (as created by
+    `NewNodeEachVisitGraphTraversal`) on demand. Unrolled nodes don't have `Flow` instances.
+    """
+
+    _supports_eviction = False
+    _supports_lazy_flows = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # {(activity index, depth bucket): shared node}
+        self._shared_nodes: Dict[Tuple[int, int], Node] = {}
+        self._children: Dict[int, List[SharedEdge]] = {}
+        # {unrolled node unique id: shared node unique id}
+        self._unrolled_from: Dict[int, int] = {}
+        self._unroll_counter = Counter()
+
+    def traverse(self, nodes: Optional[List[Node]] = None, depth: Optional[int] = None) -> None:
+        """
+        Perform the graph traversal from the functional unit, replacing any previous results.
+
+        Traversal from other nodes isn't possible, as each node can have many consumers; use
+        `unroll_children` to explore the supply chain of a specific node.
+
+        Parameters
+        ----------
+        nodes : None
+            Must be `None`; only present for compatibility with other traversal classes
+        depth : int
+            Maximum depth to traverse, up to `settings.max_depth`
+
+        Returns
+        -------
+        `None`
+            Modifies the class object's state in-place
+
+        """
+        if nodes is not None:
+            raise GraphTraversalException(
+                "Shared subtree traversal always starts from the functional unit"
+            )
+        self._shared_nodes = {}
+        self._unrolled_from = {}
+        self._calculation_count = Counter()
+        super().traverse(depth=depth, reset_results=True)
+
+    def _traverse(self, heap, max_depth: Optional[int] = None):
+        super()._traverse(heap, max_depth=max_depth)
+        self._propagate_supply()
+
+    def _restore_state(self) -> None:
+        """Rebuild the shared nodes, children, and unroll counter after `load_state`."""
+        self._shared_nodes = {}
+        # Node ids increase in creation order, so the first node of each key is the shared one
+        for unique_id in sorted(self._nodes):
+            node = self._nodes[unique_id]
+            if node is not self._root_node:
+                self._shared_nodes.setdefault(
+                    (node.activity_index, node.depth // self.settings.depth_bucket_size), node
+                )
+        self._children = defaultdict(list)
+        for edge in self._edges:
+            self._children[edge.consumer_unique_id].append(edge)
+        self._unrolled_from = {}
+        self._unroll_counter = Counter()
+        self._unroll_counter.value = self._calculation_count.value
+
+    def traverse_edges(
+        self,
+        *,
+        consumer_index: int,
+        consumer_unique_id: int,
+        consumer_max_depth: Optional[int],
+        product_indices: list[int],
+        product_amounts: list[float],
+        lca: LCA,
+        current_depth: int,
+        calculation_count: Counter,
+        characterized_biosphere: spmatrix,
+        matrix: spmatrix,
+        edges: list[Edge],
+        nodes: Dict[int, Node],
+        heap,
+        production_exchange_mapping: dict[int, int],
+        static_activity_indices: set[int],
+        caching_solver: CachingSolver,
+        cutoff_score: float,
+        max_depth: Optional[int] = None,
+        **kwargs,
+    ) -> None:
+        # Flows are only created once the final supply amounts are known, see
+        # `_propagate_supply`, so the flow arguments in `kwargs` aren't used.
+        product_indices = list(product_indices)
+        product_amounts = list(product_amounts)
+        cumulative_scores = self.get_cumulative_scores(
+            caching_solver=caching_solver,
+            characterized_biosphere=characterized_biosphere,
+            product_indices=product_indices,
+            product_amounts=product_amounts,
+        )
+        consumer_is_root = nodes[consumer_unique_id] is self._root_node
+        depth = current_depth + 1
+
+        for product_index, product_amount, cumulative_score in zip(
+            product_indices, product_amounts, cumulative_scores
+        ):
+            producer_index = production_exchange_mapping[product_index]
+            reference_product_net_production_amount = matrix[product_index, producer_index]
+            scale = product_amount / reference_product_net_production_amount
+            direct_emissions_score = (scale * characterized_biosphere[:, producer_index]).sum()
+
+            key = (producer_index, depth // self.settings.depth_bucket_size)
+            producing_node = self._shared_nodes.get(key)
+            if producing_node is not None and producing_node.depth > current_depth:
+                producing_node.supply_amount += scale
+                producing_node.cumulative_score += cumulative_score
+                producing_node.direct_emissions_score += direct_emissions_score
+            elif abs(cumulative_score) < cutoff_score:
+                continue
+            else:
+                producing_node = Node(
+                    unique_id=next(calculation_count),
+                    activity_datapackage_id=lca.dicts.activity.reversed[producer_index],
+                    activity_index=producer_index,
+                    reference_product_datapackage_id=lca.dicts.product.reversed[product_index],
+                    reference_product_index=product_index,
+                    reference_product_production_amount=reference_product_net_production_amount,
+                    supply_amount=scale,
+                    depth=depth,
+                    max_depth=consumer_max_depth,
+                    cumulative_score=cumulative_score,
+                    direct_emissions_score=direct_emissions_score,
+                )
+                nodes[producing_node.unique_id] = producing_node
+                self._shared_nodes.setdefault(key, producing_node)
+
+                if producing_node.max_depth is not None:
+                    satisfies_depth_constraint = producing_node.max_depth > depth
+                else:
+                    satisfies_depth_constraint = (max_depth is None) or (depth < max_depth)
+                if satisfies_depth_constraint and producer_index not in static_activity_indices:
+                    self._heappush(heap, (abs(1 / cumulative_score), producing_node))
+
+            # Read per unit of consumer supply from the matrix (supply is in activity units, so
+            # this is the input of one activity run), rather than dividing by the consumer's
+            # supply, which can cancel out to zero
+            edges.append(
+                SharedEdge(
+                    consumer_index=consumer_index,
+                    consumer_unique_id=consumer_unique_id,
+                    producer_index=producer_index,
+                    producer_unique_id=producing_node.unique_id,
+                    product_index=product_index,
+                    amount=product_amount,
+                    multiplicity=(
+                        product_amount
+                        if consumer_is_root
+                        else -matrix[product_index, consumer_index]
+                    ),
+                )
+            )
+
+    def _propagate_supply(self) -> None:
+        """
+        Recalculate supply amounts from the edge multiplicities, and then scores, edge amounts
+        and flows from the supply amounts.
+
+        Consumers always have a lower depth than their producers, so processing nodes by
+        increasing depth means each node has all its supply before passing it on.
+        """
+        nodes = [node for node in self._nodes.values() if node is not self._root_node]
+        for node in nodes:
+            node.supply_amount = 0.0
+
+        self._children = defaultdict(list)
+        for edge in self._edges:
+            self._children[edge.consumer_unique_id].append(edge)
+
+        for node in sorted(self._nodes.values(), key=lambda obj: obj.depth):
+            for edge in self._children.get(node.unique_id, []):
+                edge.amount = edge.multiplicity * node.supply_amount
+                producer = self._nodes[edge.producer_unique_id]
+                producer.supply_amount += edge.amount / producer.reference_product_production_amount
+
+        self._flows.clear()
+        for node, (unit_cumulative, unit_direct) in zip(nodes, self._scores_per_unit(nodes)):
+            node.cumulative_score = unit_cumulative * node.supply_amount
+            node.direct_emissions_score = unit_direct * node.supply_amount
+            if self.settings.separate_biosphere_flows:
+                flow_score = self.add_biosphere_flows(
+                    flows=self._flows,
+                    matrix=(
+                        node.supply_amount * self.characterized_biosphere[:, node.activity_index]
+                    ).tocoo(),
+                    lca=self.lca,
+                    node=node,
+                    biosphere_cutoff_score=self.biosphere_cutoff_score,
+                )
+            else:
+                flow_score = 0
+            node.direct_emissions_score_outside_specific_flows = (
+                node.direct_emissions_score - flow_score
+            )
+            node.remaining_cumulative_score_outside_specific_flows = (
+                node.cumulative_score - flow_score
+            )
+
+        self._reset_bookkeeping()
+
+        # Unrolled nodes get ids after all shared nodes
+        self._unroll_counter = Counter()
+        self._unroll_counter.value = self._calculation_count.value
+
+    def _scores_per_unit(self, nodes: List[Node]) -> List[Tuple[float, float]]:
+        """
+        Cumulative and direct emissions score of each of `nodes` per unit of supply.
+
+        Calculated from the product and activity of each node rather than from its current
+        scores, as the supply of a node can be zero, e.g. when the amounts from its consumers
+        cancel out.
+        """
+        if not nodes:
+            return []
+        products = sorted({node.reference_product_index for node in nodes})
+        unit_scores = dict(
+            zip(
+                products,
+                self.get_cumulative_scores(
+                    caching_solver=self._caching_solver,
+                    characterized_biosphere=self.characterized_biosphere,
+                    product_indices=products,
+                    product_amounts=[1.0] * len(products),
+                ),
+            )
+        )
+        return [
+            (
+                unit_scores[node.reference_product_index]
+                * node.reference_product_production_amount,
+                self.characterized_biosphere[:, node.activity_index].sum(),
+            )
+            for node in nodes
+        ]
+
+    def unroll_children(self, node: Node) -> List[Tuple[Edge, Node]]:
+        """
+        Create the unrolled children of `node`, i.e. the inputs of this single visit.
+
+        Parameters
+        ----------
+        node : Node
+            Either a node of this traversal, or an unrolled node created by this method
+
+        Returns
+        -------
+        list
+            `(Edge, Node)` tuples. Each `Node` is a new unrolled copy of a shared node, with its
+            amounts and scores scaled to the supply demanded by `node`.
+        """
+        shared = self._nodes[self._unrolled_from.get(node.unique_id, node.unique_id)]
+        shared_edges = self._children.get(shared.unique_id, [])
+        producers = [self._nodes[edge.producer_unique_id] for edge in shared_edges]
+        children = []
+        for shared_edge, producer, (unit_cumulative, unit_direct) in zip(
+            shared_edges, producers, self._scores_per_unit(producers)
+        ):
+            amount = shared_edge.multiplicity * node.supply_amount
+            supply_amount = amount / producer.reference_product_production_amount
+            # The specific flows of the shared node scale with its supply; without supply, it
+            # has no flows
+            flow_score = (
+                producer.direct_emissions_score
+                - producer.direct_emissions_score_outside_specific_flows
+            )
+            if producer.supply_amount:
+                flow_score *= supply_amount / producer.supply_amount
+            cumulative_score = unit_cumulative * supply_amount
+            direct_emissions_score = unit_direct * supply_amount
+            child = replace(
+                producer,
+                unique_id=next(self._unroll_counter),
+                depth=node.depth + 1,
+                supply_amount=supply_amount,
+                cumulative_score=cumulative_score,
+                direct_emissions_score=direct_emissions_score,
+                direct_emissions_score_outside_specific_flows=(direct_emissions_score - flow_score),
+                remaining_cumulative_score_outside_specific_flows=cumulative_score - flow_score,
+            )
+            self._unrolled_from[child.unique_id] = producer.unique_id
+            edge = Edge(
+                consumer_index=node.activity_index,
+                consumer_unique_id=node.unique_id,
+                producer_index=producer.activity_index,
+                producer_unique_id=child.unique_id,
+                product_index=shared_edge.product_index,
+                amount=amount,
+            )
+            children.append((edge, child))
+        return children
+
+    def unroll(self, max_depth: Optional[int] = None) -> Tuple[Dict[int, Node], List[Edge]]:
+        """
+        Unroll the whole shared graph, starting from the functional unit.
+
+        The unrolled graph can be much larger than the shared graph; use `max_depth` to limit
+        its size, or `unroll_children` to only unroll the parts you need.
+
+        Returns
+        -------
+        (dict, list)
+            Unrolled nodes (by unique id) and edges, like `nodes` and `edges` of
+            `NewNodeEachVisitGraphTraversal`.
+        """
+        nodes = {self._root_node.unique_id: self._root_node}
+        edges = []
+        queue = [self._root_node]
+        while queue:
+            node = queue.pop()
+            if max_depth is not None and node.depth >= max_depth:
+                continue
+            for edge, child in self.unroll_children(node):
+                nodes[child.unique_id] = child
+                edges.append(edge)
+                queue.append(child)
+        return nodes, edges
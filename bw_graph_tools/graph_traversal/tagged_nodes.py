@@ -2,13 +2,86 @@ import hashlib
 from collections import defaultdict
 from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 
-import bw2data as bd
+import numpy as np
 
 from bw_graph_tools.graph_traversal import SameNodeEachVisitGraphTraversal
-from bw_graph_tools.graph_traversal.base import BaseGraphTraversal
+from bw_graph_tools.graph_traversal.base import BaseGraphTraversal, GraphTraversalException
 from bw_graph_tools.graph_traversal.graph_objects import Edge, Flow, GroupedNodes, Node
 from bw_graph_tools.graph_traversal.new_node_each_visit import NewNodeEachVisitGraphTraversal
 from bw_graph_tools.graph_traversal.settings import TaggedGraphTraversalSettings
+from bw_graph_tools.graph_traversal_utils import BULK_QUERY_SIZE
+
+
+class TagIndex:
+    """Cache of activity tags, fetched from the database in bulk.
+
+    Looking up tags with ``bd.get_activity`` costs one database query per activity. Instead,
+    ``load`` fetches the tags of all activities not yet in the cache with one query per batch of
+    ids. Activity ids are unique across databases, so one `TagIndex` can be shared by several
+    traversals, including over different databases (see
+    `TaggedGraphTraversalSettings.tag_index`). Call `clear` if activity tags are changed.
+
+    The index also maps activities to integer tag group codes (`group_codes`), so that grouping
+    leaf nodes doesn't need to build label strings for each node.
+    """
+
+    def __init__(self):
+        self._tags: Dict[int, dict] = {}
+        # {tuple of tags: ({activity id: code}, {label: code})}
+        self._codes: Dict[Tuple[str, ...], Tuple[Dict[int, int], Dict[str, int]]] = {}
+
+    def load(self, activity_ids: Iterable[int]) -> None:
+        """Fetch and cache the tags of all `activity_ids` which aren't cached yet."""
+        from bw2data.backends import ActivityDataset
+
+        missing = list(set(activity_ids).difference(self._tags))
+        for start in range(0, len(missing), BULK_QUERY_SIZE):
+            batch = missing[start : start + BULK_QUERY_SIZE]
+            query = ActivityDataset.select(ActivityDataset.id, ActivityDataset.data).where(
+                ActivityDataset.id.in_(batch)
+            )
+            for obj in query:
+                self._tags[obj.id] = obj.data.get("tags", None) or {}
+        # Unknown ids are untagged; don't query them again
+        for activity_id in missing:
+            self._tags.setdefault(activity_id, {})
+
+    def get(self, activity_id: int) -> dict:
+        """Get the tags of an activity, querying the database if needed."""
+        if activity_id not in self._tags:
+            self.load([activity_id])
+        return self._tags[activity_id]
+
+    def group_codes(self, activity_ids: List[int], tags: List[str]) -> np.ndarray:
+        """Get the integer tag group code of each of `activity_ids` for the given `tags`.
+
+        Codes are computed once per activity and list of tags, and stay the same for the life of
+        the index. Code ``0`` is for activities with none of `tags` set; see `group_labels` for
+        the label of each code."""
+        codes, labels = self._codes.setdefault(tuple(tags), ({}, {"": 0}))
+        missing = set(activity_ids).difference(codes)
+        self.load(missing)
+        for activity_id in missing:
+            atags = self._tags[activity_id]
+            if all([atags.get(tag, None) is None for tag in tags]):
+                codes[activity_id] = 0
+                continue
+            label = ",".join(["{}: {}".format(tag, atags.get(tag, None) or "") for tag in tags])
+            codes[activity_id] = labels.setdefault(label, len(labels))
+        return np.fromiter(
+            (codes[activity_id] for activity_id in activity_ids),
+            dtype=np.int64,
+            count=len(activity_ids),
+        )
+
+    def group_labels(self, tags: List[str]) -> List[str]:
+        """Tag group labels for `tags`, indexed by the codes from `group_codes`."""
+        _, labels = self._codes.setdefault(tuple(tags), ({}, {"": 0}))
+        return list(labels)
+
+    def clear(self) -> None:
+        self._tags = {}
+        self._codes = {}
 
 
 class NewNodeEachVisitTaggedGraphTraversal(
@@ -19,15 +92,28 @@ class NewNodeEachVisitTaggedGraphTraversal(
     Traverse the graph with leaves nodes grouped by their tags
     """
 
+    _supports_eviction = False
+    _supports_lazy_flows = False
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.tag_index = self.settings.tag_index or TagIndex()
         self._tagged_nodes: Dict[int, Union[GroupedNodes, Node]] = {}
-        self._tagged_edges: List[Edge] = []
+        self._tagged_edges: Dict[Tuple[int, int], Edge] = {}
         self._tagged_flows: List[Flow] = []
 
+        # State for incremental updates of the tagged view. A reset of the results replaces the
+        # `_edges` list, so it is compared by identity to detect resets.
+        self._tagged_edges_list: Optional[List[Edge]] = None
+        self._tagged_edge_count = 0
+        self._tagged_groups_by_parent: Dict[int, List[GroupedNodes]] = {}
+        self._edges_by_key: Dict[Tuple[int, int], Edge] = {}
+        self._children_by_parent: Dict[int, List[int]] = defaultdict(list)
+        self._parent_by_child: Dict[int, int] = {}
+
     @classmethod
     def group_nodes_by_tags(
-        cls, children: Iterable[Node], tags: List[str]
+        cls, children: Iterable[Node], tags: List[str], tag_index: Optional[TagIndex] = None
     ) -> Dict[str, List[Node]]:
         """
         Organize child nodes by their tags for a given parent node.
@@ -40,6 +126,9 @@ class NewNodeEachVisitTaggedGraphTraversal(
             A set of child nodes to be organized by tags.
         tags : list
             A list of string for the nodes to be grouped by
+        tag_index : TagIndex, optional
+            Cache of activity tags. If not given, the tags of all `children` are fetched in one
+            bulk query.
 
         Returns
         -------
@@ -51,16 +140,19 @@ class NewNodeEachVisitTaggedGraphTraversal(
             # nodes with no applicable tags
             "": []
         }
-        for node in children:
-            activity = bd.get_activity(id=node.activity_datapackage_id)
-            atags = activity.get("tags", None) or {}
-
-            if all([atags.get(tag, None) is None for tag in tags]):
-                # means that no tags are set on this node
-                nodes_by_tags[""].append(node)
-                continue
-            label = ",".join(["{}: {}".format(tag, atags.get(tag, None) or "") for tag in tags])
-            nodes_by_tags.setdefault(label, []).append(node)
+        children = list(children)
+        if not children:
+            return nodes_by_tags
+        if tag_index is None:
+            tag_index = TagIndex()
+
+        codes = tag_index.group_codes([node.activity_datapackage_id for node in children], tags)
+        labels = tag_index.group_labels(tags)
+        # Stable sort keeps the input order of nodes within each group
+        order = np.argsort(codes, kind="stable")
+        unique_codes, starts = np.unique(codes[order], return_index=True)
+        for code, group in zip(unique_codes, np.split(order, starts[1:])):
+            nodes_by_tags[labels[code]] = [children[index] for index in group]
         return nodes_by_tags
 
     @classmethod
@@ -146,19 +238,46 @@ class NewNodeEachVisitTaggedGraphTraversal(
         """
         grouped_nodes = {}
         edges = []
+        groups = []
         for tag_group, nodes in nodes_by_tags.items():
             if not self.should_group_leaves(parent_node, nodes, tag_group):
                 continue
             lookup = self.generate_id_for_grouped_node(parent_node, nodes, tag_group)
+            groups.append((lookup, tag_group, nodes))
+        if not groups:
+            return grouped_nodes, edges
+
+        # Sum node and edge attributes over all groups at once
+        members = [node for _, _, nodes in groups for node in nodes]
+        group_indices = np.repeat(np.arange(len(groups)), [len(nodes) for _, _, nodes in groups])
+
+        def group_sums(values: Iterable[float]) -> np.ndarray:
+            return np.bincount(
+                group_indices,
+                weights=np.fromiter(values, dtype=float, count=len(members)),
+                minlength=len(groups),
+            )
+
+        supply_amounts = group_sums(node.supply_amount for node in members)
+        cumulative_scores = group_sums(node.cumulative_score for node in members)
+        direct_emissions_scores = group_sums(node.direct_emissions_score for node in members)
+        outside_specific_flows = group_sums(
+            node.direct_emissions_score_outside_specific_flows for node in members
+        )
+        amounts = group_sums(
+            grouped_edges[(parent_node.unique_id, node.unique_id)].amount for node in members
+        )
+
+        for index, (lookup, tag_group, nodes) in enumerate(groups):
             g_node = GroupedNodes(
                 nodes=nodes,
                 label=tag_group,
                 unique_id=lookup,
                 depth=nodes[0].depth,
-                supply_amount=0,
-                cumulative_score=0,
-                direct_emissions_score=0,
-                direct_emissions_score_outside_specific_flows=0,
+                supply_amount=float(supply_amounts[index]),
+                cumulative_score=float(cumulative_scores[index]),
+                direct_emissions_score=float(direct_emissions_scores[index]),
+                direct_emissions_score_outside_specific_flows=float(outside_specific_flows[index]),
                 terminal=True,
             )
             edge = Edge(
@@ -167,21 +286,8 @@ class NewNodeEachVisitTaggedGraphTraversal(
                 producer_index=None,
                 producer_unique_id=g_node.unique_id,
                 product_index=None,
-                amount=0,
+                amount=float(amounts[index]),
             )
-            for node in nodes:
-                # handle node aggregation
-                g_node.supply_amount += node.supply_amount
-                g_node.cumulative_score += node.cumulative_score
-                g_node.direct_emissions_score += node.direct_emissions_score
-                g_node.direct_emissions_score_outside_specific_flows += (
-                    node.direct_emissions_score_outside_specific_flows
-                )
-
-                # handle edge aggregation
-                node_edge = grouped_edges.get((parent_node.unique_id, node.unique_id))
-                edge.amount += node_edge.amount
-
             grouped_nodes[g_node.unique_id] = g_node
             edges.append(edge)
         return grouped_nodes, edges
@@ -191,51 +297,117 @@ class NewNodeEachVisitTaggedGraphTraversal(
         nodes: list = None,
         depth: int = None,
     ) -> None:
-        super().traverse(nodes=nodes, depth=depth)
+        """
+        Traverse the graph, and update the tagged view of the results.
 
-        grouped_nodes: Dict[int, GroupedNodes] = {}
-        edges: Dict[Tuple[int, int], Edge] = {
-            (edge.consumer_unique_id, edge.producer_unique_id): edge for edge in self._edges
-        }
-        self._tagged_edges = []
-        self._tagged_nodes = {}
+        Only parents whose children changed in this call are regrouped: the consumers of new
+        edges, and the parents of those consumers (whose leaves were expanded). Repeated
+        traversals from single nodes therefore cost in proportion to the new part of the graph.
+        """
+        super().traverse(nodes=nodes, depth=depth)
         self._tagged_flows = {}
 
-        leaf_nodes_by_parent = self.group_leaf_nodes_by_parent(self._edges)
+        if self._edges is not self._tagged_edges_list or len(self._edges) < self._tagged_edge_count:
+            # Results were reset
+            self._rebuild_tagged_graph()
+            return
 
-        for parent, children in leaf_nodes_by_parent.items():
-            parent_node = self._nodes[parent]
-            nodes_by_tags = self.group_nodes_by_tags(
-                map(lambda x: self._nodes[x], children), self.settings.tags
-            )
-            if untagged_nodes := nodes_by_tags.pop(""):
-                self._tagged_nodes.update({node.unique_id: node for node in untagged_nodes})
-            gnodes, gedges = self.create_group_tagged_nodes(parent_node, nodes_by_tags, edges)
-            grouped_nodes.update(gnodes)
-            self._tagged_edges.extend(gedges)
-
-        visited_group_nodes = {
-            gn_node.unique_id for gn in grouped_nodes.values() for gn_node in gn.nodes
-        }
-        # add nodes that may have been excluded from groupings
-        missing_nodes = {
-            idx: node
-            for idx, node in self._nodes.items()
-            if node.unique_id not in self._tagged_nodes
-            and node.unique_id not in visited_group_nodes
-        }
-        self._tagged_nodes.update(missing_nodes)
+        new_edges = self._edges[self._tagged_edge_count :]
+        self._tagged_edge_count = len(self._edges)
+
+        if nodes is None:
+            new_nodes = [self._root_node]
+        else:
+            new_nodes = nodes
+        self._update_tagged_graph(new_nodes, new_edges)
 
-        # add remaining edges
-        missing_edges = [
-            edge
-            for edge in self._edges
-            if edge.consumer_unique_id in self._tagged_nodes
-            and edge.producer_unique_id in self._tagged_nodes
-        ]
+    def rescore(self, method: tuple) -> None:
+        """
+        Recalculate all scores for the impact assessment `method`; see
+        `NewNodeEachVisitGraphTraversal.rescore`. Also rebuilds the tagged view, so the
+        `GroupedNodes` sum the new scores of their members.
+        """
+        super().rescore(method)
+        self._rebuild_tagged_graph()
 
-        self._tagged_edges.extend(missing_edges)
-        self._tagged_nodes.update(grouped_nodes)
+    def _rebuild_tagged_graph(self) -> None:
+        """Build the tagged view from scratch from all traversal results."""
+        self._tagged_nodes = {}
+        self._tagged_edges = {}
+        self._tagged_edges_list = self._edges
+        self._tagged_edge_count = len(self._edges)
+        self._tagged_groups_by_parent = {}
+        self._edges_by_key = {}
+        self._children_by_parent = defaultdict(list)
+        self._parent_by_child = {}
+        self._update_tagged_graph(list(self._nodes.values()), self._edges)
+
+    def _update_tagged_graph(self, new_nodes: List[Node], new_edges: List[Edge]) -> None:
+        """Add `new_nodes` and `new_edges` to the tagged view, and regroup the leaves of the
+        parents whose children changed."""
+        affected_parents = set()
+        for node in new_nodes:
+            self._tagged_nodes.setdefault(node.unique_id, node)
+            if node.unique_id in self._parent_by_child:
+                affected_parents.add(self._parent_by_child[node.unique_id])
+
+        for edge in new_edges:
+            consumer, producer = edge.consumer_unique_id, edge.producer_unique_id
+            self._edges_by_key[(consumer, producer)] = edge
+            self._children_by_parent[consumer].append(producer)
+            self._parent_by_child[producer] = consumer
+            self._tagged_nodes[producer] = self._nodes[producer]
+            self._tagged_edges[(consumer, producer)] = edge
+
+            # The consumer has new leaves, and is itself no longer a leaf of its parent
+            affected_parents.add(consumer)
+            if consumer in self._parent_by_child:
+                affected_parents.add(self._parent_by_child[consumer])
+
+        leaves_by_parent = {}
+        for parent in affected_parents:
+            self._ungroup_leaves(parent)
+            leaves_by_parent[parent] = [
+                self._nodes[child]
+                for child in self._children_by_parent.get(parent, [])
+                if child not in self._children_by_parent
+            ]
+
+        # Fetch the tags of all leaves at once instead of once per parent
+        self.tag_index.load(
+            node.activity_datapackage_id for leaves in leaves_by_parent.values() for node in leaves
+        )
+        for parent, leaves in leaves_by_parent.items():
+            if leaves:
+                self._group_leaves(parent, leaves)
+
+    def _ungroup_leaves(self, parent: int) -> None:
+        """Replace the `GroupedNodes` of `parent` with their member nodes and edges."""
+        for group in self._tagged_groups_by_parent.pop(parent, []):
+            del self._tagged_nodes[group.unique_id]
+            del self._tagged_edges[(parent, group.unique_id)]
+            for node in group.nodes:
+                self._tagged_nodes[node.unique_id] = node
+                self._tagged_edges[(parent, node.unique_id)] = self._edges_by_key[
+                    (parent, node.unique_id)
+                ]
+
+    def _group_leaves(self, parent: int, leaves: List[Node]) -> None:
+        """Replace the tagged leaves of `parent` with `GroupedNodes`."""
+        nodes_by_tags = self.group_nodes_by_tags(leaves, self.settings.tags, self.tag_index)
+        # Untagged leaves are already in the tagged view
+        nodes_by_tags.pop("")
+        gnodes, gedges = self.create_group_tagged_nodes(
+            self._nodes[parent], nodes_by_tags, self._edges_by_key
+        )
+        for group in gnodes.values():
+            for node in group.nodes:
+                del self._tagged_nodes[node.unique_id]
+                del self._tagged_edges[(parent, node.unique_id)]
+        self._tagged_nodes.update(gnodes)
+        for edge in gedges:
+            self._tagged_edges[(parent, edge.producer_unique_id)] = edge
+        self._tagged_groups_by_parent[parent] = list(gnodes.values())
 
     @property
     def nodes(self):
@@ -243,7 +415,7 @@ class NewNodeEachVisitTaggedGraphTraversal(
 
     @property
     def edges(self):
-        return self._tagged_edges
+        return list(self._tagged_edges.values())
 
     @property
     def flows(self):
@@ -257,6 +429,15 @@ class SameNodeEachVisitTaggedGraphTraversal(
     A tagged variant of same node each visit
     """
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.settings.aggregate_by_activity:
+            # Leaves are grouped under their only consumer, but nodes aggregated by activity
+            # can have several consumers
+            raise GraphTraversalException(
+                f"{type(self).__name__} doesn't support `aggregate_by_activity`"
+            )
+
     def generate_id_for_grouped_node(
         self, parent_node: Node, nodes: List[Node], tag_group: str
     ) -> int:
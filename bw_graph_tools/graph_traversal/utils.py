@@ -1,10 +1,292 @@
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Dict, Hashable, Optional
+
 import numpy as np
 from bw2calc import PYPARDISO, LCA, spsolve
+from scipy.linalg import lu_factor, lu_solve
 from scipy.sparse import spmatrix
+from scipy.sparse.linalg import LinearOperator, bicgstab, gmres, spilu, splu
 
+from bw_graph_tools.errors import SolverConvergenceError
 from bw_graph_tools.graph_traversal.graph_objects import Node
 
 
+class KrylovSolver:
+    """Preconditioned iterative (Krylov subspace) solver for technosphere matrices.
+
+    Direct solvers (UMFPACK, SuperLU, PARDISO) factorize the technosphere matrix, and the fill-in
+    of the factors can need much more memory than the matrix itself. This solver only needs the
+    matrix and a preconditioner, which is built once per matrix. Pass it to `CachingSolver` to
+    use it for all solves during graph traversal::
+
+        solver = CachingSolver(lca, linear_solver=KrylovSolver(method="bicgstab", rtol=1e-8))
+        settings = GraphTraversalSettings(caching_solver=solver)
+
+    Solutions are remembered by key (e.g. the product index), and used as initial guess when the
+    same right-hand-side is solved again, for example after the matrix values changed in a Monte
+    Carlo iteration or scenario. An initial guess is only used if its residual is smaller than
+    that of the zero vector.
+
+    Parameters
+    ----------
+    method : str
+        ``"gmres"`` or ``"bicgstab"``. BiCGSTAB needs less memory per iteration; if it breaks
+        down, the solve is continued with GMRES.
+    preconditioner : str or None
+        ``"ilu"`` for an incomplete LU factorization (``scipy.sparse.linalg.spilu``),
+        ``"jacobi"`` for the inverse of the matrix diagonal, which needs almost no memory, or
+        ``None``.
+    rtol : float
+        Relative tolerance on the residual norm
+    atol : float
+        Absolute tolerance on the residual norm
+    maxiter : int or None
+        Maximum number of iterations per solve; scipy's default if `None`.
+    warm_start : int
+        Number of solutions to keep as initial guesses. ``0`` disables warm starts.
+    drop_tol : float
+        Drop tolerance of the ILU preconditioner; larger values need less memory.
+    fill_factor : float
+        Maximum fill-in of the ILU preconditioner, relative to the matrix.
+    """
+
+    name = "krylov"
+    METHODS = {"gmres": gmres, "bicgstab": bicgstab}
+    PRECONDITIONERS = ("ilu", "jacobi", None)
+
+    def __init__(
+        self,
+        method: str = "gmres",
+        preconditioner: Optional[str] = "ilu",
+        rtol: float = 1e-10,
+        atol: float = 0.0,
+        maxiter: Optional[int] = None,
+        warm_start: int = 100,
+        drop_tol: float = 1e-4,
+        fill_factor: float = 10,
+    ):
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown method {method}; must be one of {sorted(self.METHODS)}")
+        if preconditioner not in self.PRECONDITIONERS:
+            raise ValueError(
+                f"Unknown preconditioner {preconditioner}; must be one of {self.PRECONDITIONERS}"
+            )
+        self.method = method
+        self.preconditioner = preconditioner
+        self.rtol = rtol
+        self.atol = atol
+        self.maxiter = maxiter
+        self.warm_start = warm_start
+        self.drop_tol = drop_tol
+        self.fill_factor = fill_factor
+        # Matrix as passed to `set_matrix`, and its CSR version used for solving
+        self.source = None
+        self.matrix = None
+        # Total number of iterations of all solves
+        self.iterations = 0
+        self._solutions = OrderedDict()
+
+    def set_matrix(self, matrix: spmatrix) -> None:
+        """Use `matrix` for the following solves, and build its preconditioner.
+
+        Call again when the matrix values change in place. Remembered solutions are kept as
+        initial guesses.
+        """
+        self.source = matrix
+        self.matrix = matrix.tocsr()
+        self._matrix_transposed = self.matrix.T.tocsr()
+        shape = self.matrix.shape
+        if self.preconditioner == "ilu":
+            ilu = spilu(matrix.tocsc(), drop_tol=self.drop_tol, fill_factor=self.fill_factor)
+            self._preconditioners = (
+                LinearOperator(shape, matvec=ilu.solve),
+                LinearOperator(shape, matvec=lambda x: ilu.solve(x, trans="T")),
+            )
+        elif self.preconditioner == "jacobi":
+            diagonal = self.matrix.diagonal()
+            inverse = np.divide(1.0, diagonal, out=np.ones_like(diagonal), where=diagonal != 0)
+            jacobi = LinearOperator(shape, matvec=lambda x: inverse * x.ravel())
+            self._preconditioners = (jacobi, jacobi)
+        else:
+            self._preconditioners = (None, None)
+
+    def _solve(self, method, matrix, rhs, x0, transpose):
+        def count(_):
+            self.iterations += 1
+
+        kwargs = {"callback_type": "pr_norm"} if method == "gmres" else {}
+        return self.METHODS[method](
+            matrix,
+            rhs,
+            x0=x0,
+            rtol=self.rtol,
+            atol=self.atol,
+            maxiter=self.maxiter,
+            M=self._preconditioners[transpose],
+            callback=count,
+            **kwargs,
+        )
+
+    def solve(
+        self, rhs: np.ndarray, key: Optional[Hashable] = None, transpose: bool = False
+    ) -> np.ndarray:
+        """Solve ``A x = rhs``, or ``A^T x = rhs`` if `transpose`.
+
+        Parameters
+        ----------
+        rhs : numpy.ndarray
+            Right-hand-side vector
+        key : hashable, optional
+            Identifies the right-hand-side, e.g. a product index. The solution is remembered
+            under this key, and used as initial guess for the next solve with the same key.
+        transpose : bool
+            Solve the transposed system
+
+        Returns
+        -------
+        numpy.ndarray
+            Solution vector
+
+        Raises
+        ------
+        SolverConvergenceError
+            If the tolerance isn't reached within `maxiter` iterations
+        """
+        if self.matrix is None:
+            raise ValueError("No matrix given; call `set_matrix` first")
+        matrix = self._matrix_transposed if transpose else self.matrix
+        memory_key = (key, transpose)
+
+        x0 = self._solutions.get(memory_key) if key is not None else None
+        if x0 is not None and np.linalg.norm(rhs - matrix @ x0) >= np.linalg.norm(rhs):
+            x0 = None
+
+        solution, info = self._solve(self.method, matrix, rhs, x0, transpose)
+        if info < 0:
+            # BiCGSTAB breaks down when the residual becomes orthogonal to the initial residual,
+            # which happens for unit demand vectors; continue with GMRES, which can't.
+            solution, info = self._solve("gmres", matrix, rhs, solution, transpose)
+        if info != 0:
+            raise SolverConvergenceError(
+                f"{self.method} didn't converge to rtol={self.rtol} (info={info})"
+            )
+        if key is not None and self.warm_start:
+            self._solutions[memory_key] = solution
+            self._solutions.move_to_end(memory_key)
+            while len(self._solutions) > self.warm_start:
+                self._solutions.popitem(last=False)
+        return solution
+
+
+class LowRankUpdateSolver:
+    """Solve scenario technosphere matrices by updating the factorization of a baseline matrix.
+
+    Scenarios often change only a few columns (activities) of the technosphere matrix. If the
+    scenario matrix is ``A' = A + D E^T``, where the columns of ``D`` are the changes of the
+    ``k`` changed columns and ``E`` selects these columns, the Sherman-Morrison-Woodbury
+    identity gives ``A'^-1 b = A^-1 b - Z (I + E^T Z)^-1 E^T A^-1 b``, with ``Z = A^-1 D``,
+    so each scenario needs ``k`` solves with the baseline factorization and a dense ``k x k``
+    factorization instead of a new sparse factorization. Solves then cost one baseline solve
+    plus ``O(nk)``. This pays off when ``k`` is small compared to the matrix size.
+
+    Pass it to `CachingSolver` for graph traversal, one `CachingSolver` per scenario::
+
+        low_rank = LowRankUpdateSolver(baseline_lca.technosphere_matrix)
+        for lca in scenario_lcas:
+            low_rank.attach(lca)
+            lca.lci_calculation()
+            lca.lcia_calculation()
+            solver = CachingSolver(lca, linear_solver=low_rank)
+            NewNodeEachVisitGraphTraversal(
+                lca, GraphTraversalSettings(caching_solver=solver)
+            ).traverse()
+
+    Parameters
+    ----------
+    baseline : scipy.sparse.spmatrix
+        Baseline technosphere matrix; factorized once with ``scipy.sparse.linalg.splu``.
+    max_rank : int or None
+        Raise a ``ValueError`` if a scenario changes more columns than this, as a new
+        factorization is then likely to be faster.
+    """
+
+    name = "low_rank"
+
+    def __init__(self, baseline: spmatrix, max_rank: Optional[int] = None):
+        self.baseline = baseline.tocsc()
+        self.max_rank = max_rank
+        self._lu = splu(self.baseline)
+        self.set_matrix(self.baseline)
+
+    @property
+    def rank(self) -> int:
+        """Number of changed columns of the current matrix."""
+        return len(self.columns)
+
+    def set_matrix(self, matrix: spmatrix) -> None:
+        """Prepare the low-rank update from the baseline to the scenario `matrix`."""
+        if matrix.shape != self.baseline.shape:
+            raise ValueError(
+                f"Matrix shape {matrix.shape} differs from baseline shape {self.baseline.shape}"
+            )
+        difference = (matrix.tocsc() - self.baseline).tocsc()
+        difference.eliminate_zeros()
+        self.columns = np.flatnonzero(np.diff(difference.indptr))
+        if self.max_rank is not None and self.rank > self.max_rank:
+            raise ValueError(
+                f"Matrix changes {self.rank} columns, more than `max_rank` of {self.max_rank}"
+            )
+        self.source = matrix
+        self._updates = difference[:, self.columns].toarray()
+        self._corrections = self._baseline_solve(self._updates)
+        self._capacitance = lu_factor(np.eye(self.rank) + self._corrections[self.columns, :])
+        # Only needed for transposed solves; see `solve`
+        self._transposed_corrections = None
+
+    def _baseline_solve(self, rhs: np.ndarray, transpose: bool = False) -> np.ndarray:
+        if rhs.ndim == 2 and not rhs.shape[1]:
+            return np.zeros(rhs.shape)
+        return self._lu.solve(rhs, trans="T" if transpose else "N")
+
+    def solve(
+        self, rhs: np.ndarray, key: Optional[Hashable] = None, transpose: bool = False
+    ) -> np.ndarray:
+        """Solve ``A' x = rhs``, or ``A'^T x = rhs`` if `transpose`, for the current matrix.
+
+        `key` is accepted for compatibility with `KrylovSolver`, and ignored.
+        """
+        solution = self._baseline_solve(rhs, transpose)
+        if not self.rank:
+            return solution
+        if not transpose:
+            return solution - self._corrections @ lu_solve(
+                self._capacitance, solution[self.columns]
+            )
+        if self._transposed_corrections is None:
+            selection = np.zeros((self.baseline.shape[0], self.rank))
+            selection[self.columns, np.arange(self.rank)] = 1
+            self._transposed_corrections = self._baseline_solve(selection, transpose=True)
+        return solution - self._transposed_corrections @ lu_solve(
+            self._capacitance, self._updates.T @ solution, trans=1
+        )
+
+    def __call__(self, demand: np.ndarray) -> np.ndarray:
+        return self.solve(demand)
+
+    def attach(self, lca: LCA) -> None:
+        """Use this solver for `lca`, a scenario of the baseline.
+
+        Sets the scenario matrix, and sets ``lca.solver``, so that ``lca.lci_calculation()`` and
+        ``lca.solve_linear_system()`` use the low-rank update instead of a new factorization.
+        """
+        self.set_matrix(lca.technosphere_matrix)
+        lca.solver = self
+
+
 class CachingSolver:
     """Class which caches cumulative LCA scores during graph traversal.
 
@@ -19,14 +301,77 @@ class CachingSolver:
     * Otherwise (UMFPACK / SuperLU), a single multi-right-hand-side solve is *slower* than reusing
       a cached factorization, so the LCA's technosphere matrix is decomposed once (via
       ``decompose_technosphere``) and each product is solved iteratively through ``lca.solver``.
+    * If a `linear_solver` is given, each product is solved with it instead. Use a
+      `KrylovSolver` when a direct factorization doesn't fit in memory, or a
+      `LowRankUpdateSolver` to reuse the factorization of a baseline matrix for scenarios.
+      Linear solvers have a `name` (the key in `stats`), a `source` attribute with the matrix
+      they were last given, and the methods ``set_matrix(matrix)`` and
+      ``solve(rhs, key=None, transpose=False)``.
     """
 
-    def __init__(self, lca: LCA):
+    def __init__(self, lca: LCA, linear_solver=None):
         self.lca = lca
+        self.linear_solver = linear_solver
         self._score_cache = {}
         # 1-D array of per-activity characterized scores (column sums of the characterized
         # biosphere matrix). Set by `set_score_row` before `scores` is called.
         self.score_row = None
+        # Unit scores for all products, see `all_unit_scores`
+        self._all_unit_scores = None
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        """Set all counters returned by `stats` to zero. Doesn't clear the cache."""
+        self._hits = 0
+        self._misses = 0
+        self._batch_sizes = []
+        backends = ["pardiso", "iterative", "transposed"]
+        if self.linear_solver is not None:
+            backends.insert(2, self.linear_solver.name)
+        self._solves = {backend: 0 for backend in backends}
+        self._solve_seconds = {backend: 0.0 for backend in backends}
+
+    def stats(self) -> dict:
+        """Return statistics on cache use and linear solves since creation or `reset_stats`.
+
+        Returns
+        -------
+        dict
+            With the keys:
+
+            * ``hits`` and ``misses``: Number of requested product scores which were, or
+              weren't, already cached. ``hit_rate`` is ``hits / (hits + misses)``.
+            * ``batches``: Number of batches of missing products solved by ``scores``, and
+              ``batch_sizes``: the number of products in each batch.
+            * ``solves``: Number of linear solves per backend; ``"pardiso"`` counts one
+              multi-right-hand-side solve per batch, ``"iterative"`` and the `linear_solver`
+              name one solve per product, and ``"transposed"`` the solves of ``all_unit_scores``.
+            * ``solve_seconds``: Total time spent solving, per backend.
+            * ``cache_size``: Number of cached scores, and ``cache_bytes``: an estimate of the
+              memory used by the cache.
+        """
+        requested = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / requested if requested else 0.0,
+            "batches": len(self._batch_sizes),
+            "batch_sizes": list(self._batch_sizes),
+            "solves": dict(self._solves),
+            "solve_seconds": dict(self._solve_seconds),
+            "cache_size": len(self._score_cache),
+            "cache_bytes": self.cache_bytes(),
+        }
+
+    def cache_bytes(self) -> int:
+        """Estimate the memory used by the cached scores, in bytes."""
+        # Each entry is an int key and a float value; small ints are shared, so this is an upper
+        # bound for the entries.
+        entry = sys.getsizeof(2**40) + sys.getsizeof(0.0)
+        total = sys.getsizeof(self._score_cache) + len(self._score_cache) * entry
+        if self._all_unit_scores is not None:
+            total += self._all_unit_scores.nbytes
+        return total
 
     def in_cache(self, indices: set[int]) -> set[int]:
         """Return all `indices` values which already have a cached score."""
@@ -36,6 +381,11 @@ class CachingSolver:
         """Store a pre-computed per-unit cumulative score (for a demand amount of 1)."""
         self._score_cache[index] = float(unit_score)
 
+    def clear(self) -> None:
+        """Remove all cached scores, e.g. after the characterization changed."""
+        self._score_cache.clear()
+        self._all_unit_scores = None
+
     def set_score_row(self, characterized_biosphere: spmatrix) -> None:
         """Pre-compute the per-activity score row used to reduce supply vectors to scores.
 
@@ -45,6 +395,7 @@ class CachingSolver:
         ``(characterized_biosphere * supply).sum()``.
         """
         self.score_row = np.asarray(characterized_biosphere.sum(axis=0)).ravel()
+        self._all_unit_scores = None
 
     def scores(self, indices: list[int], amounts: list[float]) -> list[float]:
         """Compute cumulative LCA scores for several products in a single batched solve.
@@ -62,17 +413,61 @@ class CachingSolver:
             Cumulative LCA score for each `(index, amount)` pair, in input order.
         """
         missing = [index for index in indices if index not in self._score_cache]
+        self._misses += len(missing)
+        self._hits += len(indices) - len(missing)
         if missing:
-            if PYPARDISO:
+            self._batch_sizes.append(len(missing))
+            start = perf_counter()
+            if self.linear_solver is not None:
+                unit_scores = self._unit_scores_linear_solver(missing)
+                backend = self.linear_solver.name
+                self._solves[backend] += len(missing)
+            elif PYPARDISO:
                 unit_scores = self._unit_scores_pardiso(missing)
+                backend = "pardiso"
+                self._solves[backend] += 1
             else:
                 unit_scores = self._unit_scores_iterative(missing)
+                backend = "iterative"
+                self._solves[backend] += len(missing)
+            self._solve_seconds[backend] += perf_counter() - start
             for index, score in zip(missing, unit_scores):
                 self._score_cache[index] = float(score)
         return [
             self._score_cache[index] * amount for index, amount in zip(indices, amounts)
         ]
 
+    def all_unit_scores(self) -> np.ndarray:
+        """Compute the cumulative LCA score per unit of every product in a single solve.
+
+        Instead of solving ``A x = e_i`` for each product ``i``, this solves the transposed
+        system ``A^T y = score_row`` once; ``y[i]`` is then the cumulative score of one unit of
+        product ``i``. The result is cached, and also fills the per-product score cache used by
+        ``scores``.
+
+        Returns
+        -------
+        numpy.ndarray
+            Cumulative LCA score per unit of each product, indexed by technosphere row.
+        """
+        if self._all_unit_scores is None:
+            start = perf_counter()
+            if self.linear_solver is not None:
+                unit_scores = self._prepared_linear_solver().solve(
+                    self.score_row, key="all_unit_scores", transpose=True
+                )
+            else:
+                unit_scores = np.asarray(
+                    spsolve(self.lca.technosphere_matrix.T.tocsr(), self.score_row)
+                ).ravel()
+            self._solves["transposed"] += 1
+            self._solve_seconds["transposed"] += perf_counter() - start
+            self._score_cache.update(
+                (index, float(score)) for index, score in enumerate(unit_scores)
+            )
+            self._all_unit_scores = unit_scores
+        return self._all_unit_scores
+
     def _unit_scores_pardiso(self, indices: list[int]) -> np.ndarray:
         """Solve all `indices` in a single multi-right-hand-side PARDISO solve."""
         matrix = self.lca.technosphere_matrix
@@ -103,6 +498,23 @@ class CachingSolver:
             demand[index] = 0
         return unit_scores
 
+    def _prepared_linear_solver(self):
+        """Return `linear_solver`, first giving it the technosphere matrix if it changed."""
+        if self.linear_solver.source is not self.lca.technosphere_matrix:
+            self.linear_solver.set_matrix(self.lca.technosphere_matrix)
+        return self.linear_solver
+
+    def _unit_scores_linear_solver(self, indices: list[int]) -> np.ndarray:
+        """Solve each of `indices` separately with `linear_solver`."""
+        linear_solver = self._prepared_linear_solver()
+        demand = np.zeros(self.lca.technosphere_matrix.shape[0])
+        unit_scores = np.empty(len(indices))
+        for position, index in enumerate(indices):
+            demand[index] = 1
+            unit_scores[position] = self.score_row @ linear_solver.solve(demand, key=index)
+            demand[index] = 0
+        return unit_scores
+
 
 class Counter:
     """Custom counter to have easy access to current value"""
@@ -118,6 +530,87 @@ class Counter:
         return self.value > other
 
 
+@dataclass
+class PhaseStats:
+    """Number of calls to, and total time in seconds spent in, one phase of the traversal."""
+
+    count: int = 0
+    seconds: float = 0.0
+
+
+class TraversalProfiler:
+    """Accumulates timings and counts for each phase of a graph traversal.
+
+    Created by the traversal when ``settings.profile`` is true, or when
+    ``settings.profile_callback`` is given; otherwise no instrumentation is added. The profiler
+    replaces the instrumented methods with timed wrappers on the traversal *instance*, so the
+    uninstrumented code path is unchanged.
+
+    Phases are:
+
+    * ``get_demand_vector_for_activity``: finding the inputs of each traversed node
+    * ``scores``: cumulative scores for the inputs, i.e. ``CachingSolver.scores``
+    * ``add_biosphere_flows``: creating the separate `Flow` instances
+    * ``traverse_edges``: everything done for one traversed node, *including* ``scores``,
+      ``add_biosphere_flows``, and ``heappush``, plus creating `Node` and `Edge` instances
+    * ``heappush`` and ``heappop``: priority queue operations
+
+    ``callback``, if given, is called as ``callback(phase, seconds)`` after each timed call.
+    """
+
+    PHASES = (
+        "get_demand_vector_for_activity",
+        "scores",
+        "add_biosphere_flows",
+        "traverse_edges",
+        "heappush",
+        "heappop",
+    )
+
+    def __init__(self, callback: Optional[Callable[[str, float], None]] = None):
+        self.callback = callback
+        self.phases: Dict[str, PhaseStats] = {phase: PhaseStats() for phase in self.PHASES}
+
+    def wrap(self, phase: str, function: Callable) -> Callable:
+        """Return a version of `function` which records its calls under `phase`."""
+        stats = self.phases[phase]
+        callback = self.callback
+
+        @wraps(function)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                stats.count += 1
+                stats.seconds += elapsed
+                if callback is not None:
+                    callback(phase, elapsed)
+
+        return timed
+
+    def as_dict(self) -> Dict[str, dict]:
+        """Return ``{phase: {"count": int, "seconds": float}}``."""
+        return {
+            phase: {"count": stats.count, "seconds": stats.seconds}
+            for phase, stats in self.phases.items()
+        }
+
+    def reset(self) -> None:
+        """Set all counts and timings to zero."""
+        for stats in self.phases.values():
+            stats.count, stats.seconds = 0, 0.0
+
+    def __str__(self) -> str:
+        lines = [f"{'phase':<32}{'count':>10}{'seconds':>12}"]
+        lines.extend(
+            f"{phase:<32}{stats.count:>10}{stats.seconds:>12.4f}"
+            for phase, stats in self.phases.items()
+        )
+        return "\n".join(lines)
+
+
 def get_demand_vector_for_activity(
     node: Node,
     skip_coproducts: bool,
@@ -1,24 +1,22 @@
-from typing import List, Optional
+import importlib.util
+import typing
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from bw2calc import LCA
+import numpy as np
 from scipy import sparse
 
 from bw_graph_tools.matrix_tools import to_normalized_adjacency_matrix
-from bw_graph_tools.shortest_path import get_shortest_path
+from bw_graph_tools.shortest_path import ReweightedAdjacency, get_shortest_path
 
-try:
-    import bw2data as bd
-    from bw2data import Edge, Node
-
-    brightway_available = True
-except ImportError:
+if typing.TYPE_CHECKING:
+    import bw2calc
+    import bw2data
 
-    class Dummy:
-        def get_node(self):
-            pass
+# Importing `bw2data` and `bw2calc` is slow, so we only do it in the functions which need them
+brightway_available = importlib.util.find_spec("bw2data") is not None
 
-    bd, Node, Edge = Dummy(), Dummy(), Dummy()
-    brightway_available = False
+# Number of ids per bulk node query, below the default SQLite limit on query variables
+BULK_QUERY_SIZE = 900
 
 
 def get_path_from_matrix(
@@ -38,29 +36,128 @@ def get_path_from_matrix(
     )
 
 
+class PathFinder:
+    """Find paths with the most mass or energetic flow, reusing work across many queries.
+
+    ``get_path_from_matrix`` runs Bellman-Ford from scratch for every query, as the log-transformed
+    normalized adjacency matrix has negative weights. This class computes Johnson potentials once
+    for ``matrix``, and answers each query with Dijkstra on the reweighted (non-negative) graph.
+
+    ``matrix`` is a technosphere matrix following Brightway conventions, see
+    ``to_normalized_adjacency_matrix``. The matrix shouldn't change after the class is created.
+    """
+
+    def __init__(self, matrix: sparse.spmatrix):
+        self.adjacency = ReweightedAdjacency(to_normalized_adjacency_matrix(matrix=matrix))
+
+    def get_path(self, source: int, target: int) -> List:
+        """Get the path with the most flow from ``source`` to ``target``, both integer matrix
+        indices.
+
+        Returns a list like ``[source, int, int, int, target]``, or an empty list if there is no
+        path."""
+        return self.adjacency.get_shortest_path(sources=source, targets=target)
+
+    def get_paths(
+        self, source: int, target: int, k: int = 10, max_expansions: Optional[int] = None
+    ) -> List[Tuple[List, float]]:
+        """Get the ``k`` paths with the most flow from ``source`` to ``target``, both integer
+        matrix indices. Paths are simple, i.e. never visit a node twice, even in cyclic graphs.
+
+        ``max_expansions`` caps the search effort, see
+        ``ReweightedAdjacency.get_k_shortest_paths``.
+
+        Returns a list of ``(path, amount)`` tuples, sorted by decreasing ``amount``. ``amount``
+        is the product of the normalized exchange amounts along the path, i.e. the amount of
+        ``target`` needed for one unit of ``source`` along this path only."""
+        return [
+            (path, float(np.exp(-length)))
+            for path, length in self.adjacency.get_k_shortest_paths(
+                source=source, target=target, k=k, max_expansions=max_expansions
+            )
+        ]
+
+
+def get_nodes_by_id(ids: Iterable[int]) -> Dict[int, "bw2data.Node"]:
+    """Get Brightway nodes for many database ``ids`` at once.
+
+    ``bd.get_node`` issues one database query per node. Here we fetch all nodes with one query
+    per batch of ``BULK_QUERY_SIZE`` ids, and build each node with the node class of its
+    database backend.
+
+    Returns a dictionary of ``{id: node}``; ids not found in the database are missing."""
+    if not brightway_available:
+        raise ImportError("Brightway not available")
+
+    import bw2data as bd
+    from bw2data.backends import ActivityDataset
+
+    ids = list(set(ids))
+    node_classes, nodes = {}, {}
+    for start in range(0, len(ids), BULK_QUERY_SIZE):
+        batch = ids[start : start + BULK_QUERY_SIZE]
+        for obj in ActivityDataset.select().where(ActivityDataset.id.in_(batch)):
+            if obj.database not in node_classes:
+                node_classes[obj.database] = bd.Database(obj.database).node_class
+            nodes[obj.id] = node_classes[obj.database](obj)
+    return nodes
+
+
+def paths_as_brightway_objects(
+    pairs: Iterable[Tuple["bw2data.Node", "bw2data.Node"]],
+    lca: "bw2calc.LCA",
+    path_finder: Optional[PathFinder] = None,
+    resolve_nodes: bool = True,
+) -> List[List[Tuple]]:
+    """Get the path with the most flow for each ``(source_node, target_node)`` pair in ``pairs``.
+
+    Unlike calling ``path_as_brightway_objects`` for each pair, the ``lca`` is not changed or
+    recalculated, the normalized adjacency matrix is built only once (pass ``path_finder`` to
+    reuse it across calls), and all nodes on all paths are fetched in one bulk query.
+
+    ``lca`` must already have done the LCI calculation, and its technosphere must include all
+    the given nodes.
+
+    Returns one list per pair of ``(consumer, producer, amount)`` tuples, one for each edge on the
+    path. If ``resolve_nodes`` is false, ``consumer`` and ``producer`` are database ids instead of
+    nodes, and the database is not queried at all."""
+    if path_finder is None:
+        path_finder = PathFinder(lca.technosphere_mm.matrix)
+
+    id_paths = []
+    for source_node, target_node in pairs:
+        path = path_finder.get_path(
+            source=lca.dicts.activity[source_node.id],
+            target=lca.dicts.activity[target_node.id],
+        )
+        id_paths.append(
+            [
+                (
+                    lca.dicts.product.reversed[x],
+                    lca.dicts.activity.reversed[y],
+                    -1 * lca.technosphere_matrix[y, x],  # Flip x and y as y is input to activity x
+                )
+                for x, y in zip(path[:-1], path[1:])
+            ]
+        )
+
+    if not resolve_nodes:
+        return id_paths
+
+    nodes = get_nodes_by_id(node_id for path in id_paths for edge in path for node_id in edge[:2])
+    return [[(nodes[x], nodes[y], amount) for x, y, amount in path] for path in id_paths]
+
+
 def path_as_brightway_objects(
-    source_node: Node, target_node: Node, lca: Optional[LCA] = None
-) -> List[Edge]:
+    source_node: "bw2data.Node", target_node: "bw2data.Node", lca: Optional["bw2calc.LCA"] = None
+) -> List[Tuple]:
     if not brightway_available:
         raise ImportError("Brightway not available")
 
     if lca is None:
+        from bw2calc import LCA
+
         lca = LCA({source_node: 1, target_node: 1})
         lca.lci()
 
-    path = get_shortest_path(
-        adjacency=to_normalized_adjacency_matrix(matrix=lca.technosphere_mm.matrix),
-        sources=lca.activity_dict[source_node.id],
-        targets=lca.activity_dict[target_node.id],
-        method="BF",
-        unweighted=False,
-    )
-
-    return [
-        (
-            bd.get_node(id=lca.dicts.product.reversed[x]),
-            bd.get_node(id=lca.dicts.activity.reversed[y]),
-            -1 * lca.technosphere_matrix[y, x],  # Flip x and y because y is input to activity x
-        )
-        for x, y in zip(path[:-1], path[1:])
-    ]
+    return paths_as_brightway_objects([(source_node, target_node)], lca=lca)[0]
@@ -1,11 +1,14 @@
+import typing
 from typing import Tuple
 
-import matrix_utils as mu
 import numpy as np
 from scipy import sparse
 
 from bw_graph_tools.errors import UnclearProductionExchange
 
+if typing.TYPE_CHECKING:
+    import matrix_utils as mu
+
 
 def to_normalized_adjacency_matrix(
     matrix: sparse.spmatrix, log_transform: bool = True
@@ -47,7 +50,7 @@ def to_normalized_adjacency_matrix(
     return normalized
 
 
-def gpe_zeroth_heuristic(mm: mu.MappedMatrix) -> Tuple[np.ndarray, np.ndarray]:
+def gpe_zeroth_heuristic(mm: "mu.MappedMatrix") -> Tuple[np.ndarray, np.ndarray]:
     """Use explicit reference-exchange flags to find production exchange indices.
 
     If a resource group carries a ``reference`` boolean array (stored in the
@@ -78,7 +81,7 @@ def gpe_zeroth_heuristic(mm: mu.MappedMatrix) -> Tuple[np.ndarray, np.ndarray]:
     return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
 
 
-def gpe_first_heuristic(mm: mu.MappedMatrix) -> Tuple[np.ndarray, np.ndarray]:
+def gpe_first_heuristic(mm: "mu.MappedMatrix") -> Tuple[np.ndarray, np.ndarray]:
     """Use first heuristic (same input and output ids) to find production exchange indices.
 
     If we treat activities and products the same, then an exchange with the row and column id
@@ -91,7 +94,7 @@ def gpe_first_heuristic(mm: mu.MappedMatrix) -> Tuple[np.ndarray, np.ndarray]:
     """
 
     def get_used_mapped_indices_for_group(
-        group: mu.ResourceGroup,
+        group: "mu.ResourceGroup",
     ) -> Tuple[np.ndarray, np.ndarray]:
         indices = group.get_indices_data()
 
@@ -146,7 +149,7 @@ Please report this as an issue, something went very wrong!
 
 
 def gpe_second_heuristic(
-    mm: mu.MappedMatrix, row_existing: np.ndarray, col_existing: np.ndarray
+    mm: "mu.MappedMatrix", row_existing: np.ndarray, col_existing: np.ndarray
 ) -> Tuple[np.ndarray, np.ndarray]:
     """Use second heuristic (single non-flipped entry per column) to find production exchange indices.
 
@@ -203,7 +206,7 @@ def gpe_second_heuristic(
 
 
 def gpe_third_heuristic(
-    mm: mu.MappedMatrix, row_existing: np.ndarray, col_existing: np.ndarray
+    mm: "mu.MappedMatrix", row_existing: np.ndarray, col_existing: np.ndarray
 ) -> Tuple[np.ndarray, np.ndarray]:
     """Use third heuristic (single positive value per column) to find production exchange indices.
 
@@ -244,7 +247,7 @@ def gpe_third_heuristic(
 
 
 def gpe_fourth_heuristic(
-    mm: mu.MappedMatrix, row_existing: np.ndarray, col_existing: np.ndarray
+    mm: "mu.MappedMatrix", row_existing: np.ndarray, col_existing: np.ndarray
 ) -> Tuple[np.ndarray, np.ndarray]:
     """Use fourth heuristic (single negative value per column) to find waste-treatment production exchanges.
 
@@ -278,7 +281,7 @@ def gpe_fourth_heuristic(
 
 
 def gpe_fifth_heuristic(
-    mm: mu.MappedMatrix, row_existing: np.ndarray, col_existing: np.ndarray
+    mm: "mu.MappedMatrix", row_existing: np.ndarray, col_existing: np.ndarray
 ) -> Tuple[np.ndarray, np.ndarray]:
     """Use fifth heuristic (unique product across remaining columns) to find production exchange indices.
 
@@ -322,7 +325,7 @@ def gpe_fifth_heuristic(
         return row_existing, col_existing
 
 
-def guess_production_exchanges(mm: mu.MappedMatrix) -> Tuple[np.ndarray, np.ndarray]:
+def guess_production_exchanges(mm: "mu.MappedMatrix") -> Tuple[np.ndarray, np.ndarray]:
     """Try to guess productions exchanges in a mapped technosphere matrix using heuristics from the input data packages.
 
     Try the following in order per activity (column):
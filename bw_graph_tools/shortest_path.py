@@ -37,9 +37,11 @@ OF THE POSSIBILITY OF SUCH DAMAGE.
 
 """
 
+import warnings
 from functools import partial
-from multiprocessing import Pool
-from typing import Iterable, Optional, Union
+from heapq import heappop, heappush
+from multiprocessing import Pool, cpu_count, shared_memory, util
+from typing import Iterable, List, Optional, Tuple, Union
 
 import numpy as np
 from scipy import sparse
@@ -78,8 +80,10 @@ def get_distances(
     unweighted :
         If ``True``, the weights of the edges are ignored
     n_jobs :
-        If an integer value is given, denotes the number of workers to use (-1 means the maximum number will be used).
-        If ``None``, no parallel computations are made.
+        If an integer value is given, denotes the number of workers to use. Negative values count
+        back from the number of CPUs, as in joblib: -1 uses all CPUs, -2 all but one, etc.
+        If ``None``, no parallel computations are made. Sources are split into chunks which are
+        balanced over the workers; the adjacency matrix is shared with them through shared memory.
 
     Returns
     -------
@@ -94,25 +98,27 @@ def get_distances(
         the ``i``-th source to node ``j`` (-1 if no path exists from the ``i``-th source to node ``j``).
 
     """
-    n_jobs, directed = 1, True
+    directed = True
+    if n_jobs is None:
+        n_jobs = 1
+    elif n_jobs < 0:
+        if cpu_count() + 1 + n_jobs < 1:
+            raise ValueError(
+                f"`n_jobs` can't be below -{cpu_count()} with {cpu_count()} CPUs; got {n_jobs}"
+            )
+        n_jobs = cpu_count() + 1 + n_jobs
+    elif n_jobs == 0:
+        raise ValueError("`n_jobs` must be a positive or negative integer, or None; got 0")
     if method == "FW" and n_jobs != 1:
         raise ValueError("The Floyd-Warshall algorithm cannot be used with parallel computations.")
     if sources is None:
         sources = np.arange(adjacency.shape[0])
     elif np.issubdtype(type(sources), np.integer):
         sources = np.array([sources])
+    sources = np.asarray(sources)
     n = len(sources)
-    local_function = partial(
-        sparse.csgraph.shortest_path,
-        adjacency,
-        method,
-        directed,
-        return_predecessors,
-        unweighted,
-        False,
-    )
-    if n_jobs == 1 or n == 1:
-        try:
+    try:
+        if n_jobs == 1 or n == 1:
             res = sparse.csgraph.shortest_path(
                 adjacency,
                 method,
@@ -122,19 +128,19 @@ def get_distances(
                 False,
                 sources,
             )
-        except sparse.csgraph.NegativeCycleError:
-            raise ValueError(
-                "The shortest path computation could not be completed because a negative cycle is present."
-            )
-    else:
-        try:
-            with Pool(n_jobs) as pool:
-                res = np.array(pool.map(local_function, sources))
-        except sparse.csgraph.NegativeCycleError:
-            pool.terminate()
-            raise ValueError(
-                "The shortest path computation could not be completed because a negative cycle is present."
+        else:
+            res = _get_distances_parallel(
+                sparse.csr_matrix(adjacency),
+                sources,
+                method,
+                return_predecessors,
+                unweighted,
+                n_jobs,
             )
+    except sparse.csgraph.NegativeCycleError:
+        raise ValueError(
+            "The shortest path computation could not be completed because a negative cycle is present."
+        )
     if return_predecessors:
         res[1][res[1] < 0] = -1
         if n == 1:
@@ -148,6 +154,94 @@ def get_distances(
             return res
 
 
+# Adjacency matrix rebuilt in each worker process from shared memory
+_shared_adjacency = None
+_shared_blocks = []
+
+# Number of source chunks per worker; more chunks balance uneven search costs between sources
+CHUNKS_PER_JOB = 4
+
+
+def _attach_shared_adjacency(blocks: list, shape: tuple) -> None:
+    """Pool initializer: view the shared CSR arrays as a matrix, without copying them."""
+    global _shared_adjacency, _shared_blocks
+    _shared_blocks = [shared_memory.SharedMemory(name=name) for name, _, _ in blocks]
+    data, indices, indptr = (
+        np.ndarray(length, dtype=dtype, buffer=block.buf)
+        for block, (_, dtype, length) in zip(_shared_blocks, blocks)
+    )
+    _shared_adjacency = sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+    # Close the handles when the worker exits; pool workers run the `multiprocessing`
+    # finalizers on shutdown, but not `atexit` handlers
+    util.Finalize(None, _close_shared_adjacency, exitpriority=0)
+
+
+def _close_shared_adjacency() -> None:
+    """Drop the views on the shared memory blocks of this worker, and close them."""
+    global _shared_adjacency, _shared_blocks
+    _shared_adjacency = None
+    for block in _shared_blocks:
+        block.close()
+    _shared_blocks = []
+
+
+def _shortest_path_chunk(
+    sources: np.ndarray, method: str, return_predecessors: bool, unweighted: bool
+):
+    return sparse.csgraph.shortest_path(
+        _shared_adjacency, method, True, return_predecessors, unweighted, False, sources
+    )
+
+
+def _get_distances_parallel(
+    adjacency: sparse.csr_matrix,
+    sources: np.ndarray,
+    method: str,
+    return_predecessors: bool,
+    unweighted: bool,
+    n_jobs: int,
+):
+    """Compute distances from ``sources`` split into chunks over a pool of ``n_jobs`` workers.
+
+    The adjacency matrix arrays are copied once into shared memory, and each worker attaches to
+    them when it starts, so only the chunk of source indices is sent with each task."""
+    blocks, handles = [], []
+    try:
+        for array in (adjacency.data, adjacency.indices, adjacency.indptr):
+            handle = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            handles.append(handle)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=handle.buf)[:] = array
+            blocks.append((handle.name, array.dtype, array.shape[0]))
+
+        chunks = np.array_split(sources, min(len(sources), n_jobs * CHUNKS_PER_JOB))
+        with Pool(
+            n_jobs, initializer=_attach_shared_adjacency, initargs=(blocks, adjacency.shape)
+        ) as pool:
+            results = pool.map(
+                partial(
+                    _shortest_path_chunk,
+                    method=method,
+                    return_predecessors=return_predecessors,
+                    unweighted=unweighted,
+                ),
+                chunks,
+            )
+            # Let the workers exit normally, so that they close their shared memory handles;
+            # leaving the `with` block would terminate them
+            pool.close()
+            pool.join()
+    finally:
+        for handle in handles:
+            handle.close()
+            handle.unlink()
+
+    if return_predecessors:
+        return np.vstack([dists for dists, _ in results]), np.vstack(
+            [preds for _, preds in results]
+        )
+    return np.vstack(results)
+
+
 def get_shortest_path(
     adjacency: sparse.csr_matrix,
     sources: Union[int, Iterable],
@@ -175,7 +269,8 @@ def get_shortest_path(
     unweighted :
         If ``True``, the weights of the edges are ignored
     n_jobs :
-        If an integer value is given, denotes the number of workers to use (-1 means the maximum number will be used).
+        If an integer value is given, denotes the number of workers to use. Negative values count
+        back from the number of CPUs, as in joblib: -1 uses all CPUs, -2 all but one, etc.
         If ``None``, no parallel computations are made.
 
     Returns
@@ -220,6 +315,19 @@ def get_shortest_path(
     else:
         dists, preds = get_distances(adjacency.T, source, method, True, unweighted, n_jobs)
 
+    return _paths_from_predecessors(dists, preds, source, targets, source2target)
+
+
+def _paths_from_predecessors(
+    dists: np.ndarray,
+    preds: np.ndarray,
+    source: int,
+    targets: Iterable,
+    source2target: bool,
+):
+    """Walk the predecessor array back from each target to ``source``.
+
+    Shared by ``get_shortest_path`` and ``ReweightedAdjacency.get_shortest_path``."""
     paths = []
     for target in targets:
         if dists[target] == np.inf:
@@ -236,3 +344,315 @@ def get_shortest_path(
     if len(paths) == 1:
         paths = paths[0]
     return paths
+
+
+def get_johnson_potentials(adjacency: sparse.csr_matrix) -> np.ndarray:
+    """Compute the Johnson vertex potentials of a graph with (possibly) negative weights.
+
+    The potentials are the shortest distances from a virtual vertex linked to every node with a
+    zero weight edge. They are found with a vectorized Bellman-Ford which relaxes every edge at
+    once and stops as soon as a round brings no improvement. On supply chain graphs this needs
+    only about as many rounds as the deepest shortest path is long, instead of one per node.
+
+    Parameters
+    ----------
+    adjacency :
+        The adjacency matrix of the graph. Explicitly stored zeros are edges.
+
+    Returns
+    -------
+    potentials : np.ndarray
+        One potential per node. All potentials are less than or equal to zero.
+
+    Raises
+    ------
+    ValueError
+        If the graph has a negative cycle.
+    """
+    n = adjacency.shape[0]
+    # Group edges by head node so each round is a single `minimum.reduceat` per head
+    by_head = sparse.csc_matrix(adjacency)
+    by_head.sort_indices()
+    heads = np.flatnonzero(np.diff(by_head.indptr))
+    starts = by_head.indptr[heads]
+    tails, weights = by_head.indices, by_head.data
+
+    # The first relaxation, over the edges from the virtual vertex, gives zero everywhere
+    potentials = np.zeros(n)
+    active = np.ones(n, dtype=bool)
+    for _ in range(n):
+        if not heads.size:
+            return potentials
+        candidates = np.where(active[tails], potentials[tails] + weights, np.inf)
+        best = np.minimum.reduceat(candidates, starts)
+        improved = best < potentials[heads]
+        if not improved.any():
+            return potentials
+        potentials[heads[improved]] = best[improved]
+        active[:] = False
+        active[heads[improved]] = True
+    raise ValueError(
+        "The shortest path computation could not be completed because a negative cycle is present."
+    )
+
+
+def reweight_adjacency(adjacency: sparse.csr_matrix, potentials: np.ndarray) -> sparse.csr_matrix:
+    """Apply Johnson reweighting ``w'(u, v) = w(u, v) + h(u) - h(v)`` to an adjacency matrix.
+
+    The reweighted matrix has no negative weights, so Dijkstra can be used on it. Edges whose
+    reweighted value is zero are kept as explicit zeros, as ``scipy.sparse.csgraph`` treats them
+    as edges. Rounding errors which would give tiny negative weights are clipped to zero."""
+    adjacency = sparse.csr_matrix(adjacency)
+    adjacency.sort_indices()
+    rows = np.repeat(np.arange(adjacency.shape[0]), np.diff(adjacency.indptr))
+    data = adjacency.data + potentials[rows] - potentials[adjacency.indices]
+    return sparse.csr_matrix(
+        (np.maximum(data, 0), adjacency.indices.copy(), adjacency.indptr.copy()),
+        shape=adjacency.shape,
+    )
+
+
+class ReweightedAdjacency:
+    """Adjacency matrix reweighted once with Johnson potentials, for repeated Dijkstra queries.
+
+    ``method='J'`` in ``get_distances`` recomputes the potentials with Bellman-Ford on every call.
+    Building this object once per adjacency matrix pays that cost a single time, after which each
+    query is a Dijkstra search on the non-negative reweighted graph. Shortest paths are the same
+    in both graphs, and distances are converted back to the original weights.
+
+    Parameters
+    ----------
+    adjacency :
+        The adjacency matrix of the graph. Can have negative weights, but no negative cycles.
+    """
+
+    def __init__(self, adjacency: sparse.csr_matrix):
+        self.adjacency = sparse.csr_matrix(adjacency)
+        self.potentials = get_johnson_potentials(self.adjacency)
+        self.reweighted = reweight_adjacency(self.adjacency, self.potentials)
+        self._reweighted_transpose = None
+
+    @property
+    def reweighted_transpose(self) -> sparse.csr_matrix:
+        """Reweighted graph with edges reversed, used for queries from many sources to one
+        target. Reversing a Johnson reweighted graph keeps all weights non-negative."""
+        if self._reweighted_transpose is None:
+            self._reweighted_transpose = self.reweighted.T.tocsr()
+        return self._reweighted_transpose
+
+    def get_distances(
+        self,
+        sources: Optional[Union[int, Iterable]] = None,
+        return_predecessors: bool = False,
+    ):
+        """Compute distances between nodes with Dijkstra on the reweighted graph.
+
+        Same inputs and outputs as ``get_distances``; distances use the original weights.
+        """
+        if sources is None:
+            sources = np.arange(self.adjacency.shape[0])
+        elif np.issubdtype(type(sources), np.integer):
+            sources = np.array([sources])
+        sources = np.asarray(sources)
+
+        res = sparse.csgraph.dijkstra(
+            self.reweighted,
+            directed=True,
+            indices=sources,
+            return_predecessors=return_predecessors,
+        )
+        dists, preds = res if return_predecessors else (res, None)
+        dists = dists - self.potentials[sources].reshape(-1, 1) + self.potentials.reshape(1, -1)
+
+        if return_predecessors:
+            preds[preds < 0] = -1
+            if len(sources) == 1:
+                return dists.ravel(), preds.astype(int).ravel()
+            return dists, preds.astype(int)
+        if len(sources) == 1:
+            return dists.ravel()
+        return dists
+
+    def get_shortest_path(
+        self,
+        sources: Union[int, Iterable],
+        targets: Union[int, Iterable],
+    ):
+        """Compute the shortest paths in the graph with Dijkstra on the reweighted graph.
+
+        Same inputs and outputs as ``get_shortest_path``.
+        """
+        if np.issubdtype(type(sources), np.integer):
+            sources = [sources]
+        if np.issubdtype(type(targets), np.integer):
+            targets = [targets]
+
+        if len(sources) == 1:
+            source2target, graph = True, self.reweighted
+            source = sources[0]
+        elif len(targets) == 1:
+            source2target, graph = False, self.reweighted_transpose
+            source = targets[0]
+            targets = sources
+        else:
+            raise ValueError(
+                "This request is ambiguous. Either use one source and multiple targets or multiple sources and one target."
+            )
+
+        # Predecessors don't depend on the potentials, and unreachable nodes stay infinite.
+        dists, preds = sparse.csgraph.dijkstra(
+            graph, directed=True, indices=source, return_predecessors=True
+        )
+        return _paths_from_predecessors(dists, preds, source, targets, source2target)
+
+    def get_k_shortest_paths(
+        self,
+        source: int,
+        target: int,
+        k: int = 10,
+        max_expansions: Optional[int] = None,
+    ) -> List[Tuple[List[int], float]]:
+        """Compute the ``k`` shortest simple paths from ``source`` to ``target`` (Yen's algorithm).
+
+        Each spur search in Yen's algorithm runs on a subgraph with some nodes and edges removed.
+        Removing nodes and edges keeps the reweighted graph non-negative, and can only make
+        distances longer, so we compute the shortest path tree *to* ``target`` once and reuse it
+        for all spur searches:
+
+        * If the tree path from the spur node avoids the removed nodes and edges, it is the spur
+          path, and no search is needed.
+        * Otherwise, the tree distances are an exact lower bound for an A* search.
+
+        Parameters
+        ----------
+        source : int
+            Source node.
+        target : int
+            Target node.
+        k : int
+            Maximum number of paths to return.
+        max_expansions : int, optional
+            Maximum number of nodes expanded over all A* spur searches. If reached, a warning is
+            raised and only the paths already found are returned.
+
+        Returns
+        -------
+        paths : list
+            List of ``(path, length)`` tuples, sorted by increasing ``length`` in the original
+            weights. Each ``path`` is a list of nodes from ``source`` to ``target``. Empty if
+            there is no path.
+        """
+        to_target, successors = sparse.csgraph.dijkstra(
+            self.reweighted_transpose, directed=True, indices=target, return_predecessors=True
+        )
+        if not np.isfinite(to_target[source]):
+            return []
+
+        def tree_path(node: int) -> List[int]:
+            path = [node]
+            while node != target:
+                node = successors[node]
+                path.append(node)
+            return path
+
+        def original_length(cost: float) -> float:
+            return cost - self.potentials[source] + self.potentials[target]
+
+        # Each entry in `found` and `candidates` is (reweighted prefix costs, path)
+        first = tree_path(source)
+        found = [(self._prefix_costs(first), first)]
+        candidates, seen = [], {tuple(first)}
+        expansions = [0]
+
+        while len(found) < k:
+            _, previous = found[-1]
+            for i, spur in enumerate(previous[:-1]):
+                root = previous[: i + 1]
+                removed_nodes = set(root[:-1])
+                removed_edges = {
+                    path[i + 1] for _, path in found if len(path) > i + 1 and path[: i + 1] == root
+                }
+
+                tree = tree_path(spur)
+                if tree[1] not in removed_edges and removed_nodes.isdisjoint(tree):
+                    spur_path = tree
+                else:
+                    spur_path = self._a_star(
+                        spur, target, to_target, removed_nodes, removed_edges, expansions
+                    )
+                    if max_expansions is not None and expansions[0] > max_expansions:
+                        warnings.warn("Stopping k shortest paths search due to expansion count.")
+                        return [(path, original_length(costs[-1])) for costs, path in found]
+                if spur_path is None:
+                    continue
+
+                path = root + spur_path[1:]
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    costs = self._prefix_costs(path)
+                    heappush(candidates, (costs[-1], len(path), path, costs))
+            if not candidates:
+                break
+            _, _, path, costs = heappop(candidates)
+            found.append((costs, path))
+
+        return [(path, original_length(costs[-1])) for costs, path in found]
+
+    def _prefix_costs(self, path: List[int]) -> List[float]:
+        """Cumulative reweighted cost of ``path`` after each node"""
+        costs, total = [0.0], 0.0
+        for u, v in zip(path[:-1], path[1:]):
+            start, end = self.reweighted.indptr[u], self.reweighted.indptr[u + 1]
+            position = start + np.searchsorted(self.reweighted.indices[start:end], v)
+            total += self.reweighted.data[position]
+            costs.append(total)
+        return costs
+
+    def _a_star(
+        self,
+        source: int,
+        target: int,
+        lower_bounds: np.ndarray,
+        removed_nodes: set,
+        removed_edges: set,
+        expansions: list,
+    ) -> Optional[List[int]]:
+        """A* search from ``source`` to ``target`` which skips ``removed_nodes``, and edges from
+        ``source`` to the nodes in ``removed_edges``. Increments ``expansions[0]`` for each node
+        expanded."""
+        indptr, indices, data = (
+            self.reweighted.indptr,
+            self.reweighted.indices,
+            self.reweighted.data,
+        )
+        best = {source: 0.0}
+        parents = {source: None}
+        closed = set()
+        heap = [(lower_bounds[source], 0.0, source)]
+        while heap:
+            _, cost, node = heappop(heap)
+            if node in closed:
+                continue
+            if node == target:
+                path = [node]
+                while parents[node] is not None:
+                    node = parents[node]
+                    path.append(node)
+                return path[::-1]
+            closed.add(node)
+            expansions[0] += 1
+            for position in range(indptr[node], indptr[node + 1]):
+                child = indices[position]
+                if (
+                    child in closed
+                    or child in removed_nodes
+                    or not np.isfinite(lower_bounds[child])
+                    or (node == source and child in removed_edges)
+                ):
+                    continue
+                child_cost = cost + data[position]
+                if child_cost < best.get(child, np.inf):
+                    best[child] = child_cost
+                    parents[child] = node
+                    heappush(heap, (child_cost + lower_bounds[child], child_cost, child))
+        return None
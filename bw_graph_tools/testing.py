@@ -1,10 +1,18 @@
 from numbers import Number
-from typing import Union
+from typing import TYPE_CHECKING, Union
 
 import numpy as np
 
 from bw_graph_tools import Edge, Flow, Node
 
+if TYPE_CHECKING:
+    import bw2calc
+
+# Average distance in the supply chain order between consumers and suppliers
+SUPPLIER_DISTANCE = 200
+# Maximum distance in the supply chain order of inputs which create loops
+LOOP_DISTANCE = 50
+
 
 def equal_dict(a: Union[Node, Edge, Flow], b: dict, fields: list[str]):
     for field in fields:
@@ -53,3 +61,108 @@ def node_equal_dict(a: Node, b: dict):
         "direct_emissions_score",
     ]
     equal_dict(a, b, FIELDS)
+
+
+def synthetic_lca(
+    activities: int = 1000,
+    density: float = 5e-3,
+    cycle_fraction: float = 0.1,
+    biosphere: int = 100,
+    seed: int = 42,
+) -> "bw2calc.LCA":
+    """
+    Create an `LCA` for a random, but reproducible, technosphere with `activities` activities.
+
+    The system is built directly from `bw_processing` arrays, without a `bw2data` project, so
+    large systems can be created quickly; most of the time is spent in the LCI calculation,
+    which is already done, as is the LCIA.
+
+    Each activity produces one unit of its own product, and the sum of its technosphere inputs is
+    less than one unit, so the technosphere matrix is always invertible. Activities are in a
+    random supply chain order; inputs mostly come from activities somewhat later in that order,
+    except for a `cycle_fraction` of inputs which come from activities shortly before, and so
+    create loops.
+
+    Parameters
+    ----------
+    activities : int
+        Number of activities (and products)
+    density : float
+        Fraction of the other activities used as inputs by each activity, on average.
+    cycle_fraction : float
+        Fraction of inputs which may create loops in the supply chain graph. Use 0 for a
+        directed acyclic graph.
+    biosphere : int
+        Number of biosphere flows. Each activity emits one to five flows.
+    seed : int
+        Seed for the random number generator
+
+    Returns
+    -------
+    bw2calc.LCA
+        With `demand` of one unit of the first activity in the supply chain order
+
+    """
+    import bw_processing as bwp
+    from bw2calc import LCA
+
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, activities + 1)
+    biosphere_ids = np.arange(activities + 1, activities + biosphere + 1)
+    order = rng.permutation(activities)
+    position = np.empty(activities, dtype=int)
+    position[order] = np.arange(activities)
+
+    rows, cols, amounts = [], [], []
+    counts = np.maximum(rng.poisson(density * activities, size=activities), 1)
+    for consumer, count in zip(range(activities), counts):
+        # Suppliers are mostly close to the consumer in the supply chain order, like sectors in
+        # real databases; uniformly random suppliers make the matrix factorization very dense.
+        start = position[consumer]
+        offsets = rng.geometric(1 / SUPPLIER_DISTANCE, size=count)
+        looping = rng.random(count) < cycle_fraction
+        offsets[looping] = -rng.integers(1, LOOP_DISTANCE, size=looping.sum())
+        suppliers = order[np.clip(start + offsets, 0, activities - 1)]
+        suppliers = np.unique(suppliers[suppliers != consumer])
+        shares = rng.random(len(suppliers))
+        rows.append(ids[suppliers])
+        cols.append(np.full(len(suppliers), ids[consumer]))
+        amounts.append(shares / shares.sum() * rng.uniform(0.1, 0.9))
+    inputs = sum(len(x) for x in rows)
+
+    flows_per_activity = rng.integers(1, 6, size=activities)
+    biosphere_rows = rng.choice(biosphere_ids, size=flows_per_activity.sum())
+    biosphere_cols = np.repeat(ids, flows_per_activity)
+
+    dp = bwp.create_datapackage()
+    technosphere_indices = np.empty(activities + inputs, dtype=bwp.INDICES_DTYPE)
+    technosphere_indices["row"] = np.hstack([ids] + rows)
+    technosphere_indices["col"] = np.hstack([ids] + cols)
+    dp.add_persistent_vector(
+        matrix="technosphere_matrix",
+        indices_array=technosphere_indices,
+        data_array=np.hstack([np.ones(activities)] + amounts),
+        flip_array=np.arange(activities + inputs) >= activities,
+    )
+    biosphere_indices = np.empty(len(biosphere_rows), dtype=bwp.INDICES_DTYPE)
+    biosphere_indices["row"] = biosphere_rows
+    biosphere_indices["col"] = biosphere_cols
+    dp.add_persistent_vector(
+        matrix="biosphere_matrix",
+        indices_array=biosphere_indices,
+        data_array=rng.lognormal(size=len(biosphere_rows)),
+    )
+    characterization_indices = np.empty(biosphere, dtype=bwp.INDICES_DTYPE)
+    characterization_indices["row"] = biosphere_ids
+    characterization_indices["col"] = 0
+    dp.add_persistent_vector(
+        matrix="characterization_matrix",
+        indices_array=characterization_indices,
+        data_array=rng.uniform(0.1, 10, size=biosphere),
+        global_index=0,
+    )
+
+    lca = LCA({int(ids[order[0]]): 1}, data_objs=[dp])
+    lca.lci()
+    lca.lcia()
+    return lca
@@ -1,8 +1,13 @@
+from multiprocessing import shared_memory
+
 import bw_processing as bwp
 import matrix_utils as mu
 import numpy as np
+import pytest
+from scipy import sparse
 
-from bw_graph_tools import get_path_from_matrix
+from bw_graph_tools import PathFinder, get_path_from_matrix, shortest_path
+from bw_graph_tools.shortest_path import ReweightedAdjacency, get_distances
 
 
 def test_simple_graph():
@@ -105,3 +110,187 @@ def test_take_longer_path_no_direct_edge():
         mapper[C],
         mapper[D],
     ]
+
+
+def _random_negative_weight_adjacency(n=50, seed=42):
+    # Negative weights only point "forward", so there can be no negative cycles
+    rng = np.random.default_rng(seed)
+    rows, cols = rng.integers(0, n, 400), rng.integers(0, n, 400)
+    weights = np.where(rows < cols, rng.random(400) - 0.5, rng.random(400) + 50)
+    mask = rows != cols
+    return sparse.csr_matrix((weights[mask], (rows[mask], cols[mask])), shape=(n, n))
+
+
+def test_path_finder_matches_get_path_from_matrix():
+    A, B, C, D = 101, 102, 103, 104
+    edges = np.array(
+        [(A, A), (B, B), (C, C), (D, D), (B, A), (C, B), (C, A), (D, C)],
+        dtype=bwp.INDICES_DTYPE,
+    )
+    dp = bwp.create_datapackage()
+    dp.add_persistent_vector(
+        matrix="test",
+        data_array=np.array([1, 1, 1, 1, 1, 1, 0.1, 1]),
+        indices_array=edges,
+        flip_array=np.array([0, 0, 0, 0, 1, 1, 1, 1], dtype=bool),
+    )
+    mm = mu.MappedMatrix(packages=[dp], matrix="test")
+    mapper = mm.col_mapper.to_dict()
+    finder = PathFinder(mm.matrix)
+    for target in (B, C, D):
+        assert finder.get_path(mapper[A], mapper[target]) == get_path_from_matrix(
+            matrix=mm.matrix, source=mapper[A], target=mapper[target]
+        )
+    assert finder.get_path(mapper[D], mapper[A]) == []
+
+
+def test_reweighted_adjacency_distances_match_bellman_ford():
+    adjacency = _random_negative_weight_adjacency()
+    reweighted = ReweightedAdjacency(adjacency)
+    assert reweighted.reweighted.data.min() >= 0
+
+    expected, expected_preds = get_distances(adjacency, [0, 3, 7], "BF", True)
+    given, preds = reweighted.get_distances([0, 3, 7], return_predecessors=True)
+    finite = np.isfinite(expected)
+    assert np.array_equal(finite, np.isfinite(given))
+    assert np.allclose(given[finite], expected[finite])
+    assert preds.shape == expected_preds.shape
+
+
+def test_reweighted_adjacency_shortest_paths():
+    adjacency = _random_negative_weight_adjacency()
+    reweighted = ReweightedAdjacency(adjacency)
+    distances = get_distances(adjacency, 0, "BF")
+    for target in range(1, 50):
+        path = reweighted.get_shortest_path(0, target)
+        if not np.isfinite(distances[target]):
+            assert path == []
+            continue
+        length = sum(adjacency[x, y] for x, y in zip(path[:-1], path[1:]))
+        assert np.isclose(length, distances[target])
+
+    # Many sources and a single target uses the reversed reweighted graph
+    many = reweighted.get_shortest_path([0, 1, 2], 10)
+    assert many == [reweighted.get_shortest_path(source, 10) for source in [0, 1, 2]]
+
+
+def test_reweighted_adjacency_negative_cycle():
+    adjacency = sparse.csr_matrix(np.array([[0, -1.0], [0.5, 0]]))
+    with pytest.raises(ValueError):
+        ReweightedAdjacency(adjacency)
+
+
+def test_get_distances_parallel_matches_serial():
+    adjacency = _random_negative_weight_adjacency()
+    serial = get_distances(adjacency, np.arange(20), "BF", True)
+    parallel = get_distances(adjacency, np.arange(20), "BF", True, n_jobs=2)
+    assert np.allclose(serial[0], parallel[0])
+    assert np.array_equal(serial[1], parallel[1])
+
+    assert np.allclose(
+        get_distances(abs(adjacency), method="D"),
+        get_distances(abs(adjacency), method="D", n_jobs=3),
+    )
+
+
+def test_get_distances_parallel_negative_cycle():
+    adjacency = sparse.csr_matrix(np.array([[0, -1.0, 0], [0.5, 0, 0], [1, 0, 0]]))
+    with pytest.raises(ValueError):
+        get_distances(adjacency, [0, 1, 2], "BF", n_jobs=2)
+
+
+def test_get_distances_negative_n_jobs(monkeypatch):
+    monkeypatch.setattr("bw_graph_tools.shortest_path.cpu_count", lambda: 4)
+    adjacency = abs(_random_negative_weight_adjacency())
+    # -2 means all CPUs but one, i.e. 3 workers
+    assert np.allclose(get_distances(adjacency, method="D"), get_distances(adjacency, n_jobs=-2))
+    with pytest.raises(ValueError, match="n_jobs"):
+        get_distances(adjacency, n_jobs=-5)
+    with pytest.raises(ValueError, match="n_jobs"):
+        get_distances(adjacency, n_jobs=0)
+
+
+def test_shared_adjacency_closed_in_worker():
+    adjacency = sparse.csr_matrix(np.array([[0, 1.0], [2.0, 0]]))
+    handles, blocks = [], []
+    for array in (adjacency.data, adjacency.indices, adjacency.indptr):
+        handle = shared_memory.SharedMemory(create=True, size=array.nbytes)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=handle.buf)[:] = array
+        handles.append(handle)
+        blocks.append((handle.name, array.dtype, len(array)))
+    try:
+        shortest_path._attach_shared_adjacency(blocks, adjacency.shape)
+        worker_blocks = shortest_path._shared_blocks
+        assert np.array_equal(shortest_path._shared_adjacency.toarray(), adjacency.toarray())
+        shortest_path._close_shared_adjacency()
+        assert shortest_path._shared_adjacency is None
+        assert all(block.buf is None for block in worker_blocks)
+    finally:
+        for handle in handles:
+            handle.close()
+            handle.unlink()
+
+
+def _brute_force_simple_paths(adjacency, source, target):
+    paths = []
+
+    def walk(path):
+        if path[-1] == target:
+            paths.append(path)
+            return
+        for child in adjacency[path[-1]].indices:
+            if child not in path:
+                walk(path + [child])
+
+    walk([source])
+    return sorted((sum(adjacency[x, y] for x, y in zip(p[:-1], p[1:])), p) for p in paths)
+
+
+def test_k_shortest_paths_match_brute_force():
+    rng = np.random.default_rng(7)
+    n = 9
+    rows, cols = rng.integers(0, n, 60), rng.integers(0, n, 60)
+    mask = rows != cols
+    weights = np.where(rows < cols, rng.random(60) - 0.3, rng.random(60) + 5)
+    adjacency = sparse.csr_matrix((weights[mask], (rows[mask], cols[mask])), shape=(n, n))
+
+    expected = _brute_force_simple_paths(adjacency, 0, n - 1)
+    given = ReweightedAdjacency(adjacency).get_k_shortest_paths(0, n - 1, k=8)
+    assert len(given) == min(8, len(expected))
+    assert np.allclose([length for _, length in given], [length for length, _ in expected[:8]])
+    for path, length in given:
+        assert path[0] == 0 and path[-1] == n - 1
+        assert len(set(path)) == len(path)
+        assert np.isclose(sum(adjacency[x, y] for x, y in zip(path[:-1], path[1:])), length)
+
+
+def test_k_shortest_paths_no_path():
+    adjacency = sparse.csr_matrix(np.array([[0, 1.0], [0, 0]]))
+    assert ReweightedAdjacency(adjacency).get_k_shortest_paths(1, 0) == []
+
+
+def test_k_shortest_paths_max_expansions():
+    adjacency = _random_negative_weight_adjacency()
+    with pytest.warns(UserWarning):
+        paths = ReweightedAdjacency(adjacency).get_k_shortest_paths(0, 49, k=50, max_expansions=5)
+    assert 1 <= len(paths) < 50
+
+
+def test_path_finder_get_paths_amounts():
+    A, B, C = 101, 102, 103
+    edges = np.array([(A, A), (B, B), (C, C), (B, A), (C, B), (C, A)], dtype=bwp.INDICES_DTYPE)
+    dp = bwp.create_datapackage()
+    dp.add_persistent_vector(
+        matrix="test",
+        data_array=np.array([1, 1, 1, 2, 3, 0.5]),
+        indices_array=edges,
+        flip_array=np.array([0, 0, 0, 1, 1, 1], dtype=bool),
+    )
+    mm = mu.MappedMatrix(packages=[dp], matrix="test")
+    mapper = mm.col_mapper.to_dict()
+    paths = PathFinder(mm.matrix).get_paths(mapper[A], mapper[C], k=5)
+    assert [path for path, _ in paths] == [
+        [mapper[A], mapper[B], mapper[C]],
+        [mapper[A], mapper[C]],
+    ]
+    assert np.allclose([amount for _, amount in paths], [6, 0.5])
@@ -0,0 +1,58 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["bw2calc", "bw2data", "bw_processing", "matrix_utils"]
+
+
+def imported_modules(statement: str) -> set:
+    """Run `statement` in a fresh interpreter, and return the heavy modules it imported"""
+    code = (
+        f"import sys; {statement}; print(' '.join(m for m in {HEAVY_MODULES} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code], capture_output=True, text=True, check=True
+    )
+    return set(result.stdout.split())
+
+
+def import_time(statement: str) -> float:
+    """Cumulative import time in seconds of `statement` in a fresh interpreter"""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"{statement}; print(time.perf_counter() - start)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code], capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.split()[-1])
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import bw_graph_tools",
+        "from bw_graph_tools import guess_production_exchanges, to_normalized_adjacency_matrix",
+        "from bw_graph_tools import get_path_from_matrix, PathFinder",
+        "from bw_graph_tools.shortest_path import get_distances",
+        "from bw_graph_tools import Edge, Flow, Node",
+    ],
+)
+def test_light_imports(statement):
+    assert imported_modules(statement) == set()
+
+
+def test_traversal_classes_imported_on_demand():
+    assert "bw2calc" in imported_modules(
+        "from bw_graph_tools import NewNodeEachVisitGraphTraversal"
+    )
+    assert "bw2calc" in imported_modules(
+        "from bw_graph_tools.graph_traversal import NewNodeEachVisitTaggedGraphTraversal"
+    )
+
+
+def test_import_time_below_traversal_import_time():
+    light = import_time("import bw_graph_tools")
+    heavy = import_time("from bw_graph_tools import NewNodeEachVisitGraphTraversal")
+    assert light < heavy
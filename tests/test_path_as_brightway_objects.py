@@ -0,0 +1,46 @@
+import bw2data as bd
+import numpy as np
+import pytest
+
+from bw_graph_tools import PathFinder, path_as_brightway_objects, paths_as_brightway_objects
+from bw_graph_tools.graph_traversal_utils import get_nodes_by_id
+
+
+def test_get_nodes_by_id(sample_database_with_products):
+    nodes = [bd.get_node(name=name) for name in "123"]
+    result = get_nodes_by_id([node.id for node in nodes] + [nodes[0].id])
+    assert result == {node.id: node for node in nodes}
+    assert get_nodes_by_id([]) == {}
+
+
+def test_paths_as_brightway_objects(sample_database_with_products, monkeypatch):
+    lca = sample_database_with_products
+    one, two, three = (bd.get_node(name=name) for name in "123")
+
+    monkeypatch.setattr(bd, "get_node", lambda **kwargs: pytest.fail("Should query in bulk"))
+    paths = paths_as_brightway_objects([(two, three), (one, three), (three, one)], lca=lca)
+
+    assert [(x, y) for x, y, _ in paths[0]] == [(two, three)]
+    assert np.allclose([amount for _, _, amount in paths[0]], [4])
+    assert [(x, y) for x, y, _ in paths[1]] == [(one, two), (two, three)]
+    assert paths[2] == []
+
+
+def test_paths_as_brightway_objects_ids(sample_database_with_products):
+    lca = sample_database_with_products
+    one, two, three = (bd.get_node(name=name) for name in "123")
+    finder = PathFinder(lca.technosphere_mm.matrix)
+
+    paths = paths_as_brightway_objects(
+        [(one, three)], lca=lca, path_finder=finder, resolve_nodes=False
+    )
+    assert [(x, y) for x, y, _ in paths[0]] == [(one.id, two.id), (two.id, three.id)]
+
+
+def test_path_as_brightway_objects_matches_batched(sample_database_with_products):
+    lca = sample_database_with_products
+    one, three = bd.get_node(name="1"), bd.get_node(name="3")
+    assert (
+        path_as_brightway_objects(one, three, lca)
+        == paths_as_brightway_objects([(one, three)], lca=lca)[0]
+    )
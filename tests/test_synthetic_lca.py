@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from scipy.sparse.csgraph import connected_components
+
+from bw_graph_tools import NewNodeEachVisitGraphTraversal
+from bw_graph_tools.graph_traversal import GraphTraversalSettings
+from bw_graph_tools.testing import synthetic_lca
+
+
+def test_synthetic_lca_reproducible():
+    first = synthetic_lca(activities=200, seed=3)
+    second = synthetic_lca(activities=200, seed=3)
+    assert first.score == second.score
+    assert (first.technosphere_matrix != second.technosphere_matrix).nnz == 0
+    assert synthetic_lca(activities=200, seed=4).score != first.score
+
+
+def test_synthetic_lca_shape():
+    lca = synthetic_lca(activities=300, density=0.02, biosphere=20)
+    assert lca.technosphere_matrix.shape == (300, 300)
+    assert lca.biosphere_matrix.shape == (20, 300)
+    assert np.allclose(lca.technosphere_matrix.diagonal(), 1)
+    # Inputs are less than one unit of output, so the supply is positive
+    assert (lca.supply_array > 0).any()
+    assert (lca.supply_array >= 0).all()
+    assert lca.score > 0
+
+
+@pytest.mark.parametrize("cycle_fraction", [0, 0.5])
+def test_synthetic_lca_cycles(cycle_fraction):
+    lca = synthetic_lca(activities=300, cycle_fraction=cycle_fraction)
+    _, labels = connected_components(lca.technosphere_matrix, directed=True, connection="strong")
+    has_loops = len(np.unique(labels)) < 300
+    assert has_loops == bool(cycle_fraction)
+
+
+def test_synthetic_lca_traversal():
+    lca = synthetic_lca(activities=500)
+    graph = NewNodeEachVisitGraphTraversal(
+        lca=lca, settings=GraphTraversalSettings(cutoff=1e-3, min_coverage_fraction=0.01)
+    )
+    graph.traverse()
+    assert len(graph.nodes) > 10
@@ -0,0 +1,81 @@
+import pytest
+
+from bw_graph_tools.graph_traversal import (
+    GraphTraversalSettings,
+    NewNodeEachVisitGraphTraversal,
+    SameNodeEachVisitGraphTraversal,
+)
+from bw_graph_tools.testing import synthetic_lca
+
+
+@pytest.fixture(scope="module")
+def lca():
+    return synthetic_lca(activities=1000, seed=3)
+
+
+def check_index(graph):
+    """Compare all index queries to scans over all edges."""
+    index = graph.adjacency
+    for unique_id, node in graph.nodes.items():
+        children = [edge for edge in graph.edges if edge.consumer_unique_id == unique_id]
+        found = index.children(unique_id)
+        assert index.child_count(unique_id) == len(children)
+        assert sorted(map(id, children)) == sorted(id(edge) for edge, _ in found)
+        scores = [abs(child.cumulative_score) for _, child in found]
+        assert scores == sorted(scores, reverse=True)
+
+        parents = [edge for edge in graph.edges if edge.producer_unique_id == unique_id]
+        assert [edge for edge, _ in index.parents(unique_id)] == parents
+
+    connected = {edge.consumer_unique_id for edge in graph.edges} | {
+        edge.producer_unique_id for edge in graph.edges
+    }
+    for activity in {node.activity_index for node in graph.nodes.values()}:
+        expected = {key for key in connected if graph.nodes[key].activity_index == activity}
+        assert {node.unique_id for node in index.nodes_for_activity(activity)} == expected
+
+
+def test_adjacency_index(lca):
+    graph = NewNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(cutoff=1e-3))
+    graph.traverse()
+    check_index(graph)
+
+    root = graph._functional_unit_unique_id
+    deepest = max(graph.nodes.values(), key=lambda node: node.depth)
+    path = graph.adjacency.path_to_root(deepest.unique_id)
+    assert path[0].unique_id == root
+    assert path[-1] is deepest
+    assert [node.depth for node in path] == list(range(deepest.depth + 1))
+
+
+def test_children_pagination(lca):
+    graph = NewNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(cutoff=1e-4))
+    graph.traverse()
+    root = graph._functional_unit_unique_id
+    consumer = max(graph.nodes, key=graph.adjacency.child_count)
+    children = graph.adjacency.children(consumer)
+    assert len(children) > 5
+
+    pages = [graph.adjacency.children(consumer, offset=i, limit=2) for i in range(0, 6, 2)]
+    assert [pair for page in pages for pair in page] == children[:6]
+    assert graph.adjacency.children(consumer, offset=len(children)) == []
+    assert graph.adjacency.children(-100) == []
+    assert graph.adjacency.parents(root) == []
+
+
+@pytest.mark.parametrize("settings", [{}, {"aggregate_by_activity": True}])
+def test_index_follows_traverse_from_node(lca, settings):
+    graph = SameNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(cutoff=1e-3, **settings))
+    graph.traverse(depth=2)
+    check_index(graph)
+    leaves = [node for node in graph.nodes.values() if node.terminal]
+    for node in sorted(leaves, key=lambda obj: obj.cumulative_score)[-3:]:
+        graph.traverse_from_node(node, depth=1)
+        check_index(graph)
+
+
+def test_index_reset_after_eviction(lca):
+    graph = NewNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(cutoff=1e-5, max_nodes=300))
+    graph.adjacency.children(graph._functional_unit_unique_id)
+    graph.traverse()
+    check_index(graph)
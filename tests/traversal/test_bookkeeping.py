@@ -0,0 +1,64 @@
+import pytest
+
+from bw_graph_tools.graph_traversal import (
+    GraphTraversalSettings,
+    LayerwiseGraphTraversal,
+    LayerwiseGraphTraversalSettings,
+    NewNodeEachVisitGraphTraversal,
+    SameNodeEachVisitGraphTraversal,
+)
+from bw_graph_tools.testing import synthetic_lca
+
+
+@pytest.fixture(scope="module")
+def lca():
+    return synthetic_lca(activities=1000, seed=3)
+
+
+def check_bookkeeping(graph):
+    """Compare the incremental bookkeeping to a recalculation from scratch."""
+    terminal = {key: node.terminal for key, node in graph.nodes.items()}
+    flows = list(graph._flows)
+    covered = graph._covered_score
+    graph._rebuild_bookkeeping()
+    assert terminal == {key: node.terminal for key, node in graph.nodes.items()}
+    assert [id(flow) for flow in flows] == [id(flow) for flow in graph._flows]
+    assert covered == pytest.approx(graph._covered_score)
+
+
+@pytest.mark.parametrize("settings", [{}, {"aggregate_by_activity": True}])
+def test_traverse_from_node(lca, settings):
+    graph = SameNodeEachVisitGraphTraversal(
+        lca, GraphTraversalSettings(cutoff=1e-4, biosphere_cutoff=1e-6, **settings)
+    )
+    graph.traverse(depth=3)
+    check_bookkeeping(graph)
+    leaves = [node for node in graph.nodes.values() if node.terminal]
+    for node in sorted(leaves, key=lambda obj: obj.cumulative_score)[-10:]:
+        graph.traverse_from_node(node, depth=1)
+        check_bookkeeping(graph)
+
+
+@pytest.mark.parametrize(
+    "cls,settings_class",
+    [
+        (NewNodeEachVisitGraphTraversal, GraphTraversalSettings),
+        (LayerwiseGraphTraversal, LayerwiseGraphTraversalSettings),
+    ],
+)
+def test_traverse_and_resume(lca, cls, settings_class):
+    graph = cls(lca, settings_class(cutoff=1e-5, biosphere_cutoff=1e-6, max_calc=200))
+    with pytest.warns(UserWarning):
+        graph.traverse()
+    check_bookkeeping(graph)
+    graph.resume()
+    check_bookkeeping(graph)
+
+
+def test_rebuild_after_eviction(lca):
+    graph = NewNodeEachVisitGraphTraversal(
+        lca, GraphTraversalSettings(cutoff=1e-5, biosphere_cutoff=1e-6, max_nodes=300)
+    )
+    graph.traverse()
+    assert graph._covered_score is not None
+    check_bookkeeping(graph)
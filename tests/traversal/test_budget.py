@@ -0,0 +1,103 @@
+from collections import defaultdict
+
+import pytest
+
+from bw_graph_tools.graph_traversal import (
+    GraphTraversalSettings,
+    NewNodeEachVisitGraphTraversal,
+    SameNodeEachVisitGraphTraversal,
+    TraversalRescorer,
+)
+from bw_graph_tools.graph_traversal.base import GraphTraversalException
+from bw_graph_tools.graph_traversal.graph_objects import REMAINDER_INDEX
+from bw_graph_tools.testing import synthetic_lca
+
+
+@pytest.fixture(scope="module")
+def lca():
+    return synthetic_lca(activities=1000, seed=3)
+
+
+def children_scores(graph):
+    """Sum the cumulative scores of the children of each consumer."""
+    scores = defaultdict(float)
+    for edge in graph.edges:
+        scores[edge.consumer_unique_id] += graph.nodes[edge.producer_unique_id].cumulative_score
+    return scores
+
+
+def remainders(graph):
+    return [node for node in graph.nodes.values() if node.activity_index == REMAINDER_INDEX]
+
+
+def test_max_nodes_evicts_into_remainders(lca):
+    reference = NewNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(cutoff=1e-5))
+    reference.traverse()
+    graph = NewNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(cutoff=1e-5, max_nodes=300))
+    graph.traverse()
+
+    assert len(reference.nodes) > 300
+    assert len(graph.nodes) <= 300
+    assert remainders(graph)
+    for node in remainders(graph):
+        assert node.unique_id < 0
+        assert node.terminal
+    root = graph._functional_unit_unique_id
+    assert children_scores(graph)[root] == pytest.approx(children_scores(reference)[root])
+    assert {flow.activity_unique_id for flow in graph.flows} <= set(graph.nodes)
+    assert {edge.producer_unique_id for edge in graph.edges} <= set(graph.nodes)
+
+
+def test_evict_nodes_preserves_scores(lca):
+    graph = NewNodeEachVisitGraphTraversal(
+        lca, GraphTraversalSettings(cutoff=1e-5, max_nodes=10_000)
+    )
+    graph.traverse()
+    before = children_scores(graph)
+    total_direct = sum(node.direct_emissions_score for node in graph.nodes.values())
+    count = len(graph.nodes)
+
+    graph.settings.max_nodes = 200
+    evicted = graph.evict_nodes()
+
+    assert evicted > 0
+    assert len(graph.nodes) <= 160
+    assert len(graph.nodes) == count - evicted + len(remainders(graph))
+    after = children_scores(graph)
+    for consumer in after:
+        assert after[consumer] == pytest.approx(before[consumer])
+    assert sum(node.direct_emissions_score for node in graph.nodes.values()) == pytest.approx(
+        total_direct
+    )
+
+
+def test_max_memory(lca):
+    reference = NewNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(cutoff=1e-5))
+    reference.traverse()
+    graph = NewNodeEachVisitGraphTraversal(
+        lca, GraphTraversalSettings(cutoff=1e-5, max_memory=reference.memory_usage() // 4)
+    )
+    graph.traverse()
+
+    assert graph.memory_usage() < reference.memory_usage() // 4
+    assert remainders(graph)
+
+
+def test_budget_not_supported(lca):
+    with pytest.raises(GraphTraversalException):
+        SameNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(max_nodes=100))
+
+
+def test_rescore_with_remainders(lca):
+    graph = NewNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(cutoff=1e-5, max_nodes=300))
+    graph.traverse()
+    with pytest.raises(ValueError):
+        TraversalRescorer(graph)
+
+
+def test_budget_too_small(lca):
+    graph = NewNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(cutoff=1e-5, max_nodes=1))
+    with pytest.warns(UserWarning, match="traversal budget"):
+        graph.traverse()
+    assert len(graph.nodes) == 2
+    assert len(remainders(graph)) == 1
@@ -6,7 +6,9 @@ from bw2data import Database, Method
 from bw2data.tests import bw2test
 
 from bw_graph_tools import GraphTraversalSettings, NewNodeEachVisitGraphTraversal
-from bw_graph_tools.graph_traversal.utils import CachingSolver
+from bw_graph_tools.errors import SolverConvergenceError
+from bw_graph_tools.graph_traversal.utils import CachingSolver, KrylovSolver, LowRankUpdateSolver
+from bw_graph_tools.testing import synthetic_lca
 
 
 class MatrixMockLCA:
@@ -61,9 +63,7 @@ def test_add_to_cache_prevents_recalculation():
     solver = _score_solver()
     solver.add_to_cache(0, 42.0)
 
-    solver._unit_scores_iterative = lambda indices: pytest.fail(
-        "should not solve a cached index"
-    )
+    solver._unit_scores_iterative = lambda indices: pytest.fail("should not solve a cached index")
     solver._unit_scores_pardiso = solver._unit_scores_iterative
 
     assert solver.scores([0], [2.0]) == [84.0]
@@ -137,9 +137,7 @@ def test_scores_empty():
 @bw2test
 def test_batched_scores_match_supply_vector_path():
     """The batched `scores` path agrees with reducing full supply vectors (legacy path)."""
-    Database("bio").write(
-        {("bio", "a"): {"type": "emission", "name": "a", "exchanges": []}}
-    )
+    Database("bio").write({("bio", "a"): {"type": "emission", "name": "a", "exchanges": []}})
     Database("t").write(
         {
             ("t", "1"): {
@@ -227,9 +225,200 @@ def test_injected_caching_solver_is_used():
     assert len(cached_after_first) > 0, "First traversal should populate the score cache"
 
     # Second traversal — inject the same solver
-    gt2 = NewNodeEachVisitGraphTraversal(
-        lca, GraphTraversalSettings(caching_solver=solver)
-    )
+    gt2 = NewNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(caching_solver=solver))
     assert gt2._caching_solver is solver, "Injected solver should be used directly"
     # Score cache should already contain the indices from the first traversal
     assert set(solver._score_cache.keys()) >= cached_after_first
+
+
+def test_all_unit_scores_match_per_product_solves():
+    solver = _score_solver()
+    expected = solver._unit_scores_iterative([0, 1, 2])
+    assert np.allclose(solver.all_unit_scores(), expected)
+    # Cached, and shared with `scores`
+    assert solver.all_unit_scores() is solver.all_unit_scores()
+    assert solver.in_cache({0, 1, 2}) == {0, 1, 2}
+    assert np.allclose(solver.scores([2, 0], [2.0, 1.0]), [2 * expected[2], expected[0]])
+
+
+def test_stats_counts_hits_misses_and_batches():
+    solver = _score_solver()
+    stats = solver.stats()
+    assert stats["hits"] == stats["misses"] == stats["batches"] == 0
+    assert stats["hit_rate"] == 0
+
+    solver.scores([0, 1], [1.0, 1.0])
+    solver.scores([0, 1, 2], [1.0, 1.0, 1.0])
+    stats = solver.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 3
+    assert stats["hit_rate"] == pytest.approx(0.4)
+    assert stats["batch_sizes"] == [2, 1]
+    assert stats["batches"] == 2
+    assert stats["cache_size"] == 3
+    assert stats["cache_bytes"] > 0
+
+
+def test_stats_solve_accounting(monkeypatch):
+    monkeypatch.setattr("bw_graph_tools.graph_traversal.utils.PYPARDISO", False)
+    solver = _score_solver()
+    solver.scores([0, 1], [1.0, 1.0])
+    assert solver.stats()["solves"]["iterative"] == 2
+    assert solver.stats()["solve_seconds"]["iterative"] > 0
+
+    monkeypatch.setattr("bw_graph_tools.graph_traversal.utils.PYPARDISO", True)
+    solver.scores([2], [1.0])
+    assert solver.stats()["solves"]["pardiso"] == 1
+
+    solver.all_unit_scores()
+    assert solver.stats()["solves"]["transposed"] == 1
+
+    solver.reset_stats()
+    assert solver.stats()["solves"] == {"pardiso": 0, "iterative": 0, "transposed": 0}
+    assert solver.stats()["cache_size"] == 3
+
+
+@pytest.mark.parametrize("method", ["gmres", "bicgstab"])
+@pytest.mark.parametrize("preconditioner", ["ilu", "jacobi", None])
+def test_krylov_scores_match_direct_solves(method, preconditioner):
+    lca = synthetic_lca(activities=300, seed=3)
+    direct = CachingSolver(lca)
+    direct.set_score_row(lca.characterization_matrix @ lca.biosphere_matrix)
+    krylov = CachingSolver(
+        lca, linear_solver=KrylovSolver(method=method, preconditioner=preconditioner)
+    )
+    krylov.score_row = direct.score_row
+
+    indices = [0, 17, 150, 299]
+    assert np.allclose(
+        krylov.scores(indices, [1.0, 2.0, 0.5, 1.0]), direct.scores(indices, [1.0, 2.0, 0.5, 1.0])
+    )
+    assert np.allclose(krylov.all_unit_scores(), direct.all_unit_scores())
+    assert krylov.stats()["solves"]["krylov"] == 4
+
+
+def test_krylov_warm_start_after_matrix_change():
+    lca = synthetic_lca(activities=300, seed=3)
+    krylov = KrylovSolver(preconditioner="jacobi")
+    solver = CachingSolver(lca, linear_solver=krylov)
+    solver.set_score_row(lca.characterization_matrix @ lca.biosphere_matrix)
+    solver.scores([124], [1.0])
+
+    matrix = lca.technosphere_matrix.copy()
+    matrix.data *= np.random.default_rng(1).uniform(0.99, 1.01, matrix.data.size)
+    lca.technosphere_matrix = matrix
+    solver.clear()
+    krylov.iterations = 0
+    warm = solver.scores([124], [1.0])
+    assert krylov.source is matrix
+
+    krylov._solutions.clear()
+    solver.clear()
+    iterations, krylov.iterations = krylov.iterations, 0
+    assert solver.scores([124], [1.0]) == pytest.approx(warm)
+    assert iterations < krylov.iterations
+
+
+def test_krylov_not_converged():
+    lca = synthetic_lca(activities=300, seed=3)
+    krylov = KrylovSolver(method="bicgstab", preconditioner=None, maxiter=1)
+    solver = CachingSolver(lca, linear_solver=krylov)
+    solver.set_score_row(lca.characterization_matrix @ lca.biosphere_matrix)
+    with pytest.raises(SolverConvergenceError):
+        solver.scores([124], [1.0])
+
+
+def test_krylov_invalid_options():
+    with pytest.raises(ValueError):
+        KrylovSolver(method="cg")
+    with pytest.raises(ValueError):
+        KrylovSolver(preconditioner="amg")
+    with pytest.raises(ValueError):
+        KrylovSolver().solve(np.ones(3))
+
+
+def test_traversal_with_krylov_solver(sample_database_with_products):
+    lca = sample_database_with_products
+    expected = NewNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(cutoff=1e-4))
+    expected.traverse()
+    solver = CachingSolver(lca, linear_solver=KrylovSolver())
+    graph = NewNodeEachVisitGraphTraversal(
+        lca, GraphTraversalSettings(cutoff=1e-4, caching_solver=solver)
+    )
+    graph.traverse()
+    assert graph.nodes.keys() == expected.nodes.keys()
+    for key, node in graph.nodes.items():
+        assert node.cumulative_score == pytest.approx(expected.nodes[key].cumulative_score)
+    assert solver.stats()["solves"]["krylov"] > 0
+
+
+def _scenario_matrix(matrix, columns, seed=5):
+    scenario = matrix.tocsc(copy=True)
+    rng = np.random.default_rng(seed)
+    for column in columns:
+        start, end = scenario.indptr[column], scenario.indptr[column + 1]
+        scenario.data[start:end] *= rng.uniform(0.5, 1.5, end - start)
+    return scenario
+
+
+@pytest.mark.parametrize("transpose", [False, True])
+def test_low_rank_update_matches_direct_solve(transpose):
+    lca = synthetic_lca(activities=300, seed=3)
+    low_rank = LowRankUpdateSolver(lca.technosphere_matrix)
+    scenario = _scenario_matrix(lca.technosphere_matrix, [3, 40, 41, 200])
+    low_rank.set_matrix(scenario)
+    assert low_rank.rank == 4
+
+    rhs = np.random.default_rng(0).random(300)
+    expected = spsolve((scenario.T if transpose else scenario).tocsr(), rhs)
+    assert np.allclose(low_rank.solve(rhs, transpose=transpose), expected)
+
+
+def test_low_rank_update_without_changes():
+    lca = synthetic_lca(activities=300, seed=3)
+    low_rank = LowRankUpdateSolver(lca.technosphere_matrix)
+    assert low_rank.rank == 0
+    rhs = np.ones(300)
+    assert np.allclose(low_rank.solve(rhs), spsolve(lca.technosphere_matrix, rhs))
+    assert np.allclose(low_rank.solve(rhs, transpose=True), spsolve(lca.technosphere_matrix.T, rhs))
+
+
+def test_low_rank_update_max_rank_and_shape():
+    lca = synthetic_lca(activities=300, seed=3)
+    low_rank = LowRankUpdateSolver(lca.technosphere_matrix, max_rank=2)
+    with pytest.raises(ValueError):
+        low_rank.set_matrix(_scenario_matrix(lca.technosphere_matrix, [1, 2, 3]))
+    with pytest.raises(ValueError):
+        low_rank.set_matrix(sp.eye(10))
+
+
+def test_low_rank_update_scenario_scores():
+    lca = synthetic_lca(activities=300, seed=3)
+    low_rank = LowRankUpdateSolver(lca.technosphere_matrix)
+    score_row = np.asarray((lca.characterization_matrix @ lca.biosphere_matrix).sum(axis=0)).ravel()
+    for seed in range(3):
+        lca.technosphere_matrix = _scenario_matrix(low_rank.baseline, [7, 8, 150], seed=seed)
+        solver = CachingSolver(lca, linear_solver=low_rank)
+        solver.score_row = score_row
+        reference = CachingSolver(MatrixMockLCA(lca.technosphere_matrix))
+        reference.score_row = score_row
+
+        assert np.allclose(
+            solver.scores([0, 8, 299], [1, 2, 3]), reference.scores([0, 8, 299], [1, 2, 3])
+        )
+        assert np.allclose(solver.all_unit_scores(), reference.all_unit_scores())
+        assert low_rank.source is lca.technosphere_matrix
+        assert solver.stats()["solves"]["low_rank"] == 3
+
+
+def test_low_rank_update_attach_lci():
+    lca = synthetic_lca(activities=300, seed=3)
+    supply = lca.supply_array.copy()
+    low_rank = LowRankUpdateSolver(lca.technosphere_matrix)
+    used = np.flatnonzero(supply)[:2]
+    lca.technosphere_matrix = _scenario_matrix(lca.technosphere_matrix, used)
+    low_rank.attach(lca)
+    assert lca.solver is low_rank
+    lca.lci_calculation()
+    assert np.allclose(lca.supply_array, spsolve(lca.technosphere_matrix, lca.demand_array))
+    assert not np.allclose(lca.supply_array, supply)
@@ -0,0 +1,113 @@
+import warnings
+
+import pytest
+
+from bw_graph_tools.graph_traversal import (
+    GraphTraversalSettings,
+    NewNodeEachVisitGraphTraversal,
+    SharedEdge,
+    SharedSubtreeGraphTraversal,
+    SharedSubtreeGraphTraversalSettings,
+)
+
+
+def get_graph(lca, max_calc):
+    return NewNodeEachVisitGraphTraversal(
+        lca=lca, settings=GraphTraversalSettings(cutoff=1e-4, max_calc=max_calc)
+    )
+
+
+def test_resume_matches_uninterrupted_traversal(sample_database_with_products, tmp_path):
+    lca = sample_database_with_products
+    expected = get_graph(lca, max_calc=10)
+    expected.traverse()
+
+    graph = get_graph(lca, max_calc=5)
+    with pytest.warns(UserWarning, match="calculation count"):
+        graph.traverse()
+    assert graph._heap
+    graph.save_state(tmp_path / "state.npz")
+
+    restored = NewNodeEachVisitGraphTraversal.load_state(tmp_path / "state.npz", lca)
+    assert restored.settings == graph.settings
+    assert restored.nodes == graph.nodes
+    assert restored.edges == graph.edges
+    assert restored.flows == graph.flows
+    assert restored.calculation_count == graph.calculation_count
+    assert restored.production_exchange_mapping == graph.production_exchange_mapping
+    assert restored._caching_solver._score_cache == graph._caching_solver._score_cache
+    assert [(p, n.unique_id) for p, n in restored._heap] == [
+        (p, n.unique_id) for p, n in graph._heap
+    ]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        restored.resume()
+    assert restored.nodes == expected.nodes
+    assert restored.edges == expected.edges
+    assert sorted(restored.flows) == sorted(expected.flows)
+
+
+def test_restore_skips_production_exchanges_and_solves(
+    sample_database_with_products, tmp_path, monkeypatch
+):
+    lca = sample_database_with_products
+    graph = get_graph(lca, max_calc=5)
+    graph.traverse()
+    graph.save_state(tmp_path / "state.npz")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Shouldn't be called")
+
+    monkeypatch.setattr(NewNodeEachVisitGraphTraversal, "get_production_exchanges", fail)
+    restored = NewNodeEachVisitGraphTraversal.load_state(tmp_path / "state.npz", lca)
+    monkeypatch.setattr(restored._caching_solver, "_unit_scores_iterative", fail)
+    monkeypatch.setattr(restored._caching_solver, "_unit_scores_pardiso", fail)
+    cached = list(restored._caching_solver._score_cache)
+    assert restored._caching_solver.scores(cached, [1] * len(cached))
+
+
+def test_resume_after_complete_traversal(sample_database_with_products):
+    graph = get_graph(sample_database_with_products, max_calc=100)
+    graph.traverse()
+    nodes = dict(graph.nodes)
+    graph.resume()
+    assert graph.nodes == nodes
+
+
+def test_shared_edges(sample_database_with_products, tmp_path):
+    lca = sample_database_with_products
+    graph = SharedSubtreeGraphTraversal(
+        lca=lca, settings=SharedSubtreeGraphTraversalSettings(cutoff=1e-4, depth_bucket_size=2)
+    )
+    graph.traverse()
+    graph.save_state(tmp_path / "state.npz")
+    restored = SharedSubtreeGraphTraversal.load_state(tmp_path / "state.npz", lca)
+    assert restored.settings.depth_bucket_size == 2
+    assert all(isinstance(edge, SharedEdge) for edge in restored.edges)
+    assert restored.edges == graph.edges
+
+
+def test_shared_subtree_unroll_and_resume(sample_database_with_products, tmp_path):
+    lca = sample_database_with_products
+    settings = SharedSubtreeGraphTraversalSettings(cutoff=1e-4, max_calc=3)
+    graph = SharedSubtreeGraphTraversal(lca=lca, settings=settings)
+    with pytest.warns(UserWarning, match="calculation count"):
+        graph.traverse()
+    assert graph._heap
+    graph.save_state(tmp_path / "state.npz")
+    restored = SharedSubtreeGraphTraversal.load_state(tmp_path / "state.npz", lca)
+
+    nodes, edges = graph.unroll()
+    restored_nodes, restored_edges = restored.unroll()
+    assert len(nodes) > 1
+    assert restored_nodes == nodes
+    assert restored_edges == edges
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        graph.resume()
+        restored.resume()
+    assert restored.nodes == graph.nodes
+    assert restored.edges == graph.edges
+    assert restored.unroll() == graph.unroll()
@@ -0,0 +1,62 @@
+from dataclasses import asdict
+
+import pytest
+
+from bw_graph_tools.graph_traversal import (
+    GraphTraversalSettings,
+    NewNodeEachVisitGraphTraversal,
+    load_traversal_results,
+)
+
+pa = pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def graph(sample_database_with_products):
+    graph = NewNodeEachVisitGraphTraversal(
+        lca=sample_database_with_products,
+        settings=GraphTraversalSettings(cutoff=1e-4, biosphere_cutoff=1e-4, max_depth=4),
+    )
+    graph.traverse()
+    return graph
+
+
+@pytest.mark.parametrize("format", ["arrow", "parquet"])
+def test_round_trip(graph, tmp_path, format):
+    filepaths = graph.export(tmp_path, format=format)
+    assert sorted(filepaths) == ["edges", "flows", "nodes"]
+    assert all(filepath.suffix == "." + format for filepath in filepaths.values())
+
+    tables = load_traversal_results(tmp_path)
+    assert tables["nodes"].to_pylist() == [asdict(node) for node in graph.nodes.values()]
+    assert tables["edges"].to_pylist() == [asdict(edge) for edge in graph.edges]
+    assert tables["flows"].to_pylist() == [asdict(flow) for flow in graph.flows]
+    assert tables["flows"].num_rows > 0
+
+
+def test_empty_tables(sample_database_with_products, tmp_path):
+    graph = NewNodeEachVisitGraphTraversal(
+        lca=sample_database_with_products,
+        settings=GraphTraversalSettings(separate_biosphere_flows=False),
+    )
+    graph.traverse()
+    graph.export(tmp_path)
+    tables = load_traversal_results(tmp_path, format="arrow")
+    assert tables["flows"].num_rows == 0
+    assert "score" in tables["flows"].column_names
+
+
+def test_arrow_files_are_memory_mapped(graph, tmp_path):
+    graph.export(tmp_path)
+    allocated = pa.total_allocated_bytes()
+    tables = load_traversal_results(tmp_path)
+    # Memory-mapped tables reference the files instead of allocating new buffers
+    assert pa.total_allocated_bytes() == allocated
+    assert tables["nodes"].num_rows == len(graph.nodes)
+
+
+def test_errors(graph, tmp_path):
+    with pytest.raises(ValueError):
+        graph.export(tmp_path, format="csv")
+    with pytest.raises(FileNotFoundError):
+        load_traversal_results(tmp_path)
@@ -0,0 +1,141 @@
+import warnings
+
+import pytest
+
+from bw_graph_tools.graph_traversal import (
+    GraphTraversalSettings,
+    LayerwiseGraphTraversal,
+    LayerwiseGraphTraversalSettings,
+    NewNodeEachVisitGraphTraversal,
+)
+from bw_graph_tools.testing import synthetic_lca
+
+
+def paths(graph):
+    """Map each node's unique id to the sequence of (product, activity) pairs from the root."""
+    parent = {edge.producer_unique_id: edge.consumer_unique_id for edge in graph.edges}
+    result = {}
+    for unique_id, node in graph.nodes.items():
+        path, current = [], unique_id
+        while current in parent:
+            current_node = graph.nodes[current]
+            path.append((current_node.reference_product_index, current_node.activity_index))
+            current = parent[current]
+        result[unique_id] = tuple(reversed(path))
+    return result
+
+
+def canonical(graph):
+    path = paths(graph)
+    nodes = sorted(
+        (
+            path[node.unique_id],
+            node.depth,
+            node.terminal,
+            round(node.supply_amount, 12),
+            round(node.cumulative_score, 12),
+            round(node.direct_emissions_score, 12),
+            round(node.direct_emissions_score_outside_specific_flows, 12),
+        )
+        for node in graph.nodes.values()
+    )
+    edges = sorted((path[e.producer_unique_id], round(e.amount, 12)) for e in graph.edges)
+    flows = sorted(
+        (path[f.activity_unique_id], f.flow_index, round(f.amount, 12), round(f.score, 12))
+        for f in graph.flows
+    )
+    return nodes, edges, flows
+
+
+@pytest.mark.parametrize("skip_coproducts", [False, True])
+def test_layerwise_matches_new_node_each_visit(skip_coproducts):
+    lca = synthetic_lca(activities=1000, seed=3)
+    kwargs = dict(cutoff=1e-4, max_depth=5, max_calc=100_000, skip_coproducts=skip_coproducts)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = NewNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(**kwargs))
+        expected.traverse()
+        graph = LayerwiseGraphTraversal(
+            lca, LayerwiseGraphTraversalSettings(transposed_unit_scores=False, **kwargs)
+        )
+        graph.traverse()
+    assert len(graph.nodes) > 100
+    assert graph.calculation_count == expected.calculation_count
+    assert canonical(graph) == canonical(expected)
+
+
+def test_layerwise_transposed_unit_scores():
+    lca = synthetic_lca(activities=1000, seed=3)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = LayerwiseGraphTraversal(
+            lca, LayerwiseGraphTraversalSettings(cutoff=1e-4, transposed_unit_scores=False)
+        )
+        expected.traverse()
+        graph = LayerwiseGraphTraversal(lca, LayerwiseGraphTraversalSettings(cutoff=1e-4))
+        graph.traverse()
+    assert graph._caching_solver.stats()["solves"]["transposed"] == 1
+    assert sorted(paths(graph).values()) == sorted(paths(expected).values())
+    assert sorted(node.cumulative_score for node in graph.nodes.values()) == pytest.approx(
+        sorted(node.cumulative_score for node in expected.nodes.values())
+    )
+
+
+def test_layerwise_static_activities(sample_database_with_products):
+    lca = sample_database_with_products
+    settings = LayerwiseGraphTraversalSettings(cutoff=1e-4, transposed_unit_scores=False)
+    graph = LayerwiseGraphTraversal(lca, settings)
+    graph.traverse()
+    expected = NewNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(cutoff=1e-4))
+    expected.traverse()
+    assert canonical(graph) == canonical(expected)
+
+    first = next(e.producer_index for e in expected.edges if e.consumer_unique_id == -1)
+    static = {first}
+    graph = LayerwiseGraphTraversal(lca, settings, static_activity_indices=static)
+    graph.traverse()
+    expected = NewNodeEachVisitGraphTraversal(
+        lca, GraphTraversalSettings(cutoff=1e-4), static_activity_indices=static
+    )
+    expected.traverse()
+    assert canonical(graph) == canonical(expected)
+
+
+def test_layerwise_max_calc_and_resume():
+    lca = synthetic_lca(activities=1000, seed=3)
+    settings = LayerwiseGraphTraversalSettings(cutoff=1e-4, max_depth=5, max_calc=50)
+    graph = LayerwiseGraphTraversal(lca, settings)
+    with pytest.warns(UserWarning, match="calculation count"):
+        graph.traverse()
+    assert graph._heap
+    while graph._heap:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            graph.resume()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = LayerwiseGraphTraversal(
+            lca, LayerwiseGraphTraversalSettings(cutoff=1e-4, max_depth=5, max_calc=100_000)
+        )
+        expected.traverse()
+    assert canonical(graph) == canonical(expected)
+
+
+def test_layerwise_lookup_cached(sample_database_with_products):
+    lca = sample_database_with_products
+    graph = LayerwiseGraphTraversal(lca, LayerwiseGraphTraversalSettings(cutoff=1e-4, max_calc=2))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        graph.traverse()
+        lookup = graph._lookup
+        assert graph._heap
+        graph.resume()
+    assert graph._lookup is lookup
+
+    graph.rescore(("test",))
+    assert graph._lookup is None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        graph.traverse(reset_results=True)
+    assert graph._lookup is not lookup
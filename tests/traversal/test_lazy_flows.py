@@ -0,0 +1,113 @@
+import pytest
+from bw2data import Method
+
+from bw_graph_tools.graph_traversal import (
+    GraphTraversalSettings,
+    LayerwiseGraphTraversal,
+    LayerwiseGraphTraversalSettings,
+    NewNodeEachVisitGraphTraversal,
+    SharedSubtreeGraphTraversal,
+)
+from bw_graph_tools.graph_traversal.base import GraphTraversalException
+from bw_graph_tools.testing import synthetic_lca
+
+SETTINGS = dict(cutoff=1e-5, biosphere_cutoff=1e-7, max_calc=5000)
+
+
+@pytest.fixture(scope="module")
+def lca():
+    return synthetic_lca(activities=1000, seed=3)
+
+
+def outside_specific_flows(graph):
+    return [node.direct_emissions_score_outside_specific_flows for node in graph.nodes.values()]
+
+
+@pytest.mark.parametrize(
+    "cls,settings_class",
+    [
+        (NewNodeEachVisitGraphTraversal, GraphTraversalSettings),
+        (LayerwiseGraphTraversal, LayerwiseGraphTraversalSettings),
+    ],
+)
+def test_lazy_flows_match_eager_flows(lca, cls, settings_class):
+    eager = cls(lca, settings_class(**SETTINGS))
+    eager.traverse()
+    lazy = cls(lca, settings_class(**SETTINGS, lazy_flows=True))
+    lazy.traverse()
+
+    assert not lazy._flows
+    assert len(lazy._flow_records) == len(lazy.nodes) - 1
+    assert lazy.top_flows(50) == eager.flows[:50]
+    assert lazy.top_flows(50) == eager.top_flows(50)
+    assert outside_specific_flows(lazy) == pytest.approx(outside_specific_flows(eager))
+
+    unique_id = eager.flows[10].activity_unique_id
+    assert lazy.node_flows(unique_id) == eager.node_flows(unique_id)
+    assert lazy.node_flows(unique_id)
+
+    assert lazy.flows == eager.flows
+    assert lazy.top_flows(5) == eager.flows[:5]
+
+
+@pytest.mark.parametrize("n", [0, 10_000_000])
+def test_lazy_top_flows_limits(lca, n):
+    eager = NewNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(**SETTINGS))
+    eager.traverse()
+    lazy = NewNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(**SETTINGS, lazy_flows=True))
+    lazy.traverse()
+    assert lazy.top_flows(n) == eager.top_flows(n)
+    if n > 0:
+        assert lazy.top_flows(n) == eager.flows
+
+
+def test_lazy_flows_without_separate_flows(lca):
+    graph = NewNodeEachVisitGraphTraversal(
+        lca, GraphTraversalSettings(**SETTINGS, lazy_flows=True, separate_biosphere_flows=False)
+    )
+    graph.traverse()
+    assert graph.flows == []
+    assert graph.top_flows(10) == []
+
+
+def test_lazy_flows_checkpoint(lca, tmp_path):
+    graph = NewNodeEachVisitGraphTraversal(lca, GraphTraversalSettings(**SETTINGS, lazy_flows=True))
+    graph.traverse()
+    graph.save_state(tmp_path / "state.npz")
+    restored = NewNodeEachVisitGraphTraversal.load_state(tmp_path / "state.npz", lca)
+    assert restored.top_flows(20) == graph.top_flows(20)
+
+
+def test_lazy_flows_eviction(lca):
+    graph = NewNodeEachVisitGraphTraversal(
+        lca, GraphTraversalSettings(**SETTINGS, lazy_flows=True, max_nodes=300)
+    )
+    graph.traverse()
+    assert len(graph._flow_records) < len(graph.nodes)
+    assert {flow.activity_unique_id for flow in graph.flows} <= set(graph.nodes)
+
+
+def test_lazy_flows_rescore(sample_database_with_products):
+    Method(("other",)).write([(("bio", "a"), 1), (("bio", "b"), 30)])
+    settings = dict(cutoff=1e-4, biosphere_cutoff=1e-4, max_depth=5)
+    eager = NewNodeEachVisitGraphTraversal(
+        sample_database_with_products, GraphTraversalSettings(**settings)
+    )
+    eager.traverse()
+    eager.rescore(("other",))
+    sample_database_with_products.switch_method(("test",))
+    sample_database_with_products.lcia_calculation()
+    lazy = NewNodeEachVisitGraphTraversal(
+        sample_database_with_products, GraphTraversalSettings(**settings, lazy_flows=True)
+    )
+    lazy.traverse()
+    lazy.rescore(("other",))
+
+    assert lazy.flows == eager.flows
+    assert lazy.flows
+    assert outside_specific_flows(lazy) == pytest.approx(outside_specific_flows(eager))
+
+
+def test_lazy_flows_not_supported(lca):
+    with pytest.raises(GraphTraversalException):
+        SharedSubtreeGraphTraversal(lca, GraphTraversalSettings(lazy_flows=True))
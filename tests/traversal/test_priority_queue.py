@@ -0,0 +1,107 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from bw_graph_tools.graph_traversal import (
+    GraphTraversalSettings,
+    NewNodeEachVisitGraphTraversal,
+)
+from bw_graph_tools.graph_traversal.graph_objects import Node
+from bw_graph_tools.graph_traversal.priority_queue import BucketQueue, HeapQueue
+from bw_graph_tools.testing import synthetic_lca
+
+
+def make_node(score):
+    return Node(
+        unique_id=0,
+        activity_datapackage_id=0,
+        activity_index=0,
+        reference_product_datapackage_id=0,
+        reference_product_index=0,
+        reference_product_production_amount=1.0,
+        depth=0,
+        supply_amount=1.0,
+        cumulative_score=score,
+        direct_emissions_score=0.0,
+    )
+
+
+@pytest.mark.parametrize("queue_class", [HeapQueue, BucketQueue])
+def test_pop_order(queue_class):
+    priorities = np.random.default_rng(1).lognormal(0, 8, 500)
+    queue = queue_class()
+    nodes = [make_node(1 / priority) for priority in priorities]
+    for priority, node in zip(priorities[:100], nodes[:100]):
+        queue.push(priority, node)
+    queue.push_many(priorities[100:], nodes[100:])
+    queue.push(0, make_node(1))
+    assert len(queue) == 501
+    assert sorted(priority for priority, _ in queue) == sorted([0, *priorities])
+
+    popped = [queue.pop()[0] for _ in range(501)]
+    assert popped == sorted([0, *priorities])
+    assert not queue
+    with pytest.raises(IndexError):
+        queue.pop()
+
+
+def test_bucket_queue_ties_in_insertion_order():
+    queue = BucketQueue(resolution=1)
+    nodes = [make_node(score) for score in (5, 1, 3)]
+    queue.push_many([2.0, 2.0, 2.5], nodes)
+    queue.push(2.0, nodes[2])
+    assert [queue.pop()[1] for _ in range(4)] == [nodes[0], nodes[1], nodes[2], nodes[2]]
+
+
+def test_bucket_queue_clear_and_resolution():
+    queue = BucketQueue()
+    queue.push(1.0, make_node(1))
+    queue.clear()
+    assert len(queue) == 0 and list(queue) == []
+    with pytest.raises(ValueError):
+        BucketQueue(resolution=0)
+
+
+def test_traversal_with_bucket_queue():
+    lca = synthetic_lca(activities=1000, seed=3)
+    results = {}
+    for queue in ("heap", "bucket"):
+        settings = GraphTraversalSettings(cutoff=1e-4, max_calc=200, priority_queue=queue)
+        graph = NewNodeEachVisitGraphTraversal(lca, settings)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            graph.traverse()
+        results[queue] = graph
+    heap, bucket = results["heap"], results["bucket"]
+    assert heap.nodes.keys() == bucket.nodes.keys()
+    for key, node in heap.nodes.items():
+        assert bucket.nodes[key].activity_index == node.activity_index
+        assert bucket.nodes[key].cumulative_score == node.cumulative_score
+    assert isinstance(bucket._heap, BucketQueue)
+    assert sorted(p for p, _ in bucket._heap) == sorted(p for p, _ in heap._heap)
+
+
+def test_unknown_priority_queue(sample_database_with_products):
+    with pytest.raises(ValueError):
+        NewNodeEachVisitGraphTraversal(
+            sample_database_with_products, GraphTraversalSettings(priority_queue="fibonacci")
+        )
+
+
+def test_checkpoint_restores_bucket_queue(tmp_path):
+    lca = synthetic_lca(activities=1000, seed=3)
+    settings = GraphTraversalSettings(cutoff=1e-4, max_calc=50, priority_queue="bucket")
+    graph = NewNodeEachVisitGraphTraversal(lca, settings)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        graph.traverse()
+    graph.save_state(tmp_path / "state.npz")
+    loaded = NewNodeEachVisitGraphTraversal.load_state(tmp_path / "state.npz", lca)
+    assert isinstance(loaded._heap, BucketQueue)
+    expected = [
+        (p, node.unique_id) for p, node in (graph._heap.pop() for _ in range(len(graph._heap)))
+    ]
+    assert [
+        (p, node.unique_id) for p, node in (loaded._heap.pop() for _ in range(len(loaded._heap)))
+    ] == expected
@@ -0,0 +1,66 @@
+from collections import Counter
+
+from bw_graph_tools.graph_traversal import (
+    GraphTraversalSettings,
+    NewNodeEachVisitGraphTraversal,
+    SameNodeEachVisitGraphTraversal,
+)
+from bw_graph_tools.graph_traversal.utils import TraversalProfiler
+
+
+def test_disabled_by_default(sample_database_with_products):
+    graph = NewNodeEachVisitGraphTraversal(
+        lca=sample_database_with_products, settings=GraphTraversalSettings()
+    )
+    graph.traverse()
+    assert graph.stats is None
+    # No wrappers on the instance
+    assert "traverse_edges" not in vars(graph)
+
+
+def test_phase_counts(sample_database_with_products):
+    graph = NewNodeEachVisitGraphTraversal(
+        lca=sample_database_with_products,
+        settings=GraphTraversalSettings(cutoff=1e-4, max_depth=4, profile=True),
+    )
+    graph.traverse()
+    stats = graph.stats
+    assert isinstance(stats, TraversalProfiler)
+    phases = stats.as_dict()
+    assert set(phases) == set(TraversalProfiler.PHASES)
+
+    expanded = phases["traverse_edges"]["count"]
+    assert expanded >= len({edge.consumer_unique_id for edge in graph.edges})
+    assert phases["get_demand_vector_for_activity"]["count"] == expanded
+    assert phases["scores"]["count"] == expanded
+    assert phases["heappop"]["count"] == expanded
+    # One push for the root node; `traverse_edges` pushes all children of a node at once
+    depths = {key: node.depth for key, node in graph.nodes.items()}
+    assert phases["heappush"]["count"] == 1 + len(
+        {edge.consumer_unique_id for edge in graph.edges if depths[edge.producer_unique_id] < 4}
+    )
+    assert expanded == sum(1 for node in graph.nodes.values() if node.depth < 4)
+    assert phases["add_biosphere_flows"]["count"] == len(graph.nodes) - 1
+    assert phases["traverse_edges"]["seconds"] >= phases["scores"]["seconds"] > 0
+
+    stats.reset()
+    assert all(value["count"] == 0 for value in stats.as_dict().values())
+    assert "traverse_edges" in str(stats)
+
+
+def test_callback(sample_database_with_products):
+    calls = Counter()
+
+    def callback(phase, seconds):
+        assert seconds >= 0
+        calls[phase] += 1
+
+    graph = SameNodeEachVisitGraphTraversal(
+        lca=sample_database_with_products,
+        settings=GraphTraversalSettings(profile_callback=callback),
+    )
+    graph.traverse()
+    assert graph.stats is not None
+    assert calls == Counter(
+        {phase: stats["count"] for phase, stats in graph.stats.as_dict().items() if stats["count"]}
+    )
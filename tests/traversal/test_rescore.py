@@ -0,0 +1,113 @@
+import pytest
+from bw2calc import LCA
+from bw2data import Method
+
+from bw_graph_tools.graph_traversal import (
+    GraphTraversalSettings,
+    NewNodeEachVisitGraphTraversal,
+    SameNodeEachVisitGraphTraversal,
+)
+
+SETTINGS = dict(cutoff=1e-4, biosphere_cutoff=1e-4, max_depth=5)
+
+
+@pytest.fixture
+def other_method(sample_database_with_products):
+    Method(("other",)).write([(("bio", "a"), 1), (("bio", "b"), 30)])
+    return ("other",)
+
+
+def new_lca(method):
+    lca = LCA({("t", "2"): 8}, method)
+    lca.lci()
+    lca.lcia()
+    return lca
+
+
+@pytest.mark.parametrize(
+    "cls,settings",
+    [
+        (NewNodeEachVisitGraphTraversal, {}),
+        (SameNodeEachVisitGraphTraversal, {"aggregate_by_activity": True}),
+    ],
+)
+def test_rescore_matches_new_traversal(sample_database_with_products, other_method, cls, settings):
+    graph = cls(
+        lca=sample_database_with_products,
+        settings=GraphTraversalSettings(**SETTINGS, **settings),
+    )
+    graph.traverse()
+    supply = {key: node.supply_amount for key, node in graph.nodes.items()}
+
+    graph.rescore(other_method)
+
+    expected = cls(
+        lca=new_lca(other_method), settings=GraphTraversalSettings(**SETTINGS, **settings)
+    )
+    expected.traverse()
+    assert graph.nodes.keys() == expected.nodes.keys()
+    for key, node in graph.nodes.items():
+        assert node.supply_amount == supply[key]
+        other = expected.nodes[key]
+        for attribute in (
+            "cumulative_score",
+            "direct_emissions_score",
+            "direct_emissions_score_outside_specific_flows",
+            "remaining_cumulative_score_outside_specific_flows",
+        ):
+            assert getattr(node, attribute) == pytest.approx(getattr(other, attribute))
+    assert [(flow.activity_unique_id, flow.flow_index) for flow in graph.flows] == [
+        (flow.activity_unique_id, flow.flow_index) for flow in expected.flows
+    ]
+    assert [flow.score for flow in graph.flows] == pytest.approx(
+        [flow.score for flow in expected.flows]
+    )
+
+
+@pytest.mark.parametrize(
+    "cls,settings",
+    [
+        (NewNodeEachVisitGraphTraversal, {}),
+        (SameNodeEachVisitGraphTraversal, {"aggregate_by_activity": True}),
+    ],
+)
+def test_traverse_after_rescore(sample_database_with_products, other_method, cls, settings):
+    graph = cls(
+        lca=sample_database_with_products,
+        settings=GraphTraversalSettings(**SETTINGS, **settings),
+    )
+    graph.traverse(depth=1)
+    graph.rescore(other_method)
+
+    expected = cls(
+        lca=new_lca(other_method), settings=GraphTraversalSettings(**SETTINGS, **settings)
+    )
+    expected.traverse(depth=1)
+    leaves = [key for key, node in graph.nodes.items() if node.terminal]
+    assert leaves
+    for key in leaves:
+        graph.traverse(nodes=[graph.nodes[key]], depth=1)
+        expected.traverse(nodes=[expected.nodes[key]], depth=1)
+
+    assert len(graph.nodes) > len(leaves) + 1
+    assert graph.nodes.keys() == expected.nodes.keys()
+    for key, node in graph.nodes.items():
+        assert node.cumulative_score == pytest.approx(expected.nodes[key].cumulative_score)
+        assert node.direct_emissions_score == pytest.approx(
+            expected.nodes[key].direct_emissions_score
+        )
+
+
+def test_rescore_uses_one_batched_solve(sample_database_with_products, other_method):
+    graph = NewNodeEachVisitGraphTraversal(
+        lca=sample_database_with_products, settings=GraphTraversalSettings(**SETTINGS)
+    )
+    graph.traverse()
+    graph._caching_solver.reset_stats()
+    graph.rescore(other_method)
+    stats = graph._caching_solver.stats()
+    assert stats["batches"] == 1
+    assert stats["batch_sizes"] == [
+        len({node.reference_product_index for key, node in graph.nodes.items() if key != -1})
+    ]
+    assert graph._root_node.cumulative_score == pytest.approx(new_lca(other_method).score)
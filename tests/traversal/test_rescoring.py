@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+from bw2calc import LCA
+from bw2data import Database, Method, get_node
+from bw2data.tests import bw2test
+
+from bw_graph_tools.graph_traversal import (
+    GraphTraversalSettings,
+    NewNodeEachVisitGraphTraversal,
+    SameNodeEachVisitGraphTraversal,
+    SharedSubtreeGraphTraversal,
+    SharedSubtreeGraphTraversalSettings,
+    TraversalRescorer,
+)
+
+
+def get_graph(lca, cls=NewNodeEachVisitGraphTraversal, settings_cls=GraphTraversalSettings):
+    graph = cls(lca=lca, settings=settings_cls(cutoff=1e-6, max_depth=5, max_calc=10_000))
+    graph.traverse()
+    return graph
+
+
+def assert_matches(results, rescorer, graph):
+    for position, unique_id in enumerate(rescorer.unique_ids):
+        node = graph.nodes[unique_id]
+        for attribute in ("supply_amount", "cumulative_score", "direct_emissions_score"):
+            assert results[attribute][position] == pytest.approx(getattr(node, attribute))
+    assert results["edge_amount"] == pytest.approx([edge.amount for edge in graph.edges])
+    assert results["flow_score"] == pytest.approx([flow.score for flow in graph.flows])
+    assert results["flow_amount"] == pytest.approx([flow.amount for flow in graph.flows])
+
+
+@pytest.mark.parametrize(
+    "cls,settings_cls",
+    [
+        (NewNodeEachVisitGraphTraversal, GraphTraversalSettings),
+        (SharedSubtreeGraphTraversal, SharedSubtreeGraphTraversalSettings),
+    ],
+)
+def test_same_matrices(sample_database_with_products, cls, settings_cls):
+    graph = get_graph(sample_database_with_products, cls, settings_cls)
+    rescorer = TraversalRescorer(graph)
+    results = rescorer.calculate(sample_database_with_products)
+    assert_matches(results, rescorer, graph)
+    assert results["cumulative_score"][rescorer.root] == pytest.approx(
+        sample_database_with_products.score
+    )
+
+
+def test_changed_matrices(sample_database_with_products):
+    lca = sample_database_with_products
+    rescorer = TraversalRescorer(get_graph(lca))
+
+    matrix = lca.technosphere_matrix.tolil()
+    rows, cols = matrix.nonzero()
+    for row, col in zip(rows, cols):
+        if matrix[row, col] < 0:
+            matrix[row, col] *= 0.7
+    lca.technosphere_matrix = matrix.tocsr()
+    lca.biosphere_matrix = lca.biosphere_matrix * 1.5
+    if hasattr(lca, "solver"):
+        del lca.solver
+    lca.lci_calculation()
+    lca.lcia_calculation()
+
+    expected = get_graph(lca)
+    results = rescorer.calculate(lca)
+    assert_matches(results, rescorer, expected)
+    assert results["cumulative_score"][rescorer.root] == pytest.approx(lca.score)
+
+
+def test_cycles_not_supported(sample_database_with_products):
+    graph = SameNodeEachVisitGraphTraversal(
+        lca=sample_database_with_products,
+        settings=GraphTraversalSettings(cutoff=1e-6, aggregate_by_activity=True),
+    )
+    graph.traverse()
+    with pytest.raises(ValueError):
+        TraversalRescorer(graph)
+
+
+@bw2test
+def test_monte_carlo():
+    Database("bio").write({("bio", "a"): {"type": "emission", "name": "a", "exchanges": []}})
+    Database("t").write(
+        {
+            ("t", "1"): {
+                "exchanges": [
+                    {"input": ("t", "1"), "amount": 1, "type": "production"},
+                    {
+                        "input": ("t", "2"),
+                        "amount": 2,
+                        "type": "technosphere",
+                        "uncertainty type": 4,
+                        "minimum": 1,
+                        "maximum": 3,
+                    },
+                    {"input": ("bio", "a"), "amount": 1, "type": "biosphere"},
+                ],
+            },
+            ("t", "2"): {
+                "exchanges": [
+                    {"input": ("t", "2"), "amount": 1, "type": "production"},
+                    {"input": ("t", "1"), "amount": 0.1, "type": "technosphere"},
+                    {
+                        "input": ("bio", "a"),
+                        "amount": 1,
+                        "type": "biosphere",
+                        "uncertainty type": 4,
+                        "minimum": 0.5,
+                        "maximum": 1.5,
+                    },
+                ],
+            },
+        }
+    )
+    Method(("test",)).write([(("bio", "a"), 1)])
+    lca = LCA({get_node(code="1"): 1}, ("test",), use_distributions=True, seed_override=1)
+    lca.lci()
+    lca.lcia()
+
+    rescorer = TraversalRescorer(get_graph(lca))
+    results = rescorer.monte_carlo(lca, iterations=10)
+    assert results["cumulative_score"].shape == (10, len(rescorer.unique_ids))
+    assert results["edge_amount"].shape[0] == 10
+    assert np.unique(results["cumulative_score"][:, rescorer.root]).size == 10
+    # The last sample is still loaded in the LCA
+    assert results["cumulative_score"][-1, rescorer.root] == pytest.approx(lca.score)
+    assert_matches({key: value[-1] for key, value in results.items()}, rescorer, get_graph(lca))
@@ -2,6 +2,7 @@ import pytest
 
 from bw_graph_tools.graph_traversal import GraphTraversalSettings, SameNodeEachVisitGraphTraversal
 from bw_graph_tools.graph_traversal.base import GraphTraversalException
+from bw_graph_tools.graph_traversal.utils import CachingSolver
 
 
 def get_default_graph(lca):
@@ -65,3 +66,77 @@ class TestSameNodeTraversal:
         assert -1 not in graph.visited_nodes
         graph.traverse()
         assert -1 in graph.visited_nodes
+
+
+@pytest.fixture
+def aggregated_graph(sample_database_with_products):
+    return SameNodeEachVisitGraphTraversal(
+        lca=sample_database_with_products,
+        settings=GraphTraversalSettings(cutoff=1e-6, aggregate_by_activity=True),
+    )
+
+
+class TestAggregatedSameNodeTraversal:
+    def test_one_node_per_activity(self, aggregated_graph):
+        aggregated_graph.traverse()
+        lca = aggregated_graph.lca
+        nodes = {key: node for key, node in aggregated_graph.nodes.items() if key != -1}
+        assert all(key == node.activity_index for key, node in nodes.items())
+        assert len(nodes) <= len(lca.dicts.activity)
+        assert aggregated_graph.calculation_count == len(nodes) - 1
+
+    def test_supply_from_supply_array(self, aggregated_graph):
+        aggregated_graph.traverse()
+        lca = aggregated_graph.lca
+        for key, node in aggregated_graph.nodes.items():
+            if key == -1:
+                continue
+            assert node.supply_amount == pytest.approx(lca.supply_array[key])
+            # Supply is accumulated from all consumers
+            incoming = sum(
+                edge.amount for edge in aggregated_graph.edges if edge.producer_unique_id == key
+            )
+            assert incoming == pytest.approx(
+                node.supply_amount * node.reference_product_production_amount
+            )
+
+    def test_cumulative_scores(self, aggregated_graph):
+        aggregated_graph.traverse()
+        solver = CachingSolver(aggregated_graph.lca)
+        solver.set_score_row(aggregated_graph.characterized_biosphere)
+        for key, node in aggregated_graph.nodes.items():
+            if key == -1:
+                continue
+            expected = solver._unit_scores_iterative([node.reference_product_index])[0]
+            assert node.cumulative_score == pytest.approx(
+                expected * node.supply_amount * node.reference_product_production_amount
+            )
+
+    def test_direct_scores_cover_total(self, aggregated_graph):
+        aggregated_graph.traverse()
+        total = sum(
+            node.direct_emissions_score for key, node in aggregated_graph.nodes.items() if key != -1
+        )
+        assert total == pytest.approx(aggregated_graph.lca.score)
+
+    def test_cutoff(self, sample_database_with_products):
+        graph = SameNodeEachVisitGraphTraversal(
+            lca=sample_database_with_products,
+            settings=GraphTraversalSettings(cutoff=0.99, aggregate_by_activity=True),
+        )
+        graph.traverse()
+        assert all(
+            abs(node.cumulative_score) >= graph.cutoff_score for node in graph.nodes.values()
+        )
+
+    def test_traverse_from_node(self, sample_database_with_products):
+        graph = SameNodeEachVisitGraphTraversal(
+            lca=sample_database_with_products,
+            settings=GraphTraversalSettings(cutoff=1e-6, aggregate_by_activity=True),
+        )
+        graph.traverse(depth=1)
+        assert len(graph.nodes) == 2
+        (child,) = [node for key, node in graph.nodes.items() if key != -1]
+        assert graph.traverse_from_node(child.unique_id) is True
+        assert graph.traverse_from_node(child.unique_id) is False
+        assert len(graph.nodes) > 2
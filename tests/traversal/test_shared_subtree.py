@@ -0,0 +1,259 @@
+from collections import defaultdict
+
+import pytest
+from bw2calc import LCA
+from bw2data import Database, Method, get_node
+from bw2data.tests import bw2test
+
+from bw_graph_tools.graph_traversal import (
+    GraphTraversalSettings,
+    NewNodeEachVisitGraphTraversal,
+    SharedEdge,
+    SharedSubtreeGraphTraversal,
+    SharedSubtreeGraphTraversalSettings,
+)
+from bw_graph_tools.graph_traversal.base import GraphTraversalException
+
+MAX_DEPTH = 5
+
+
+def aggregate(nodes, attribute):
+    result = defaultdict(float)
+    for node in nodes.values():
+        if node.unique_id != -1:
+            result[(node.activity_index, node.depth)] += getattr(node, attribute)
+    return result
+
+
+@pytest.fixture
+def unrolled(sample_database_with_products):
+    graph = NewNodeEachVisitGraphTraversal(
+        lca=sample_database_with_products,
+        settings=GraphTraversalSettings(cutoff=1e-9, max_calc=10_000, max_depth=MAX_DEPTH),
+    )
+    graph.traverse()
+    return graph
+
+
+@pytest.fixture
+def shared(sample_database_with_products):
+    graph = SharedSubtreeGraphTraversal(
+        lca=sample_database_with_products,
+        settings=SharedSubtreeGraphTraversalSettings(
+            cutoff=1e-9, max_calc=10_000, max_depth=MAX_DEPTH
+        ),
+    )
+    graph.traverse()
+    return graph
+
+
+def test_one_node_per_activity_and_depth(shared, unrolled):
+    keys = [(node.activity_index, node.depth) for node in shared.nodes.values()]
+    assert len(keys) == len(set(keys))
+    assert len(shared.nodes) <= len(unrolled.nodes)
+    assert all(isinstance(edge, SharedEdge) for edge in shared.edges)
+
+
+@pytest.mark.parametrize(
+    "attribute", ["supply_amount", "cumulative_score", "direct_emissions_score"]
+)
+def test_aggregated_amounts_match_unrolled_traversal(shared, unrolled, attribute):
+    expected = aggregate(unrolled.nodes, attribute)
+    given = aggregate(shared.nodes, attribute)
+    assert given.keys() == expected.keys()
+    for key, value in expected.items():
+        assert given[key] == pytest.approx(value)
+
+
+def test_edge_amounts(shared):
+    for edge in shared.edges:
+        consumer = shared.nodes[edge.consumer_unique_id]
+        assert edge.amount == pytest.approx(edge.multiplicity * consumer.supply_amount)
+
+
+def test_multiplicities_from_matrix(shared):
+    matrix = shared.lca.technosphere_matrix
+    root = shared._functional_unit_unique_id
+    for edge in shared.edges:
+        if edge.consumer_unique_id == root:
+            assert edge.multiplicity == shared.lca.demand_array[edge.product_index]
+        else:
+            assert edge.multiplicity == -matrix[edge.product_index, edge.consumer_index]
+
+
+def test_flows_match_unrolled_traversal(shared, unrolled):
+    assert sum(flow.score for flow in shared.flows) == pytest.approx(
+        sum(flow.score for flow in unrolled.flows)
+    )
+
+
+def test_unroll_matches_unrolled_traversal(shared, unrolled):
+    nodes, edges = shared.unroll()
+    assert len(nodes) == len(unrolled.nodes)
+    assert len(edges) == len(unrolled.edges)
+    for attribute in ("supply_amount", "cumulative_score"):
+        expected = aggregate(unrolled.nodes, attribute)
+        given = aggregate(nodes, attribute)
+        for key, value in expected.items():
+            assert given[key] == pytest.approx(value)
+    assert not set(nodes).intersection(set(shared.nodes).difference({-1}))
+
+
+def test_unroll_children(shared):
+    root_children = shared.unroll_children(shared._root_node)
+    assert len(root_children) == 1
+    edge, child = root_children[0]
+    assert edge.consumer_unique_id == -1
+    assert edge.producer_unique_id == child.unique_id
+    grandchildren = shared.unroll_children(child)
+    assert {node.activity_index for _, node in grandchildren} == {
+        shared.nodes[edge.producer_unique_id].activity_index
+        for edge in shared.edges
+        if edge.consumer_unique_id == 0
+    }
+
+
+def test_depth_bucket_size(sample_database_with_products):
+    graph = SharedSubtreeGraphTraversal(
+        lca=sample_database_with_products,
+        settings=SharedSubtreeGraphTraversalSettings(
+            cutoff=1e-9, max_calc=10_000, max_depth=MAX_DEPTH, depth_bucket_size=100
+        ),
+    )
+    graph.traverse()
+    activities = [node.activity_index for node in graph.nodes.values() if node.unique_id != -1]
+    # A node can't be shared with consumers at the same or a greater depth
+    assert len(activities) > len(set(activities))
+    assert len(graph.nodes) <= MAX_DEPTH * len(set(activities)) + 1
+
+
+def test_repeated_traversal(shared):
+    count = len(shared.nodes)
+    shared.traverse()
+    assert len(shared.nodes) == count
+
+
+def test_traversal_from_nodes_not_allowed(shared):
+    with pytest.raises(GraphTraversalException):
+        shared.traverse(nodes=[shared.nodes[0]])
+
+
+@bw2test
+def test_diamond_expanded_once():
+    Database("bio").write({("bio", "a"): {"type": "emission", "name": "a", "exchanges": []}})
+    Database("t").write(
+        {
+            ("t", "1"): {
+                "exchanges": [
+                    {"input": ("t", "1"), "amount": 1, "type": "production"},
+                    {"input": ("t", "2"), "amount": 2, "type": "technosphere"},
+                    {"input": ("t", "3"), "amount": 3, "type": "technosphere"},
+                ],
+            },
+            ("t", "2"): {
+                "exchanges": [
+                    {"input": ("t", "2"), "amount": 1, "type": "production"},
+                    {"input": ("t", "4"), "amount": 4, "type": "technosphere"},
+                ],
+            },
+            ("t", "3"): {
+                "exchanges": [
+                    {"input": ("t", "3"), "amount": 1, "type": "production"},
+                    {"input": ("t", "4"), "amount": 5, "type": "technosphere"},
+                ],
+            },
+            ("t", "4"): {
+                "exchanges": [
+                    {"input": ("t", "4"), "amount": 2, "type": "production"},
+                    {"input": ("bio", "a"), "amount": 1, "type": "biosphere"},
+                ],
+            },
+        }
+    )
+    Method(("test",)).write([(("bio", "a"), 1)])
+    lca = LCA({get_node(code="1"): 1}, ("test",))
+    lca.lci()
+    lca.lcia()
+
+    graph = SharedSubtreeGraphTraversal(lca=lca, settings=SharedSubtreeGraphTraversalSettings())
+    graph.traverse()
+
+    assert len(graph.nodes) == 5
+    assert graph.calculation_count == 3
+    shared = [
+        node
+        for node in graph.nodes.values()
+        if node.activity_index == lca.dicts.activity[get_node(code="4").id]
+    ]
+    assert len(shared) == 1
+    # 2 * 4 + 3 * 5 = 23 units of product, with two units per activity
+    assert shared[0].supply_amount == pytest.approx(11.5)
+    assert shared[0].cumulative_score == pytest.approx(lca.score)
+    assert sorted(edge.multiplicity for edge in graph.edges) == [1, 2, 3, 4, 5]
+
+    nodes, edges = graph.unroll()
+    assert len(nodes) == 6
+    assert sorted(node.supply_amount for node in nodes.values() if node.depth == 3) == [
+        pytest.approx(4),
+        pytest.approx(7.5),
+    ]
+
+
+@bw2test
+def test_zero_supply_from_cancelling_consumers():
+    Database("bio").write({("bio", "a"): {"type": "emission", "name": "a", "exchanges": []}})
+    Database("t").write(
+        {
+            ("t", "1"): {
+                "exchanges": [
+                    {"input": ("t", "1"), "amount": 1, "type": "production"},
+                    {"input": ("t", "2"), "amount": 1, "type": "technosphere"},
+                    {"input": ("t", "3"), "amount": 1, "type": "technosphere"},
+                ],
+            },
+            ("t", "2"): {
+                "exchanges": [
+                    {"input": ("t", "2"), "amount": 1, "type": "production"},
+                    {"input": ("t", "4"), "amount": 2, "type": "technosphere"},
+                    {"input": ("bio", "a"), "amount": 1, "type": "biosphere"},
+                ],
+            },
+            ("t", "3"): {
+                "exchanges": [
+                    {"input": ("t", "3"), "amount": 1, "type": "production"},
+                    {"input": ("t", "4"), "amount": -2, "type": "technosphere"},
+                    {"input": ("bio", "a"), "amount": 3, "type": "biosphere"},
+                ],
+            },
+            ("t", "4"): {
+                "exchanges": [
+                    {"input": ("t", "4"), "amount": 1, "type": "production"},
+                    {"input": ("bio", "a"), "amount": 1, "type": "biosphere"},
+                ],
+            },
+        }
+    )
+    Method(("test",)).write([(("bio", "a"), 1)])
+    lca = LCA({get_node(code="1"): 1}, ("test",))
+    lca.lci()
+    lca.lcia()
+
+    graph = SharedSubtreeGraphTraversal(lca=lca, settings=SharedSubtreeGraphTraversalSettings())
+    graph.traverse()
+
+    (shared,) = [
+        node
+        for node in graph.nodes.values()
+        if node.activity_index == lca.dicts.activity[get_node(code="4").id]
+    ]
+    assert shared.supply_amount == 0
+    assert shared.cumulative_score == 0
+    assert shared.direct_emissions_score == 0
+
+    nodes, _ = graph.unroll()
+    unrolled = sorted(
+        (node.supply_amount, node.cumulative_score, node.direct_emissions_score)
+        for node in nodes.values()
+        if node.activity_index == shared.activity_index
+    )
+    assert unrolled == [pytest.approx((-2, -2, -2)), pytest.approx((2, 2, 2))]
@@ -10,7 +10,9 @@ from bw_graph_tools.graph_traversal import (
     SameNodeEachVisitTaggedGraphTraversal,
     TaggedGraphTraversalSettings,
 )
+from bw_graph_tools.graph_traversal.base import GraphTraversalException
 from bw_graph_tools.graph_traversal.graph_objects import Edge, GroupedNodes, Node
+from bw_graph_tools.graph_traversal.tagged_nodes import TagIndex
 from bw_graph_tools.graph_traversal.utils import Counter
 
 
@@ -25,6 +27,21 @@ def get_untagged_new_graph(lca, variant=NewNodeEachVisitGraphTraversal):
     return variant(lca=lca, settings=GraphTraversalSettings(cutoff=0.001, max_calc=10))
 
 
+def tagged_snapshot(graph):
+    # Grouped nodes are identified by their members, as their ids can change when regrouped
+    def key(node):
+        if isinstance(node, GroupedNodes):
+            return tuple(sorted(n.unique_id for n in node.nodes))
+        return node.unique_id
+
+    nodes = {key(node): node.activity_index for node in graph.nodes.values()}
+    edges = {
+        (edge.consumer_unique_id, key(graph.nodes[edge.producer_unique_id]), edge.amount)
+        for edge in graph.edges
+    }
+    return nodes, edges
+
+
 @pytest.fixture
 def graph(sample_database_with_tagged_products):
     g = get_default_graph(sample_database_with_tagged_products, ["test"])
@@ -181,6 +198,26 @@ class TestNewNodeTaggingTraversal:
         )
         assert dict(results) == expected, "Expecting the same results"
 
+    def test_tagged_traversal_does_not_query_per_node(
+        self, graph, sample_database_with_tagged_products, monkeypatch
+    ):
+        monkeypatch.setattr(
+            bd, "get_activity", lambda **kwargs: pytest.fail("Should query in bulk")
+        )
+        graph.traverse()
+        assert len(graph.nodes) == 9
+
+    def test_rebuild_after_reset(self, graph):
+        graph.traverse(depth=1)
+        # Reset the results with the untagged traversal, which then finds as many edges again
+        NewNodeEachVisitGraphTraversal.traverse(graph, depth=1, reset_results=True)
+        node = next(node for node in graph._nodes.values() if node.terminal)
+        graph.traverse(nodes=[node], depth=1)
+
+        incremental = tagged_snapshot(graph)
+        graph._rebuild_tagged_graph()
+        assert tagged_snapshot(graph) == incremental
+
     def test_untagged_traversal(self, sample_database_with_tagged_products):
         graph = get_default_graph(sample_database_with_tagged_products, [])
         duplicate_graph = get_untagged_new_graph(sample_database_with_tagged_products)
@@ -222,9 +259,7 @@ class TestSameNodeTaggingTraversal:
         assert len(self.grouped_nodes(same_node_graph)) == 2
 
         # find a single-member GroupedNodes dynamically instead of using a hardcoded ID
-        single_group = next(
-            gn for gn in self.grouped_nodes(same_node_graph) if len(gn.nodes) == 1
-        )
+        single_group = next(gn for gn in self.grouped_nodes(same_node_graph) if len(gn.nodes) == 1)
         assert isinstance(single_group, GroupedNodes)
 
         # expanding the grouped node replaces it with its actual child node
@@ -259,6 +294,26 @@ class TestSameNodeTaggingTraversal:
         result = same_node_graph.traverse_from_node(regular_node, depth=1)
         assert result is False
 
+    def test_incremental_matches_rebuild(self, same_node_graph):
+        same_node_graph.traverse(depth=1)
+        for _ in range(3):
+            node = next(
+                node
+                for node in list(same_node_graph.nodes.values())
+                if node.terminal and node.unique_id not in same_node_graph.visited_nodes
+            )
+            same_node_graph.traverse_from_node(node, depth=1)
+            incremental = tagged_snapshot(same_node_graph)
+            same_node_graph._rebuild_tagged_graph()
+            assert tagged_snapshot(same_node_graph) == incremental
+
+    def test_aggregate_by_activity_not_supported(self, sample_database_with_tagged_products):
+        with pytest.raises(GraphTraversalException, match="aggregate_by_activity"):
+            SameNodeEachVisitTaggedGraphTraversal(
+                lca=sample_database_with_tagged_products,
+                settings=TaggedGraphTraversalSettings(tags=["test"], aggregate_by_activity=True),
+            )
+
     def test_reset_does_not_inflate_max_calc(self, sample_database_with_tagged_products):
         # Regression test for the bug fix in NewNodeEachVisitGraphTraversal.traverse:
         # calling traverse(reset_results=True) after a prior traversal must restore
@@ -273,6 +328,72 @@ class TestSameNodeTaggingTraversal:
 
         # A reset traverse must restore the original budget, not keep doubling
         graph.traverse(reset_results=True)
-        assert graph._max_calc == original_max_calc, (
-            "_max_calc was not restored after reset_results=True"
+        assert (
+            graph._max_calc == original_max_calc
+        ), "_max_calc was not restored after reset_results=True"
+
+
+class TestTagIndex:
+    def test_load_and_get(self, tagged_data):
+        index = TagIndex()
+        four, three = bd.get_node(name="4"), bd.get_node(name="3")
+        index.load([four.id, three.id, -100])
+        assert index.get(four.id) == four["tags"]
+        assert index.get(three.id) == three["tags"]
+        assert index.get(-100) == {}
+
+    def test_cached_ids_not_queried_again(self, tagged_data, monkeypatch):
+        index = TagIndex()
+        four = bd.get_node(name="4")
+        index.load([four.id])
+
+        from bw2data.backends import ActivityDataset
+
+        monkeypatch.setattr(ActivityDataset, "select", lambda *args: pytest.fail("Cached"))
+        index.load([four.id])
+        assert index.get(four.id) == four["tags"]
+
+    def test_shared_through_settings(self, sample_database_with_tagged_products):
+        index = TagIndex()
+        graph = NewNodeEachVisitTaggedGraphTraversal(
+            lca=sample_database_with_tagged_products,
+            settings=TaggedGraphTraversalSettings(
+                cutoff=0.001, max_calc=10, tags=["test"], tag_index=index
+            ),
         )
+        assert graph.tag_index is index
+        graph.traverse()
+        assert index._tags
+
+    def test_group_codes(self, tagged_data):
+        index = TagIndex()
+        ids = [bd.get_node(name=name).id for name in "34563"]
+        codes = index.group_codes(ids, ["test", "second"])
+        labels = index.group_labels(["test", "second"])
+        assert [labels[code] for code in codes] == [
+            "test: group-b,second: ",
+            "test: group-a,second: ",
+            "test: group-a,second: ",
+            "test: group-b,second: 1",
+            "test: group-b,second: ",
+        ]
+        assert codes[0] == codes[-1]
+        assert labels[0] == ""
+        assert index.group_codes(ids, ["invalid-tag"]).tolist() == [0] * 5
+
+    @pytest.mark.parametrize("rescore", [False, True])
+    def test_grouped_node_sums(self, graph, rescore):
+        graph.traverse()
+        if rescore:
+            bd.Method(("other",)).write([(("bio", "a"), 1), (("bio", "b"), 30)])
+            graph.rescore(("other",))
+        for node in graph.nodes.values():
+            if not isinstance(node, GroupedNodes):
+                continue
+            assert node.supply_amount == pytest.approx(sum(n.supply_amount for n in node.nodes))
+            assert node.cumulative_score == pytest.approx(
+                sum(n.cumulative_score for n in node.nodes)
+            )
+            assert node.direct_emissions_score == pytest.approx(
+                sum(n.direct_emissions_score for n in node.nodes)
+            )